@@ -0,0 +1,11 @@
+"""
+Benchmarks do meu_banco
+
+Gera uma base sintética determinística (clientes, contas e históricos com
+distribuição de Zipf), executa os cenários chamando as funções diretamente
+(nucleo), pelas rotas Flask (rotas) ou por processos shard (shards), e grava
+ops/s, p50/p99 e pico de memória em JSON para comparar execuções:
+    
+    python -m benchmarks --escala media --saida atual.json
+    python -m benchmarks --escala media --comparar base.json
+"""
@@ -0,0 +1,83 @@
+"""Linha de comando dos benchmarks: python -m benchmarks --help"""
+import argparse
+import sys
+import time
+
+from . import nucleo, rotas  # noqa: F401 (registram os cenários)
+from .dados import ESCALAS, gerar_dados
+from .medicao import (CENARIOS, Contexto, carregar_resultados, comparar, formatar_resultado, metadados,
+                      salvar_resultados, verificacoes_falhas)
+
+GRUPOS_PADRAO = ("nucleo", "rotas", "shards")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks do meu_banco")
+    parser.add_argument('--escala', choices=tuple(ESCALAS), default='pequena',
+                        help="tamanho da base sintética (padrão: pequena)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--operacoes', type=int,
+                        help="operações medidas por cenário (padrão: o da escala)")
+    parser.add_argument('--threads', type=int, default=8,
+                        help="threads dos cenários concorrentes (padrão: 8)")
+    parser.add_argument('--cenarios', nargs='+', metavar='NOME',
+                        help=f"cenários ou grupos a executar (padrão: {' '.join(GRUPOS_PADRAO)}); "
+                             f"disponíveis: {', '.join(sorted(CENARIOS))}")
+    parser.add_argument('--saida', metavar='ARQUIVO', help="grava os resultados em JSON")
+    parser.add_argument('--comparar', metavar='ARQUIVO',
+                        help="compara com um JSON gravado antes; sai com código 1 se houver regressão")
+    parser.add_argument('--tolerancia', type=float, default=0.10,
+                        help="piora relativa aceita na comparação (padrão: 0.10)")
+    args = parser.parse_args(argv)
+    
+    pedidos = args.cenarios or GRUPOS_PADRAO
+    selecionados = [nome for nome, (grupo, _) in CENARIOS.items() if nome in pedidos or grupo in pedidos]
+    desconhecidos = set(pedidos) - set(CENARIOS) - {grupo for grupo, _ in CENARIOS.values()}
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+    
+    print(f"🧪 Gerando base sintética (escala {args.escala}, semente {args.semente})...")
+    dados = gerar_dados(args.escala, args.semente)
+    print(f"   {len(dados.clientes)} clientes, {len(dados.contas)} contas em {dados.segundos_geracao}s")
+    contexto = Contexto(dados, args.escala, args.operacoes or ESCALAS[args.escala]["operacoes"],
+                        args.semente, args.threads)
+    
+    resultados = []
+    for nome in selecionados:
+        _, funcao = CENARIOS[nome]
+        # Cada cenário parte da mesma base, sem o que os anteriores gravaram
+        dados.restaurar()
+        inicio = time.perf_counter()
+        print(f"▶️  {nome}")
+        for resultado in funcao(contexto):
+            resultado["cenario"] = nome
+            resultados.append(resultado)
+            print("   " + formatar_resultado(resultado))
+        print(f"   ({time.perf_counter() - inicio:.1f}s)")
+    
+    meta = metadados(args.escala, args.semente)
+    meta.update(operacoes=contexto.operacoes, threads=args.threads, segundos_geracao=dados.segundos_geracao)
+    if args.saida:
+        salvar_resultados(args.saida, meta, resultados)
+        print(f"💾 Resultados gravados em: {args.saida}")
+    
+    # Saldo conservado, estado recuperado idêntico etc.: um número rápido com
+    # resultado errado não serve de base para nada
+    falhas = verificacoes_falhas(resultados)
+    for nome, campo, valor in falhas:
+        print(f"❌ {nome}: {campo} = {valor}")
+    
+    regressoes = []
+    if args.comparar:
+        linhas = comparar(carregar_resultados(args.comparar), {"meta": meta, "resultados": resultados},
+                          args.tolerancia)
+        regressoes = [linha for linha in linhas if linha[5]]
+        print(f"📊 Comparação com {args.comparar} (tolerância {args.tolerancia:.0%}):")
+        for nome, metrica, antes, depois, variacao, regressao in linhas:
+            marca = "❌" if regressao else "  "
+            print(f"{marca} {nome:<40} {metrica:<9} {antes:>14,.2f} → {depois:>14,.2f} ({variacao:+.1%})")
+        if regressoes:
+            print(f"⚠️ {len(regressoes)} regressões acima da tolerância")
+    return 1 if falhas or regressoes else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
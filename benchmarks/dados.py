@@ -0,0 +1,203 @@
+"""Gerador de dados sintéticos: clientes, contas e históricos de transações com distribuição assimétrica"""
+from array import array
+from dataclasses import dataclass, field
+from itertools import accumulate
+import csv
+import io
+import random
+import time
+
+import meu_banco
+
+# Tamanho da base, operações medidas por cenário, linhas do arquivo de importação
+# e os maiores tamanhos dos cenários de escala: cadastros nos índices (buscas),
+# registros no log (wal) e transações em um extrato (extrato_memoria)
+ESCALAS = {
+    "pequena": {"clientes": 1_000, "transacoes": 50_000, "operacoes": 2_000, "importacao": 20_000,
+                "buscas": 100_000, "wal": 100_000, "extrato_memoria": 1_000_000},
+    "media": {"clientes": 10_000, "transacoes": 500_000, "operacoes": 20_000, "importacao": 200_000,
+              "buscas": 1_000_000, "wal": 1_000_000, "extrato_memoria": 10_000_000},
+    "grande": {"clientes": 100_000, "transacoes": 5_000_000, "operacoes": 100_000, "importacao": 1_000_000,
+               "buscas": 1_000_000, "wal": 10_000_000, "extrato_memoria": 10_000_000},
+}
+
+# Expoente da lei de Zipf que distribui as transações entre as contas: poucas
+# contas concentram a maior parte do movimento, como em uma base real
+EXPOENTE_ZIPF = 1.1
+DIAS_HISTORICO = 90
+CAMPOS_IMPORTACAO = ("nome", "data_nascimento", "cpf", "logradouro", "numero", "bairro", "cidade_uf", "contas")
+
+NOMES = ("Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabela", "João",
+         "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vitória", "Yuri")
+SOBRENOMES = ("Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Almeida", "Ribeiro", "Gomes")
+CIDADES = ("São Paulo/SP", "Rio de Janeiro/RJ", "Belo Horizonte/MG", "Salvador/BA", "Fortaleza/CE",
+           "Curitiba/PR", "Recife/PE", "Porto Alegre/RS", "Manaus/AM", "Goiânia/GO")
+BAIRROS = ("Centro", "Jardim América", "Vila Nova", "Boa Vista", "Santa Cecília", "Liberdade")
+
+def cpf_sintetico(indice):
+    """CPF de 11 dígitos único por índice (7919 é primo com 10^11, então não há colisões)"""
+    return f"{(indice * 7919 + 10**10) % 10**11:011d}"
+
+def gerar_cliente(indice, rng):
+    """Cliente no formato do corpo de /criar_cliente"""
+    return {
+        "nome": f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}",
+        "data_nascimento": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1940, 2005)}",
+        "cpf": cpf_sintetico(indice),
+        "logradouro": f"Rua {rng.choice(SOBRENOMES)}",
+        "numero": str(rng.randint(1, 9999)),
+        "bairro": rng.choice(BAIRROS),
+        "cidade_uf": rng.choice(CIDADES)
+    }
+
+def valor_sintetico(rng):
+    """Valor em centavos com distribuição log-normal (mediana perto de R$ 80)"""
+    return max(int(rng.lognormvariate(9.0, 1.2)), 1)
+
+def pesos_zipf(quantidade):
+    """Pesos acumulados 1/k^s para sortear posições 0..quantidade-1 com assimetria"""
+    return list(accumulate(1 / (posicao ** EXPOENTE_ZIPF) for posicao in range(1, quantidade + 1)))
+
+def gerar_extrato(quantidade, rng, agora):
+    """
+    Histórico com `quantidade` transações nos últimos DIAS_HISTORICO dias
+    Returns:
+        tuple: (extrato, saldo final em centavos)
+    """
+    extrato = meu_banco.Extrato()
+    saldo = 0
+    inicio = agora - DIAS_HISTORICO * 24 * 60 * 60
+    for timestamp in sorted(rng.uniform(inicio, agora) for _ in range(quantidade)):
+        valor = valor_sintetico(rng)
+        # Cerca de um terço das transações são saques, sempre cobertos pelo saldo
+        if saldo >= valor and rng.random() < 0.35:
+            extrato.adicionar("Saque", valor, timestamp)
+            saldo -= valor
+        else:
+            extrato.adicionar("Depósito", valor, timestamp)
+            saldo += valor
+    return extrato, saldo
+
+def copiar_extrato(extrato):
+    """Cópia independente das colunas e totais de um extrato em memória"""
+    copia = meu_banco.Extrato()
+    for coluna in ('valores', 'timestamps', 'tipos', 'contrapartes'):
+        origem = getattr(extrato, coluna)
+        setattr(copia, coluna, array(origem.typecode, origem))
+    for total in ('total_depositos', 'total_saques', 'numero_depositos', 'numero_saques',
+                  'total_transferencias_enviadas', 'total_transferencias_recebidas'):
+        setattr(copia, total, getattr(extrato, total))
+    return copia
+
+@dataclass
+class ConjuntoDados:
+    """Base sintética pronta para ser (re)carregada nos índices do meu_banco"""
+    clientes: list
+    # (registro da conta, extrato original) de cada conta, na ordem de criação
+    contas: list
+    # Números das contas da mais para a menos movimentada e pesos acumulados de Zipf
+    numeros_por_movimento: list
+    pesos: list = field(repr=False)
+    segundos_geracao: float = 0.0
+    
+    @property
+    def numeros(self):
+        return [registro['numero_conta'] for registro, _ in self.contas]
+    
+    @property
+    def cpfs(self):
+        return [cliente.cpf for cliente in self.clientes]
+    
+    def sortear_contas(self, quantidade, rng):
+        """Sequência de contas com a mesma assimetria do histórico (as quentes se repetem)"""
+        return rng.choices(self.numeros_por_movimento, cum_weights=self.pesos, k=quantidade)
+    
+    def restaurar(self):
+        """Substitui o estado do meu_banco por uma cópia limpa da base gerada"""
+        meu_banco.configurar_persistencia(meu_banco.PersistenciaMemoria())
+        meu_banco.carregar_estado({"clientes": [], "contas": [], "numero_conta_sequencial": 1})
+        for cliente in self.clientes:
+            meu_banco.indexar_cliente(cliente)
+        for registro, extrato in self.contas:
+            meu_banco.indexar_conta(meu_banco.Conta.de_registro(registro, extrato=copiar_extrato(extrato)))
+        meu_banco.resumo.reconstruir(meu_banco.contas)
+        meu_banco.numero_conta_sequencial = len(self.contas) + 1
+
+def gerar_dados(escala="pequena", semente=42):
+    """
+    Gera a base sintética de forma determinística
+    Args:
+        escala: chave de ESCALAS
+        semente: semente do gerador pseudoaleatório
+    Returns:
+        ConjuntoDados
+    """
+    parametros = ESCALAS[escala]
+    rng = random.Random(semente)
+    inicio = time.perf_counter()
+    agora = time.time()
+    
+    clientes = []
+    numeros_e_cpfs = []
+    for indice in range(parametros["clientes"]):
+        dados = gerar_cliente(indice, rng)
+        cliente = meu_banco.Cliente(dados["nome"], dados["data_nascimento"], dados["cpf"], {
+            campo: dados[campo] for campo in ("logradouro", "numero", "bairro", "cidade_uf")
+        })
+        clientes.append(cliente)
+        # 1 conta para a maioria, 2 ou 3 para uma parte dos clientes
+        for _ in range(1 + (rng.random() < 0.3) + (rng.random() < 0.05)):
+            numeros_e_cpfs.append((len(numeros_e_cpfs) + 1, cliente.cpf))
+    
+    # Ordem de movimento aleatória: a conta mais movimentada não é a primeira criada
+    numeros_por_movimento = [numero for numero, _ in numeros_e_cpfs]
+    rng.shuffle(numeros_por_movimento)
+    pesos = pesos_zipf(len(numeros_por_movimento))
+    por_conta = dict.fromkeys(numeros_por_movimento, 0)
+    for numero in rng.choices(numeros_por_movimento, cum_weights=pesos, k=parametros["transacoes"]):
+        por_conta[numero] += 1
+    
+    contas = []
+    for numero, cpf in numeros_e_cpfs:
+        extrato, saldo = gerar_extrato(por_conta[numero], rng, agora)
+        registro = meu_banco.Conta(numero_conta=numero, cpf_titular=cpf, saldo=saldo).para_registro()
+        contas.append((registro, extrato))
+    
+    return ConjuntoDados(clientes, contas, numeros_por_movimento, pesos,
+                         round(time.perf_counter() - inicio, 3))
+
+def liberar_limites(numeros):
+    """Remove os limites de saque das contas, para medir saques sem esbarrar nas regras diárias"""
+    for numero in numeros:
+        conta = meu_banco.buscar_conta(numero)
+        conta.limite_saque = 10**12
+        conta.limite_saques_diarios = 10**9
+        conta.limite_valor_diario = None
+        conta.saques_recentes = None
+        # Pelo caminho normal, para o resumo do banco continuar coerente
+        meu_banco.realizar_deposito(conta, 10**12)
+
+def arquivo_importacao(quantidade, semente=42, formato="csv", primeiro_indice=10**7, duplicadas=0.01):
+    """
+    Texto de um arquivo de importação com `quantidade` linhas
+    Args:
+        primeiro_indice: índice do primeiro CPF (longe dos usados por gerar_dados)
+        duplicadas: fração de linhas que repetem um CPF anterior (são rejeitadas)
+    """
+    rng = random.Random(semente)
+    saida = io.StringIO()
+    if formato == 'csv':
+        escritor = csv.DictWriter(saida, fieldnames=CAMPOS_IMPORTACAO, lineterminator="\n")
+        escritor.writeheader()
+        escrever = escritor.writerow
+    else:
+        def escrever(linha):
+            saida.write(meu_banco.codificar_json(linha).decode('utf-8') + "\n")
+    for posicao in range(quantidade):
+        indice = primeiro_indice + posicao
+        if posicao and rng.random() < duplicadas:
+            indice = primeiro_indice + rng.randrange(posicao)
+        linha = gerar_cliente(indice, rng)
+        linha["contas"] = 1 + (rng.random() < 0.3)
+        escrever(linha)
+    return saida.getvalue()
@@ -0,0 +1,261 @@
+"""Medição dos cenários: latência por operação, vazão, pico de memória e comparação de resultados"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import meu_banco
+
+# Cenários registrados por nucleo.py e rotas.py: nome -> (grupo, função)
+CENARIOS = {}
+
+# Campos de verificação que os cenários incluem nos resultados e o valor
+# esperado; qualquer divergência faz a linha de comando sair com código 1
+VERIFICACOES = {
+    "saldo_conservado": True,
+    "estado_identico": True,
+    "falhas_propriedades": 0,
+    "sobrecarga_aceitavel": True,
+    "escala_aceitavel": True,
+    "rapido_como_float": True,
+}
+
+# Operações medidas de novo com o tracemalloc ligado (ele deixa tudo bem mais
+# lento, por isso a passada de memória é separada da de tempo e menor)
+AMOSTRA_MEMORIA = 2_000
+
+@dataclass
+class Contexto:
+    """Parâmetros da execução repassados a todos os cenários"""
+    dados: object
+    escala: str
+    operacoes: int
+    semente: int
+    threads: int = 8
+    
+    def rng(self):
+        """Gerador novo e determinístico: cada cenário sorteia a mesma sequência em toda execução"""
+        return random.Random(self.semente)
+
+def cenario(grupo):
+    """Registra a função como cenário; ela recebe o contexto e retorna uma lista de resultados"""
+    def registrar(funcao):
+        CENARIOS[funcao.__name__.removeprefix('cenario_')] = (grupo, funcao)
+        return funcao
+    return registrar
+
+def percentil(ordenados, fracao):
+    """Percentil pelo método nearest-rank sobre uma lista já ordenada"""
+    if not ordenados:
+        return 0.0
+    posicao = max(int(round(fracao * len(ordenados) + 0.5)) - 1, 0)
+    return ordenados[min(posicao, len(ordenados) - 1)]
+
+def _resultado(nome, latencias, segundos, memoria_pico, extra):
+    latencias.sort()
+    resultado = {
+        "nome": nome,
+        "operacoes": len(latencias),
+        "segundos": round(segundos, 6),
+        "ops_s": round(len(latencias) / segundos, 1) if segundos else None,
+        "p50_us": round(percentil(latencias, 0.50) / 1000, 2),
+        "p99_us": round(percentil(latencias, 0.99) / 1000, 2),
+        "memoria_pico_kb": memoria_pico
+    }
+    resultado.update(extra or {})
+    return resultado
+
+def _pico_de_memoria(operacao, quantidade):
+    """Maior alocação (KiB) acima do início enquanto a operação é repetida"""
+    ja_rastreando = tracemalloc.is_tracing()
+    if not ja_rastreando:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    inicial, _ = tracemalloc.get_traced_memory()
+    for i in range(quantidade):
+        operacao(i)
+    _, pico = tracemalloc.get_traced_memory()
+    if not ja_rastreando:
+        tracemalloc.stop()
+    return round(max(pico - inicial, 0) / 1024, 1)
+
+def medir(nome, operacao, quantidade, *, aquecimento=100, memoria=True, extra=None):
+    """
+    Executa a operação `quantidade` vezes medindo cada chamada
+    Args:
+        nome: nome do resultado
+        operacao: função chamada com o índice da repetição (0..quantidade-1)
+        quantidade: repetições medidas
+        aquecimento: repetições descartadas antes da medição
+        memoria: se True, repete uma amostra com o tracemalloc para o pico de memória
+        extra: campos adicionais incluídos no resultado
+    Returns:
+        dict: ops/s, p50/p99 em microssegundos e pico de memória
+    """
+    for i in range(min(aquecimento, quantidade)):
+        operacao(i)
+    
+    latencias = [0] * quantidade
+    relogio = time.perf_counter_ns
+    inicio = relogio()
+    for i in range(quantidade):
+        antes = relogio()
+        operacao(i)
+        latencias[i] = relogio() - antes
+    segundos = (relogio() - inicio) / 1e9
+    
+    memoria_pico = _pico_de_memoria(operacao, min(quantidade, AMOSTRA_MEMORIA)) if memoria else None
+    return _resultado(nome, latencias, segundos, memoria_pico, extra)
+
+def medir_concorrente(nome, operacao, quantidade, threads, *, extra=None):
+    """
+    Divide `quantidade` chamadas entre `threads` threads que começam juntas
+    
+    A vazão é a do conjunto (operações / tempo de parede); o pico de memória
+    não é medido, já que o tracemalloc serializaria as threads.
+    """
+    por_thread = [quantidade // threads + (1 if i < quantidade % threads else 0) for i in range(threads)]
+    largada = threading.Barrier(threads + 1)
+    relogio = time.perf_counter_ns
+    
+    def executar(indice):
+        latencias = [0] * por_thread[indice]
+        deslocamento = sum(por_thread[:indice])
+        largada.wait()
+        for i in range(por_thread[indice]):
+            antes = relogio()
+            operacao(deslocamento + i)
+            latencias[i] = relogio() - antes
+        return latencias
+    
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futuros = [executor.submit(executar, i) for i in range(threads)]
+        largada.wait()
+        inicio = relogio()
+        latencias = [latencia for futuro in futuros for latencia in futuro.result()]
+        segundos = (relogio() - inicio) / 1e9
+    
+    return _resultado(nome, latencias, segundos, None, dict(extra or {}, threads=threads))
+
+def medir_unica(nome, funcao, *, memoria=True, extra=None):
+    """
+    Mede uma execução longa (importação, recuperação): tempo total e pico de memória
+    
+    Com memoria=False o tracemalloc fica desligado, para execuções em que ele
+    multiplicaria o tempo (milhões de chamadas pequenas).
+    """
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    retorno = funcao()
+    segundos = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    resultado = {
+        "nome": nome,
+        "operacoes": 1,
+        "segundos": round(segundos, 6),
+        "ops_s": None,
+        "p50_us": None,
+        "p99_us": None,
+        "memoria_pico_kb": round(pico / 1024, 1) if memoria else None
+    }
+    resultado.update(extra or {})
+    if isinstance(retorno, dict):
+        resultado.update(retorno)
+    return resultado
+
+def _commit_atual():
+    try:
+        saida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(meu_banco.__file__)), timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return saida.stdout.strip() or None
+
+def metadados(escala, semente):
+    """Ambiente da execução, gravado junto dos resultados para a comparação fazer sentido"""
+    dados = {
+        "data_hora": datetime.now().isoformat(timespec='seconds'),
+        "commit": _commit_atual(),
+        "python": sys.version.split()[0],
+        "implementacao": platform.python_implementation(),
+        "plataforma": platform.platform(),
+        "processadores": os.cpu_count(),
+        "orjson": meu_banco.orjson is not None,
+        "escala": escala,
+        "semente": semente
+    }
+    if resource is not None:
+        # ru_maxrss vem em KiB no Linux e em bytes no macOS
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        dados["rss_maximo_kb"] = maximo // 1024 if sys.platform == 'darwin' else maximo
+    return dados
+
+def salvar_resultados(caminho, meta, resultados):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({"meta": meta, "resultados": resultados}, arquivo, ensure_ascii=False, indent=2)
+        arquivo.write("\n")
+
+def carregar_resultados(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def comparar(base, atual, tolerancia=0.10):
+    """
+    Compara duas execuções resultado a resultado
+    Args:
+        base, atual: conteúdos de arquivos gravados por salvar_resultados
+        tolerancia: piora relativa aceita (0.10 = 10%) em ops/s, p99 ou tempo total
+    Returns:
+        list: (nome, métrica, valor base, valor atual, variação, regressão?) de cada métrica comparável
+    """
+    anteriores = {resultado['nome']: resultado for resultado in base['resultados']}
+    linhas = []
+    for resultado in atual['resultados']:
+        anterior = anteriores.get(resultado['nome'])
+        if anterior is None:
+            continue
+        # Em ops/s maior é melhor; em p99 e tempo total, menor é melhor
+        metricas = (("ops_s", False), ("p99_us", True)) if resultado.get('ops_s') else (("segundos", True),)
+        for metrica, menor_melhor in metricas:
+            antes, depois = anterior.get(metrica), resultado.get(metrica)
+            if not antes or depois is None:
+                continue
+            variacao = (depois - antes) / antes
+            piora = variacao if menor_melhor else -variacao
+            linhas.append((resultado['nome'], metrica, antes, depois, variacao, piora > tolerancia))
+    return linhas
+
+def verificacoes_falhas(resultados):
+    """(nome do resultado, campo, valor obtido) de cada verificação que não deu o valor esperado"""
+    return [(resultado['nome'], campo, resultado[campo]) for resultado in resultados
+            for campo, esperado in VERIFICACOES.items() if campo in resultado and resultado[campo] != esperado]
+
+def formatar_resultado(resultado):
+    """Linha da tabela exibida no terminal"""
+    if resultado.get('ops_s') is None:
+        desempenho = f"{resultado['segundos']:>12.3f} s"
+    else:
+        desempenho = (f"{resultado['ops_s']:>12,.0f} ops/s  p50 {resultado['p50_us']:>9.1f} µs"
+                      f"  p99 {resultado['p99_us']:>9.1f} µs")
+    memoria = resultado.get('memoria_pico_kb')
+    memoria = f"  mem {memoria:>9,.1f} KiB" if memoria is not None else ""
+    if 'bytes_por_transacao' in resultado:
+        memoria += f"  {resultado['bytes_por_transacao']:>6.1f} B/transação"
+    return f"{resultado['nome']:<40} {desempenho}{memoria}"
@@ -0,0 +1,440 @@
+"""Cenários que chamam as funções do meu_banco diretamente, sem passar pelo Flask"""
+from datetime import datetime
+from decimal import Decimal
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import meu_banco
+
+from .dados import ESCALAS, arquivo_importacao, cpf_sintetico, liberar_limites, valor_sintetico
+from .medicao import cenario, medir, medir_concorrente, medir_unica
+
+# Operações por chamada nos cenários de lote
+TAMANHO_LOTE = 100
+# Depósitos por lote (e por fsync) usados para encher o log até o tamanho da escala
+TAMANHO_LOTE_WAL = 1_000
+# Transações no formato antigo (lista de dicts) medidas para comparar com o extrato colunar
+AMOSTRA_EXTRATO_DICTS = 100_000
+# Contas disputadas no cenário de contenção: poucas, para forçar espera nos locks
+CONTAS_DISPUTADAS = 16
+# Saldo inicial do cenário de centavos contra float (nenhum saque é recusado),
+# rodadas de medição e a piora aceita do caminho em centavos em relação ao
+# mesmo caminho em float
+SALDO_INICIAL_FLOAT = 10**12
+RODADAS_CENTAVOS_FLOAT = 3
+TOLERANCIA_CENTAVOS_FLOAT = 0.2
+
+def _contas_sorteadas(contexto, quantidade, rng):
+    return [meu_banco.buscar_conta(numero) for numero in contexto.dados.sortear_contas(quantidade, rng)]
+
+def _saldo_total():
+    return sum(conta.saldo for conta in meu_banco.contas)
+
+@cenario("nucleo")
+def cenario_operacoes(contexto):
+    """deposito, saque e transferencia (funções puras) sobre os extratos das contas sorteadas"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    contas = _contas_sorteadas(contexto, quantidade, rng)
+    destinos = _contas_sorteadas(contexto, quantidade, rng)
+    valores = [valor_sintetico(rng) for _ in range(quantidade)]
+    # Saldo e limites folgados: o que se mede é o caminho de sucesso
+    liberar_limites({conta.numero_conta for conta in contas + destinos})
+    
+    def depositar(i):
+        conta = contas[i]
+        conta.saldo, _ = meu_banco.deposito(conta.saldo, valores[i], conta.extrato)
+    
+    def sacar(i):
+        conta = contas[i]
+        conta.saldo, _, _ = meu_banco.saque(
+            saldo=conta.saldo, valor=valores[i], extrato=conta.extrato, limite=conta.limite_saque,
+            numero_saques=0, limite_saques=conta.limite_saques_diarios
+        )
+    
+    def transferir(i):
+        origem, destino = contas[i], destinos[i]
+        if origem is destino:
+            return
+        origem.saldo, destino.saldo = meu_banco.transferencia(
+            origem.saldo, destino.saldo, valores[i],
+            extrato_origem=origem.extrato, extrato_destino=destino.extrato,
+            numero_origem=origem.numero_conta, numero_destino=destino.numero_conta
+        )
+    
+    return [
+        medir("nucleo.deposito", depositar, quantidade),
+        medir("nucleo.saque", sacar, quantidade),
+        medir("nucleo.transferencia", transferir, quantidade),
+    ]
+
+@cenario("nucleo")
+def cenario_extrato(contexto):
+    """exibir_extrato completo e só com totais, e uma página de 100 transações"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    contas = _contas_sorteadas(contexto, quantidade, rng)
+    cursores = [rng.randrange(max(len(conta.extrato) - 100, 1)) for conta in contas]
+    tamanho_medio = sum(len(conta.extrato) for conta in contas) / quantidade
+    
+    def completo(i):
+        meu_banco.exibir_extrato(contas[i].saldo, extrato=contas[i].extrato)
+    
+    def totais(i):
+        meu_banco.exibir_extrato(contas[i].saldo, extrato=contas[i].extrato, incluir_transacoes=False)
+    
+    def pagina(i):
+        contas[i].extrato.pagina(cursor=cursores[i], limite=100)
+    
+    # O extrato completo das contas quentes tem milhares de linhas; menos repetições
+    return [
+        medir("nucleo.exibir_extrato", completo, max(quantidade // 10, 10),
+              extra={"transacoes_por_extrato": round(tamanho_medio, 1)}),
+        medir("nucleo.exibir_extrato_totais", totais, quantidade),
+        medir("nucleo.extrato_pagina_100", pagina, quantidade),
+    ]
+
+@cenario("nucleo")
+def cenario_buscas(contexto):
+    """Consultas nos índices por número de conta e por CPF"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    cpfs = [rng.choice(contexto.dados.clientes).cpf for _ in range(quantidade)]
+    return [
+        medir("nucleo.buscar_conta", lambda i: meu_banco.buscar_conta(numeros[i]), quantidade),
+        medir("nucleo.buscar_cliente_por_cpf", lambda i: meu_banco.buscar_cliente_por_cpf(cpfs[i]), quantidade),
+        medir("nucleo.buscar_contas_por_cpf", lambda i: meu_banco.buscar_contas_por_cpf(cpfs[i]), quantidade),
+    ]
+
+@cenario("nucleo")
+def cenario_buscas_escala(contexto):
+    """Buscas por número de conta e por CPF com de 1 mil cadastros até o máximo da escala (1 milhão)"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    # Endereço e extrato compartilhados: o que cresce são só os índices
+    endereco = dict(contexto.dados.clientes[0].endereco)
+    extrato = meu_banco.Extrato()
+    meu_banco.carregar_estado({"clientes": [], "contas": [], "numero_conta_sequencial": 1})
+    
+    resultados = []
+    tamanho = 1_000
+    while tamanho <= ESCALAS[contexto.escala]["buscas"]:
+        for indice in range(len(meu_banco.contas), tamanho):
+            cpf = cpf_sintetico(indice)
+            meu_banco.indexar_cliente(meu_banco.Cliente("Ana Silva", "01/01/1990", cpf, endereco))
+            meu_banco.indexar_conta(meu_banco.Conta(numero_conta=indice + 1, cpf_titular=cpf, extrato=extrato))
+        numeros = [rng.randint(1, tamanho) for _ in range(quantidade)]
+        cpfs = [cpf_sintetico(numero - 1) for numero in numeros]
+        extra = {"cadastros": tamanho}
+        resultados += [
+            medir(f"escala.buscar_conta_{tamanho}", lambda i: meu_banco.buscar_conta(numeros[i]), quantidade,
+                  memoria=False, extra=extra),
+            medir(f"escala.buscar_cliente_por_cpf_{tamanho}", lambda i: meu_banco.buscar_cliente_por_cpf(cpfs[i]),
+                  quantidade, memoria=False, extra=extra),
+        ]
+        tamanho *= 10
+    return resultados
+
+@cenario("nucleo")
+def cenario_servicos(contexto):
+    """Serviços completos: locks, métricas, resumo e persistência (em memória)"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    destinos = contexto.dados.sortear_contas(quantidade, rng)
+    valores = [valor_sintetico(rng) for _ in range(quantidade)]
+    liberar_limites(set(numeros + destinos))
+    
+    def transferir(i):
+        if numeros[i] != destinos[i]:
+            meu_banco.servico_transferir(numeros[i], destinos[i], valores[i])
+    
+    return [
+        medir("servico.depositar", lambda i: meu_banco.servico_depositar(numeros[i], valores[i]), quantidade),
+        medir("servico.sacar", lambda i: meu_banco.servico_sacar(numeros[i], valores[i]), quantidade),
+        medir("servico.transferir", transferir, quantidade),
+    ]
+
+@cenario("nucleo")
+def cenario_lote(contexto):
+    """Um lote de TAMANHO_LOTE depósitos contra a mesma quantidade de chamadas avulsas"""
+    rng = contexto.rng()
+    chamadas = max(contexto.operacoes // TAMANHO_LOTE, 10)
+    numeros = contexto.dados.sortear_contas(chamadas * TAMANHO_LOTE, rng)
+    valores = [valor_sintetico(rng) for _ in numeros]
+    lotes = [[{"tipo": "deposito", "numero_conta": numeros[j], "valor": meu_banco.reais(valores[j])}
+              for j in range(i * TAMANHO_LOTE, (i + 1) * TAMANHO_LOTE)] for i in range(chamadas)]
+    
+    def avulsos(i):
+        for j in range(i * TAMANHO_LOTE, (i + 1) * TAMANHO_LOTE):
+            meu_banco.servico_depositar(numeros[j], valores[j])
+    
+    extra = {"operacoes_por_chamada": TAMANHO_LOTE}
+    return [
+        medir("servico.lote_depositos", lambda i: meu_banco.executar_lote(lotes[i]), chamadas,
+              aquecimento=1, extra=extra),
+        medir("servico.depositos_avulsos", avulsos, chamadas, aquecimento=1, extra=extra),
+    ]
+
+@cenario("nucleo")
+def cenario_contencao(contexto):
+    """Transferências concorrentes entre poucas contas; confere que o saldo total se conserva"""
+    rng = contexto.rng()
+    disputadas = [meu_banco.buscar_conta(numero) for numero in contexto.dados.numeros_por_movimento[:CONTAS_DISPUTADAS]]
+    liberar_limites(conta.numero_conta for conta in disputadas)
+    quantidade = contexto.operacoes
+    pares = []
+    while len(pares) < quantidade:
+        origem, destino = rng.sample(disputadas, 2)
+        pares.append((origem, destino, valor_sintetico(rng)))
+    
+    resultados = []
+    for threads in sorted({1, contexto.threads, 64}):
+        antes = _saldo_total()
+        resultado = medir_concorrente(f"contencao.transferencia_{threads}_threads",
+                                      lambda i: meu_banco.realizar_transferencia(*pares[i]),
+                                      quantidade, threads)
+        resultado["saldo_conservado"] = _saldo_total() == antes == meu_banco.resumo.dados()["saldo_total"]
+        resultados.append(resultado)
+    return resultados
+
+@cenario("nucleo")
+def cenario_json(contexto):
+    """Codificação e decodificação dos payloads típicos das rotas (codec do meu_banco e json puro)"""
+    quantidade = contexto.operacoes
+    conta_quente = contexto.dados.numeros_por_movimento[0]
+    payloads = {
+        "deposito": meu_banco.servico_depositar(conta_quente, 12345),
+        "extrato_quente": meu_banco.servico_extrato(conta_quente),
+        "extrato_pagina": meu_banco.servico_extrato(conta_quente, {"cursor": 0, "limite": 100,
+                                                                   "inicio": None, "fim": None}),
+        "listar_contas_1000": [info for _, info in zip(range(1000), meu_banco.iterar_contas_info())],
+    }
+    
+    resultados = []
+    for nome, payload in payloads.items():
+        codificado = meu_banco.codificar_json(payload)
+        # Payloads grandes levam milissegundos; menos repetições
+        repeticoes = max(min(quantidade, quantidade * 1000 // len(codificado)), 10)
+        extra = {"bytes": len(codificado)}
+        resultados += [
+            medir(f"json.codificar.{nome}", lambda i: meu_banco.codificar_json(payload), repeticoes, extra=extra),
+            medir(f"json.decodificar.{nome}", lambda i: meu_banco.decodificar_json(codificado), repeticoes,
+                  extra=extra),
+            medir(f"json.stdlib_dumps.{nome}", lambda i: json.dumps(payload, ensure_ascii=False), repeticoes,
+                  extra=extra),
+        ]
+    return resultados
+
+@cenario("nucleo")
+def cenario_centavos(contexto):
+    """Conversão de valores e verificação das propriedades da aritmética em centavos"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    centavos = [rng.randrange(1, 10**13) for _ in range(quantidade)]
+    textos = [f"{valor // 100}.{valor % 100:02d}" for valor in centavos]
+    
+    # Ida e volta exata (texto e float) e somas iguais às feitas com Decimal
+    falhas = sum(meu_banco.para_centavos(texto) != valor or meu_banco.para_centavos(meu_banco.reais(valor)) != valor
+                 for texto, valor in zip(textos, centavos))
+    soma_decimal = sum(Decimal(texto) for texto in textos)
+    falhas += int(soma_decimal.scaleb(2)) != sum(centavos)
+    
+    extra = {"falhas_propriedades": falhas}
+    return [
+        medir("centavos.de_texto", lambda i: meu_banco.para_centavos(textos[i]), quantidade, extra=extra),
+        medir("centavos.de_float", lambda i: meu_banco.para_centavos(meu_banco.reais(centavos[i])), quantidade),
+        medir("centavos.formatar_reais", lambda i: meu_banco.formatar_reais(centavos[i]), quantidade),
+    ]
+
+@cenario("nucleo")
+def cenario_centavos_operacoes(contexto):
+    """
+    deposito + saque com o saldo em reais (float, como antes dos centavos) e em
+    centavos inteiros, sobre o mesmo extrato em lista, e em centavos sobre o
+    extrato colunar; confere a velocidade e a diferença entre os saldos finais
+    """
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    depositos = [valor_sintetico(rng) for _ in range(quantidade)]
+    saques = [valor_sintetico(rng) for _ in range(quantidade)]
+    sem_limites = {"limite": meu_banco.SALDO_MAXIMO, "numero_saques": 0, "limite_saques": 1}
+    
+    def caminho(saldo, depositos, saques, extrato):
+        """Operação medida e a função que lê o saldo ao final"""
+        estado = [saldo]
+        
+        def operar(i):
+            saldo, _ = meu_banco.deposito(estado[0], depositos[i], extrato)
+            estado[0], _, _ = meu_banco.saque(saldo=saldo, valor=saques[i], extrato=extrato, **sem_limites)
+        return operar, lambda: estado[0]
+    
+    em_float, saldo_float = caminho(SALDO_INICIAL_FLOAT / 100, [valor / 100 for valor in depositos],
+                                    [valor / 100 for valor in saques], [])
+    em_centavos, saldo_centavos = caminho(SALDO_INICIAL_FLOAT, depositos, saques, [])
+    colunar, _ = caminho(SALDO_INICIAL_FLOAT, depositos, saques, meu_banco.Extrato())
+    
+    # Rodadas alternadas, ficando a melhor de cada caminho: a diferença esperada
+    # é menor que o ruído de uma medição isolada
+    melhores = {}
+    for _ in range(RODADAS_CENTAVOS_FLOAT):
+        for nome, operacao in (("float", em_float), ("centavos", em_centavos), ("colunar", colunar)):
+            # Sem coletas completas da base inteira no meio de uma medição curta
+            gc.collect()
+            gc.freeze()
+            try:
+                resultado = medir(f"centavos.deposito_saque_{nome}", operacao, quantidade)
+            finally:
+                gc.unfreeze()
+            if nome not in melhores or resultado["ops_s"] > melhores[nome]["ops_s"]:
+                melhores[nome] = resultado
+    resultados = list(melhores.values())
+    # As duas passadas fazem as mesmas chamadas; a de centavos é exata
+    relacao = resultados[1]["ops_s"] / resultados[0]["ops_s"]
+    resultados[1].update(relacao_float=round(relacao, 3), rapido_como_float=relacao >= 1 - TOLERANCIA_CENTAVOS_FLOAT,
+                         deriva_float_centavos=abs(saldo_float() * 100 - saldo_centavos()))
+    return resultados
+
+@cenario("nucleo")
+def cenario_metricas(contexto):
+    """Custo de instrumentação por operação e da exportação para o Prometheus"""
+    quantidade = contexto.operacoes
+    rotulos = (("op", "deposito"), ("resultado", "sucesso"))
+    
+    def observar(i):
+        meu_banco.metricas.contar("meu_banco_benchmark_total", rotulos)
+        meu_banco.metricas.observar("meu_banco_benchmark_segundos", rotulos, 0.0001)
+    
+    return [
+        medir("metricas.contar_e_observar", observar, quantidade),
+        medir("metricas.exportar", lambda i: meu_banco.Metricas.exportar(meu_banco.metricas.coletar()),
+              max(quantidade // 100, 10)),
+        medir("resumo.dados", lambda i: meu_banco.formatar_resumo(meu_banco.resumo.dados(10, 30)), quantidade),
+    ]
+
+@cenario("nucleo")
+def cenario_feed(contexto):
+    """Leitura de blocos do feed de alterações depois de uma rodada de depósitos"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    inicio = meu_banco.feed_alteracoes.proxima
+    for numero in numeros:
+        meu_banco.servico_depositar(numero, valor_sintetico(rng))
+    comecos = [inicio + rng.randrange(max(quantidade - TAMANHO_LOTE, 1)) for _ in range(quantidade)]
+    
+    return [
+        medir(f"feed.ler_{TAMANHO_LOTE}", lambda i: meu_banco.servico_alteracoes(comecos[i], TAMANHO_LOTE),
+              quantidade, extra={"eventos_por_chamada": TAMANHO_LOTE}),
+    ]
+
+@cenario("nucleo")
+def cenario_importacao(contexto):
+    """Importação em massa de CSV e NDJSON (inclui ~1% de CPFs repetidos)"""
+    linhas = ESCALAS[contexto.escala]["importacao"]
+    resultados = []
+    for formato in meu_banco.FORMATOS_IMPORTACAO:
+        texto = arquivo_importacao(linhas, contexto.semente, formato)
+        contexto.dados.restaurar()
+        
+        def importar():
+            for evento in meu_banco.importar_cadastros(io.StringIO(texto), formato):
+                if "resumo" in evento:
+                    return {chave: evento["resumo"][chave] for chave in ("linhas", "clientes", "contas", "rejeitadas")}
+        
+        resultado = medir_unica(f"importacao.{formato}", importar)
+        resultado["linhas_s"] = round(resultado["linhas"] / resultado["segundos"], 1)
+        resultados.append(resultado)
+    return resultados
+
+@cenario("nucleo")
+def cenario_wal(contexto):
+    """
+    Depósitos com o log em disco (sequenciais, concorrentes com group commit e
+    em lotes até o tamanho da escala, 10 milhões de registros na grande) e a
+    recuperação do log inteiro a partir do snapshot inicial
+    """
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    valores = [valor_sintetico(rng) for _ in range(quantidade)]
+    chamadas = -(-max(ESCALAS[contexto.escala]["wal"] - 2 * quantidade, 0) // TAMANHO_LOTE_WAL)
+    lotes = [[{"tipo": "deposito", "numero_conta": numero, "valor": meu_banco.reais(valor_sintetico(rng))}
+              for numero in contexto.dados.sortear_contas(TAMANHO_LOTE_WAL, rng)]
+             for _ in range(min(chamadas, 100))]
+    
+    with tempfile.TemporaryDirectory(prefix="meu-banco-bench-") as diretorio:
+        meu_banco.configurar_persistencia(meu_banco.PersistenciaWAL(diretorio, registros_por_snapshot=10**9))
+        meu_banco.persistencia.snapshot()
+        # Cada depósito sequencial espera um fsync
+        resultados = [
+            medir("wal.deposito", lambda i: meu_banco.servico_depositar(numeros[i], valores[i]), quantidade,
+                  aquecimento=0, memoria=False),
+            medir_concorrente(f"wal.deposito_{contexto.threads}_threads",
+                              lambda i: meu_banco.servico_depositar(numeros[i], valores[i]),
+                              quantidade, contexto.threads),
+        ]
+        if chamadas:
+            resultado = medir("wal.lote_depositos", lambda i: meu_banco.executar_lote(lotes[i % len(lotes)]),
+                              chamadas, aquecimento=0, memoria=False,
+                              extra={"operacoes_por_chamada": TAMANHO_LOTE_WAL})
+            resultado["registros_s"] = round(resultado["ops_s"] * TAMANHO_LOTE_WAL, 1)
+            resultados.append(resultado)
+        estado = {conta.numero_conta: (conta.saldo, len(conta.extrato)) for conta in meu_banco.contas}
+        meu_banco.configurar_persistencia(meu_banco.PersistenciaMemoria())
+        tamanho = sum(os.path.getsize(os.path.join(diretorio, nome)) for nome in os.listdir(diretorio))
+        
+        # Sem tracemalloc: com milhões de registros ele dominaria o tempo de recuperação
+        backend = meu_banco.PersistenciaWAL(diretorio)
+        resultado = medir_unica("wal.recuperacao", lambda: {"registros_reaplicados": backend.recuperar()},
+                                memoria=False, extra={"bytes_em_disco": tamanho})
+        backend.fechar()
+        resultado["registros_s"] = round(resultado["registros_reaplicados"] / resultado["segundos"], 1)
+        resultado["estado_identico"] = estado == {conta.numero_conta: (conta.saldo, len(conta.extrato))
+                                                  for conta in meu_banco.contas}
+        resultados.append(resultado)
+    return resultados
+
+@cenario("nucleo")
+def cenario_memoria_extrato(contexto):
+    """Memória do extrato colunar com de 1 milhão de transações até o máximo da escala, contra a lista de dicts"""
+    rng = contexto.rng()
+    valores = [valor_sintetico(rng) for _ in range(1_000)]
+    colunas = ('valores', 'timestamps', 'tipos', 'contrapartes')
+    
+    resultados = []
+    tamanho = 1_000_000
+    while tamanho <= ESCALAS[contexto.escala]["extrato_memoria"]:
+        extrato = meu_banco.Extrato()
+        inicio = time.time() - tamanho
+        
+        def preencher(extrato=extrato, tamanho=tamanho, inicio=inicio):
+            for i in range(tamanho):
+                extrato.adicionar("Depósito", valores[i % len(valores)], inicio + i)
+        
+        # O tamanho vem das próprias colunas; o tracemalloc só deixaria o preenchimento mais lento
+        resultado = medir_unica(f"memoria.extrato_{tamanho}", preencher, memoria=False)
+        memoria = sum(sys.getsizeof(getattr(extrato, coluna)) for coluna in colunas)
+        resultado.update(transacoes=tamanho, memoria_kb=round(memoria / 1024, 1),
+                         bytes_por_transacao=round(memoria / tamanho, 1))
+        resultados.append(resultado)
+        tamanho *= 10
+    
+    # Formato anterior: um dict por transação, com tipo e data formatada repetidos
+    def dicts():
+        inicio = time.time() - AMOSTRA_EXTRATO_DICTS
+        transacoes = [{"tipo": "Depósito", "valor": valores[i % len(valores)] / 100,
+                       "data_hora": datetime.fromtimestamp(inicio + i).strftime("%d/%m/%Y %H:%M:%S")}
+                      for i in range(AMOSTRA_EXTRATO_DICTS)]
+        return {"transacoes": len(transacoes)}
+    
+    resultado = medir_unica(f"memoria.extrato_dicts_{AMOSTRA_EXTRATO_DICTS}", dicts)
+    resultado["bytes_por_transacao"] = round(resultado["memoria_pico_kb"] * 1024 / AMOSTRA_EXTRATO_DICTS, 1)
+    resultados.append(resultado)
+    return resultados
@@ -0,0 +1,412 @@
+"""
+Cenários que passam pelas rotas Flask (test client) e pelo adaptador ASGI,
+sem abrir portas; só o de shards usa HTTP de verdade, numa porta local, já que
+cada processo shard atende o próprio socket
+"""
+import asyncio
+import itertools
+import os
+import re
+import socket
+import threading
+import time
+
+import meu_banco
+
+from .dados import gerar_cliente, liberar_limites, valor_sintetico
+from .medicao import cenario, medir, medir_concorrente, percentil
+
+# Requisições simultâneas no cenário do adaptador ASGI
+CONCORRENCIA_ASGI = 64
+# Downloads completos por exportação em streaming
+REPETICOES_STREAMING = 20
+# Limite da sobrecarga da instrumentação sobre uma requisição sem ela
+SOBRECARGA_MAXIMA = 0.02
+# Processos shard comparados, a fração do ganho ideal exigida de cada um (o
+# ideal é um processo por shard, limitado aos processadores disponíveis), as
+# conexões HTTP abertas para cada shard do maior deles e as requisições de
+# aquecimento antes de medir
+SHARDS_MEDIDOS = (1, 2, 4)
+EFICIENCIA_MINIMA_SHARDS = 0.7
+CONEXOES_POR_SHARD = 4
+AQUECIMENTO_SHARDS = 200
+
+def _cliente_http():
+    return meu_banco.app.test_client()
+
+def _processadores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _verificar(resposta, esperado=200):
+    if resposta.status_code != esperado:
+        raise RuntimeError(f"{resposta.request.path}: status {resposta.status_code} ({resposta.get_data(as_text=True)[:200]})")
+    return resposta
+
+@cenario("rotas")
+def cenario_rotas_movimentacao(contexto):
+    """POST /depositar, /sacar e /transferir com contas sorteadas"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    destinos = contexto.dados.sortear_contas(quantidade, rng)
+    valores = [meu_banco.reais(valor_sintetico(rng)) for _ in range(quantidade)]
+    liberar_limites(set(numeros + destinos))
+    http = _cliente_http()
+    
+    def depositar(i):
+        _verificar(http.post('/depositar', json={"numero_conta": numeros[i], "valor": valores[i]}))
+    
+    def sacar(i):
+        _verificar(http.post('/sacar', json={"numero_conta": numeros[i], "valor": valores[i]}))
+    
+    def transferir(i):
+        if numeros[i] != destinos[i]:
+            _verificar(http.post('/transferir', json={"numero_conta_origem": numeros[i],
+                                                      "numero_conta_destino": destinos[i], "valor": valores[i]}))
+    
+    return [
+        medir("rota.depositar", depositar, quantidade),
+        medir("rota.sacar", sacar, quantidade),
+        medir("rota.transferir", transferir, quantidade),
+    ]
+
+@cenario("rotas")
+def cenario_rotas_idempotencia(contexto):
+    """/depositar com Idempotency-Key: chaves novas (guarda a resposta) e repetidas (devolve a guardada)"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    http = _cliente_http()
+    corpos = [{"numero_conta": numero, "valor": 10} for numero in numeros]
+    
+    def nova(i):
+        _verificar(http.post('/depositar', json=corpos[i], headers={"Idempotency-Key": f"bench-{i}"}))
+    
+    def repetida(i):
+        resposta = _verificar(http.post('/depositar', json=corpos[i], headers={"Idempotency-Key": f"bench-{i}"}))
+        if resposta.headers.get('Idempotent-Replayed') != 'true':
+            raise RuntimeError("A repetição não foi atendida pelo cache de idempotência")
+    
+    # Sem aquecimento nas chaves novas: ele gravaria as chaves que vão ser medidas
+    return [
+        medir("rota.depositar_chave_nova", nova, quantidade, aquecimento=0, memoria=False),
+        medir("rota.depositar_chave_repetida", repetida, quantidade),
+    ]
+
+@cenario("rotas")
+def cenario_rotas_cadastro(contexto):
+    """POST /criar_cliente e /criar_conta com CPFs novos"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    primeiro = len(contexto.dados.clientes) + 10**6
+    # Folga para o aquecimento e a passada de memória, que também cadastram
+    novos = [gerar_cliente(primeiro + i, rng) for i in range(3 * quantidade)]
+    http = _cliente_http()
+    sequencia = itertools.count()
+    
+    def criar_cliente(i):
+        _verificar(http.post('/criar_cliente', json=novos[next(sequencia)]))
+    
+    cpfs = contexto.dados.cpfs
+    
+    def criar_conta(i):
+        _verificar(http.post('/criar_conta', json={"cpf": cpfs[i % len(cpfs)]}))
+    
+    return [
+        medir("rota.criar_cliente", criar_cliente, quantidade),
+        medir("rota.criar_conta", criar_conta, quantidade),
+    ]
+
+@cenario("rotas")
+def cenario_rotas_consulta(contexto):
+    """GET do extrato (completo e paginado), /resumo, /metrics e /listar_contas"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    http = _cliente_http()
+    return [
+        medir("rota.extrato", lambda i: _verificar(http.get(f'/extrato/{numeros[i]}')),
+              max(quantidade // 10, 10)),
+        medir("rota.extrato_pagina_100", lambda i: _verificar(http.get(f'/extrato/{numeros[i]}?limite=100')),
+              quantidade),
+        medir("rota.resumo", lambda i: _verificar(http.get('/resumo')), quantidade),
+        medir("rota.metrics", lambda i: _verificar(http.get('/metrics')), max(quantidade // 10, 10)),
+        medir("rota.listar_contas", lambda i: _verificar(http.get('/listar_contas')), 10, aquecimento=1,
+              extra={"contas": len(meu_banco.contas)}),
+    ]
+
+@cenario("rotas")
+def cenario_rotas_streaming(contexto):
+    """Exportações em streaming: tempo até o primeiro bloco, tempo total e memória"""
+    http = _cliente_http()
+    conta_quente = contexto.dados.numeros_por_movimento[0]
+    urls = {
+        "listar_contas_ndjson": '/listar_contas?formato=ndjson',
+        "listar_contas_csv": '/listar_contas?formato=csv',
+        "extrato_quente_ndjson": f'/extrato/{conta_quente}?formato=ndjson',
+    }
+    
+    resultados = []
+    for nome, url in urls.items():
+        primeiros_bytes = []
+        
+        def baixar(i, url=url, primeiros_bytes=primeiros_bytes):
+            inicio = time.perf_counter_ns()
+            resposta = _verificar(http.get(url, buffered=False))
+            blocos = resposta.iter_encoded()
+            total = len(next(blocos, b""))
+            primeiros_bytes.append(time.perf_counter_ns() - inicio)
+            for bloco in blocos:
+                total += len(bloco)
+            resposta.close()
+            return total
+        
+        resultado = medir(f"streaming.{nome}", baixar, REPETICOES_STREAMING, aquecimento=2)
+        # Só as repetições medidas (depois do aquecimento e antes da passada de memória)
+        medidos = sorted(primeiros_bytes[2:2 + REPETICOES_STREAMING])
+        resultado["primeiro_bloco_p50_us"] = round(percentil(medidos, 0.50) / 1000, 2)
+        resultado["primeiro_bloco_p99_us"] = round(percentil(medidos, 0.99) / 1000, 2)
+        resultado["bytes"] = baixar(0)
+        resultados.append(resultado)
+    return resultados
+
+@cenario("rotas")
+def cenario_rotas_lote(contexto):
+    """POST /lote com 100 depósitos em JSON e em NDJSON"""
+    rng = contexto.rng()
+    chamadas = max(contexto.operacoes // 100, 10)
+    numeros = contexto.dados.sortear_contas(chamadas * 100, rng)
+    lotes = [[{"tipo": "deposito", "numero_conta": numero, "valor": 1.5} for numero in numeros[i * 100:(i + 1) * 100]]
+             for i in range(chamadas)]
+    ndjson = [b"".join(meu_banco.codificar_json(operacao) + b"\n" for operacao in lote) for lote in lotes]
+    http = _cliente_http()
+    extra = {"operacoes_por_chamada": 100}
+    return [
+        medir("rota.lote_json", lambda i: _verificar(http.post('/lote', json=lotes[i])), chamadas,
+              aquecimento=1, extra=extra),
+        medir("rota.lote_ndjson", lambda i: _verificar(http.post('/lote', data=ndjson[i],
+                                                                  content_type='application/x-ndjson')),
+              chamadas, aquecimento=1, extra=extra),
+    ]
+
+class _SemMetricas:
+    """Ocupa o lugar de meu_banco.metricas na medição da rota sem instrumentação"""
+    
+    def contar(self, nome, rotulos=(), quantidade=1):
+        pass
+    
+    def observar(self, nome, rotulos, segundos):
+        pass
+
+@cenario("rotas")
+def cenario_rotas_sobrecarga(contexto):
+    """
+    POST /depositar com e sem a instrumentação e o custo dela isolado
+    
+    A diferença entre as duas rotas some no ruído do test client, então a
+    verificação usa o custo da instrumentação medido à parte (histograma da
+    rota e contador da operação) sobre a latência da rota sem ela.
+    """
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    http = _cliente_http()
+    
+    def depositar(i):
+        _verificar(http.post('/depositar', json={"numero_conta": numeros[i], "valor": 1}))
+    
+    instrumentada = meu_banco.app.view_functions['api_depositar']
+    metricas = meu_banco.metricas
+    resultados = [medir("sobrecarga.rota_com_metricas", depositar, quantidade, memoria=False)]
+    meu_banco.app.view_functions['api_depositar'] = instrumentada.__wrapped__
+    meu_banco.metricas = _SemMetricas()
+    try:
+        resultados.append(medir("sobrecarga.rota_sem_metricas", depositar, quantidade, memoria=False))
+    finally:
+        meu_banco.app.view_functions['api_depositar'] = instrumentada
+        meu_banco.metricas = metricas
+    
+    def api_sobrecarga():
+        meu_banco.metricas.contar("meu_banco_operacoes_total", (("op", "deposito"), ("resultado", "sucesso")))
+    
+    def vazia():
+        pass
+    
+    medida = meu_banco.medir_rota(api_sobrecarga)
+    instrumentacao = medir("sobrecarga.instrumentacao", lambda i: medida(), quantidade, memoria=False)
+    chamada_vazia = medir("sobrecarga.chamada_vazia", lambda i: vazia(), quantidade, memoria=False)
+    custo = max(instrumentacao["p50_us"] - chamada_vazia["p50_us"], 0)
+    sobrecarga = custo / resultados[1]["p50_us"]
+    instrumentacao.update(custo_us=round(custo, 3), sobrecarga_pct=round(sobrecarga * 100, 3),
+                          sobrecarga_aceitavel=sobrecarga < SOBRECARGA_MAXIMA)
+    return resultados + [instrumentacao, chamada_vazia]
+
+@cenario("rotas")
+def cenario_rotas_concorrencia(contexto):
+    """Carga concorrente: WSGI com várias threads e o adaptador ASGI com muitas requisições abertas"""
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    numeros = contexto.dados.sortear_contas(quantidade, rng)
+    clientes_http = {}
+    
+    def depositar(i):
+        # Um test client por thread, como cada conexão de um servidor real
+        http = clientes_http.setdefault(threading.get_ident(), _cliente_http())
+        _verificar(http.post('/depositar', json={"numero_conta": numeros[i], "valor": 1}))
+    
+    resultados = [medir_concorrente(f"wsgi.depositar_{threads}_threads", depositar, quantidade, threads)
+                  for threads in sorted({contexto.threads, 64})]
+    resultados.append(_carga_asgi(numeros, quantidade))
+    return resultados
+
+def _carga_asgi(numeros, quantidade):
+    """Dispara as requisições no AppASGI com até CONCORRENCIA_ASGI em andamento ao mesmo tempo"""
+    app_asgi = meu_banco.AppASGI(meu_banco.app, workers=8, max_requisicoes=CONCORRENCIA_ASGI)
+    latencias = []
+    
+    async def requisicao(i, limite):
+        corpo = meu_banco.codificar_json({"numero_conta": numeros[i], "valor": 1})
+        escopo = {"type": "http", "method": "POST", "path": "/depositar", "query_string": b"",
+                  "headers": [(b"content-type", b"application/json")], "client": ("127.0.0.1", 0)}
+        status = []
+        
+        async def receive():
+            return {"type": "http.request", "body": corpo, "more_body": False}
+        
+        async def send(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status.append(mensagem["status"])
+        
+        async with limite:
+            inicio = time.perf_counter_ns()
+            await app_asgi(escopo, receive, send)
+            latencias.append(time.perf_counter_ns() - inicio)
+        if status != [200]:
+            raise RuntimeError(f"/depositar via ASGI: status {status}")
+    
+    async def disparar():
+        limite = asyncio.Semaphore(CONCORRENCIA_ASGI)
+        await asyncio.gather(*(requisicao(i, limite) for i in range(quantidade)))
+    
+    inicio = time.perf_counter()
+    asyncio.run(disparar())
+    segundos = time.perf_counter() - inicio
+    app_asgi.executor.shutdown()
+    
+    latencias.sort()
+    return {
+        "nome": f"asgi.depositar_{CONCORRENCIA_ASGI}_abertas",
+        "operacoes": quantidade,
+        "segundos": round(segundos, 6),
+        "ops_s": round(quantidade / segundos, 1),
+        "p50_us": round(percentil(latencias, 0.50) / 1000, 2),
+        "p99_us": round(percentil(latencias, 0.99) / 1000, 2),
+        "memoria_pico_kb": None
+    }
+
+class _ConexaoHTTP:
+    """
+    Cliente HTTP/1.1 mínimo, que gasta bem menos CPU por requisição que o
+    servidor medido; reaproveita a conexão enquanto o servidor não a fechar
+    (o servidor do werkzeug responde com Connection: close)
+    """
+    
+    def __init__(self, endereco):
+        self.endereco = endereco
+        self.soquete = None
+        self.recebido = b""
+    
+    def post(self, caminho, corpo):
+        """Envia o POST, espera a resposta inteira e confere o sucesso"""
+        if self.soquete is None:
+            self.soquete = socket.create_connection(self.endereco)
+            self.soquete.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.recebido = b""
+        self.soquete.sendall(b"POST %s HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\n\r\n%s" % (caminho, len(corpo), corpo))
+        while b"\r\n\r\n" not in self.recebido:
+            self._receber()
+        cabecalho, _, self.recebido = self.recebido.partition(b"\r\n\r\n")
+        tamanho = int(re.search(rb"(?i)\r\ncontent-length:\s*(\d+)", cabecalho).group(1))
+        while len(self.recebido) < tamanho:
+            self._receber()
+        resposta, self.recebido = self.recebido[:tamanho], self.recebido[tamanho:]
+        if re.search(rb"(?i)\r\nconnection:\s*close", cabecalho):
+            self.fechar()
+        
+        status = cabecalho.split(b"\r\n", 1)[0]
+        if status != b"HTTP/1.1 200 OK" or not meu_banco.decodificar_json(resposta)['sucesso']:
+            raise RuntimeError(f"{caminho.decode()}: {status.decode()} ({resposta[:200]})")
+    
+    def _receber(self):
+        dados = self.soquete.recv(65536)
+        if not dados:
+            raise ConnectionError("O servidor fechou a conexão")
+        self.recebido += dados
+    
+    def fechar(self):
+        if self.soquete is not None:
+            self.soquete.close()
+            self.soquete = None
+
+@cenario("shards")
+def cenario_shards(contexto):
+    """
+    POST /depositar por HTTP, em conexões persistentes, com as contas em 1, 2
+    e 4 processos shard que atendem no mesmo socket (as requisições de contas
+    de outro shard são encaminhadas ao dono); confere o saldo total e o ganho
+    de vazão de cada um em relação a um único shard
+    """
+    rng = contexto.rng()
+    quantidade = contexto.operacoes
+    corpos = [meu_banco.codificar_json({"numero_conta": numero, "valor": 1})
+              for numero in contexto.dados.sortear_contas(quantidade, rng)]
+    registros = [{"nome": cliente.nome, "data_nascimento": cliente.data_nascimento, "cpf": cliente.cpf,
+                  **cliente.endereco} for cliente in contexto.dados.clientes]
+    pares = [(registro['cpf_titular'], registro['numero_conta']) for registro, _ in contexto.dados.contas]
+    # As mesmas conexões em todas as medições, suficientes para nenhum shard ficar ocioso
+    conexoes = max(contexto.threads, CONEXOES_POR_SHARD * SHARDS_MEDIDOS[-1])
+    
+    resultados = []
+    for total in SHARDS_MEDIDOS:
+        soquete = socket.create_server(("127.0.0.1", 0), backlog=conexoes)
+        endereco = soquete.getsockname()
+        roteador = meu_banco.RoteadorShards(total, servidor=("dev", soquete, conexoes, conexoes))
+        soquete.close()
+        abertas = []
+        locais = threading.local()
+        
+        def depositar(i):
+            conexao = getattr(locais, 'conexao', None)
+            if conexao is None:
+                conexao = locais.conexao = _ConexaoHTTP(endereco)
+                abertas.append(conexao)
+            conexao.post(b"/depositar", corpos[i])
+        
+        try:
+            roteador.importar_clientes(registros)
+            roteador.importar_contas(pares)
+            aquecimento = min(AQUECIMENTO_SHARDS, quantidade)
+            for i in range(aquecimento):
+                depositar(i)
+            resultado = medir_concorrente(f"shards.http_depositar_{total}_processos", depositar, quantidade, conexoes)
+            saldo = sum(parcial["saldo_total"] for parcial in roteador.em_todos("resumo", 1, 1).values())
+            resultado["saldo_conservado"] = saldo == 100 * (aquecimento + quantidade)
+            resultados.append(resultado)
+        finally:
+            for conexao in abertas:
+                conexao.fechar()
+            roteador.encerrar()
+    
+    # Um processador fica com o gerador de carga; sem pelo menos dois para os
+    # shards não há escala a conferir, só o custo do encaminhamento
+    for total, resultado in zip(SHARDS_MEDIDOS[1:], resultados[1:]):
+        ganho_ideal = min(total, max(1, _processadores() - 1))
+        ganho = resultado["ops_s"] / resultados[0]["ops_s"]
+        resultado.update(ganho=round(ganho, 2), ganho_ideal=ganho_ideal)
+        if ganho_ideal > 1:
+            resultado["escala_aceitavel"] = ganho >= EFICIENCIA_MINIMA_SHARDS * ganho_ideal
+    return resultados
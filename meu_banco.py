@@ -1,7 +1,113 @@
-from flask import Flask, request, jsonify
-from datetime import datetime
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from concurrent.futures import Future, ThreadPoolExecutor
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from functools import lru_cache, wraps
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from itertools import count, islice
+from operator import attrgetter
+from types import GeneratorType
+from urllib.parse import parse_qs
+import argparse
+import asyncio
+import atexit
+import contextvars
+import cProfile
+import csv
+import gc
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import logging
+import math
+import mmap
+import multiprocessing
+import os
+import pstats
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import zlib
 
-app = Flask(__name__)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Codec JSON: orjson quando instalado, json da biblioteca padrão caso contrário.
+# As duas saídas são equivalentes (UTF-8, chaves ordenadas, sem espaços).
+if orjson is not None:
+    OPCOES_ORJSON = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    
+    def codificar_json(obj, default=None):
+        """Serializa para bytes JSON"""
+        return orjson.dumps(obj, default=default, option=OPCOES_ORJSON)
+    
+    decodificar_json = orjson.loads
+else:
+    _codificador_json = json.JSONEncoder(ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    
+    def codificar_json(obj, default=None):
+        """Serializa para bytes JSON"""
+        if default is None:
+            return _codificador_json.encode(obj).encode('utf-8')
+        return json.dumps(obj, default=default, ensure_ascii=False, sort_keys=True,
+                          separators=(',', ':')).encode('utf-8')
+    
+    decodificar_json = json.loads
+
+def decodificar_ndjson(corpo):
+    """
+    Decodifica um corpo NDJSON inteiro com uma só chamada ao codec: as linhas
+    não vazias viram um array JSON. Se o array não tiver um item por linha (ou
+    não for válido), as linhas são lidas uma a uma para apontar a inválida.
+    """
+    linhas = [linha for linha in corpo.splitlines() if linha.strip()]
+    try:
+        itens = decodificar_json(b"[" + b",".join(linhas) + b"]")
+    except ValueError:
+        itens = None
+    if itens is not None and len(itens) == len(linhas):
+        return itens
+    itens = []
+    for numero, linha in enumerate(linhas, 1):
+        try:
+            itens.append(decodificar_json(linha))
+        except ValueError:
+            raise DadosInvalidos(f"Linha {numero} não é um JSON válido.")
+    return itens
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provedor JSON do Flask (jsonify e request.get_json) sobre o codec acima"""
+    
+    def dumps(self, obj, **kwargs):
+        return codificar_json(obj, self.default).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return decodificar_json(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(codificar_json(obj, self.default), mimetype=self.mimetype)
+
+# O Flask não serve a pasta static: os assets da interface são gerados em memória
+app = Flask(__name__, static_folder=None)
+app.json = ProvedorJSON(app)
 
 # Armazenamento de dados em memória
 clientes = []
@@ -9,153 +115,3125 @@ contas = []
 AGENCIA = "0001"
 numero_conta_sequencial = 1
 
+# Índices em memória (mantidos consistentes a cada inserção)
+clientes_por_cpf = {}
+contas_por_numero = {}
+contas_por_cpf = {}
+
+# Controle de concorrência: locks por faixa de contas (lock striping), um lock
+# para inserções nos cadastros e um alocador atômico de números de conta
+NUMERO_LOCKS_CONTAS = 256
+locks_contas = [threading.Lock() for _ in range(NUMERO_LOCKS_CONTAS)]
+lock_cadastro = threading.RLock()
+lock_numero_conta = threading.Lock()
+
+def lock_da_conta(numero_conta):
+    """Retorna o lock responsável pela conta"""
+    return locks_contas[numero_conta % NUMERO_LOCKS_CONTAS]
+
+def alocar_numero_conta():
+    """Reserva atomicamente o próximo número de conta"""
+    return alocar_faixa_contas(1)
+
+def alocar_faixa_contas(quantidade):
+    """Reserva atomicamente `quantidade` números de conta consecutivos e retorna o primeiro"""
+    global numero_conta_sequencial
+    
+    # No modo particionado, quem numera as contas é o shard 0
+    if roteador is not None and roteador.local != 0:
+        return roteador.chamar(0, "alocar_faixa_contas", quantidade)
+    with lock_numero_conta:
+        primeiro = numero_conta_sequencial
+        numero_conta_sequencial += quantidade
+    return primeiro
+
+def garantir_numeracao(maior):
+    """Faz a numeração continuar depois de `maior` (contas importadas com o número já definido)"""
+    global numero_conta_sequencial
+    
+    with lock_numero_conta:
+        numero_conta_sequencial = max(numero_conta_sequencial, maior + 1)
+
+FORMATO_DATA_HORA = "%d/%m/%Y %H:%M:%S"
+
+# Recusas por regra de negócio (subclasses de ValueError, como antes)
+class OperacaoRecusada(ValueError):
+    motivo = "recusada"
+
+class ValorInvalido(OperacaoRecusada):
+    motivo = "valor_invalido"
+
+class SaldoInsuficiente(OperacaoRecusada):
+    motivo = "saldo_insuficiente"
+
+class LimiteExcedido(OperacaoRecusada):
+    motivo = "limite_excedido"
+
+# Payload fora do formato esperado (campo ausente, tipo errado)
+class DadosInvalidos(ValueError):
+    pass
+
+RECUSAS = {classe.motivo: classe for classe in (OperacaoRecusada, ValorInvalido, SaldoInsuficiente, LimiteExcedido)}
+
+def motivo_do_erro(erro):
+    """Classifica uma exceção para as métricas"""
+    if isinstance(erro, OperacaoRecusada):
+        return erro.motivo
+    if isinstance(erro, (KeyError, ValueError, TypeError)):
+        return "requisicao_invalida"
+    return "erro_interno"
+
+# Métricas
+#
+# Cada thread escreve em dicts próprios (threading.local), então o caminho
+# quente não usa locks. Só a coleta, feita pelo /metrics, junta os dados de
+# todas as threads; o lock de registro é usado uma vez por thread.
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Metricas:
+    """Contadores e histogramas de latência no formato texto do Prometheus"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._lock_registro = threading.Lock()
+        self._por_thread = []
+        self._encerradas = ({}, {})
+    
+    def _dados(self):
+        try:
+            return self._local.dados
+        except AttributeError:
+            dados = ({}, {})
+            self._local.dados = dados
+            with self._lock_registro:
+                self._por_thread.append((threading.current_thread(), dados))
+            return dados
+    
+    def contar(self, nome, rotulos=(), quantidade=1):
+        contadores = self._dados()[0]
+        chave = (nome, rotulos)
+        contadores[chave] = contadores.get(chave, 0) + quantidade
+    
+    def observar(self, nome, rotulos, segundos):
+        histogramas = self._dados()[1]
+        chave = (nome, rotulos)
+        valores = histogramas.get(chave)
+        if valores is None:
+            # Um contador por bucket, mais o +Inf e a soma
+            valores = histogramas[chave] = [0] * (len(BUCKETS_LATENCIA) + 2)
+        valores[bisect_left(BUCKETS_LATENCIA, segundos)] += 1
+        valores[-1] += segundos
+    
+    @staticmethod
+    def _somar(destino, origem):
+        contadores, histogramas = destino
+        for chave, valor in dict(origem[0]).items():
+            contadores[chave] = contadores.get(chave, 0) + valor
+        for chave, valores in dict(origem[1]).items():
+            atuais = histogramas.setdefault(chave, [0] * len(valores))
+            for posicao, valor in enumerate(list(valores)):
+                atuais[posicao] += valor
+    
+    def coletar(self):
+        """Soma os dados de todas as threads; threads encerradas são consolidadas"""
+        with self._lock_registro:
+            vivas = []
+            for thread, dados in self._por_thread:
+                if thread.is_alive():
+                    vivas.append((thread, dados))
+                else:
+                    self._somar(self._encerradas, dados)
+            self._por_thread = vivas
+            total = ({}, {})
+            self._somar(total, self._encerradas)
+            for _, dados in vivas:
+                self._somar(total, dados)
+        return total
+    
+    @staticmethod
+    def exportar(dados):
+        """Converte os dados coletados para o formato texto do Prometheus"""
+        contadores, histogramas = dados
+        
+        def rotulos_texto(rotulos, extra=()):
+            pares = [f'{chave}="{valor}"' for chave, valor in tuple(rotulos) + tuple(extra)]
+            return "{" + ",".join(pares) + "}" if pares else ""
+        
+        linhas = []
+        for nome in sorted({nome for nome, _ in contadores}):
+            linhas.append(f"# TYPE {nome} counter")
+            for (atual, rotulos), valor in sorted(contadores.items()):
+                if atual == nome:
+                    linhas.append(f"{nome}{rotulos_texto(rotulos)} {valor}")
+        for nome in sorted({nome for nome, _ in histogramas}):
+            linhas.append(f"# TYPE {nome} histogram")
+            for (atual, rotulos), valores in sorted(histogramas.items()):
+                if atual != nome:
+                    continue
+                acumulado = 0
+                for limite, quantidade in zip(BUCKETS_LATENCIA + ("+Inf",), valores):
+                    acumulado += quantidade
+                    linhas.append(f"{nome}_bucket{rotulos_texto(rotulos, (('le', limite),))} {acumulado}")
+                linhas.append(f"{nome}_sum{rotulos_texto(rotulos)} {valores[-1]}")
+                linhas.append(f"{nome}_count{rotulos_texto(rotulos)} {acumulado}")
+        return "\n".join(linhas) + "\n"
+
+metricas = Metricas()
+
+# Perfilamento sob demanda
+#
+# Nada aqui roda enquanto o perfilamento está desligado: o amostrador é uma
+# thread criada só quando pedido (endpoint /admin/perfil ou sinal SIGUSR2) e
+# o cProfile por requisição só é instalado nas rotas se MEU_BANCO_PERFIL_LENTO_MS
+# estiver definido na inicialização.
+
+class AmostradorPerfil:
+    """
+    Profiler por amostragem: lê periodicamente a pilha de todas as threads e
+    acumula as pilhas no formato "collapsed" usado por flamegraph.pl/speedscope
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.pilhas = Counter()
+        self.amostras = 0
+        self.inicio = None
+        self.fim = None
+    
+    @property
+    def ativo(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def iniciar(self, segundos, intervalo=0.005, ao_terminar=None):
+        """Começa uma coleta de `segundos`; retorna False se já houver uma em andamento"""
+        with self._lock:
+            if self.ativo:
+                return False
+            self.pilhas = Counter()
+            self.amostras = 0
+            self.inicio = time.time()
+            self.fim = None
+            self._thread = threading.Thread(target=self._coletar, args=(segundos, intervalo, ao_terminar),
+                                            name='meu-banco-amostrador', daemon=True)
+            self._thread.start()
+            return True
+    
+    def _coletar(self, segundos, intervalo, ao_terminar):
+        proprio = threading.get_ident()
+        limite = time.monotonic() + segundos
+        while time.monotonic() < limite:
+            for ident, quadro in sys._current_frames().items():
+                if ident != proprio:
+                    self.pilhas[self._pilha(quadro)] += 1
+            self.amostras += 1
+            time.sleep(intervalo)
+        self.fim = time.time()
+        if ao_terminar:
+            ao_terminar(self)
+    
+    @staticmethod
+    def _pilha(quadro):
+        funcoes = []
+        while quadro is not None:
+            codigo = quadro.f_code
+            funcoes.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+            quadro = quadro.f_back
+        return ";".join(reversed(funcoes))
+    
+    def collapsed(self):
+        """Pilhas no formato collapsed: "raiz;...;folha contagem" por linha"""
+        return "".join(f"{pilha} {quantidade}\n" for pilha, quantidade in self.pilhas.most_common())
+
+amostrador = AmostradorPerfil()
+
+PERFIL_LENTO_MS = float(os.environ['MEU_BANCO_PERFIL_LENTO_MS']) if os.environ.get('MEU_BANCO_PERFIL_LENTO_MS') else None
+perfis_lentos = deque(maxlen=20)
+
+def executar_com_cprofile(rota, funcao, args, kwargs):
+    """Executa a rota sob cProfile e guarda o perfil se passar de PERFIL_LENTO_MS"""
+    perfil = cProfile.Profile()
+    inicio = time.perf_counter()
+    try:
+        perfil.enable()
+    except ValueError:
+        # Outro profiler já ativo (ex.: requisições simultâneas no Python 3.12+)
+        return funcao(*args, **kwargs)
+    try:
+        return funcao(*args, **kwargs)
+    finally:
+        perfil.disable()
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        if duracao_ms >= PERFIL_LENTO_MS:
+            saida = io.StringIO()
+            pstats.Stats(perfil, stream=saida).sort_stats('cumulative').print_stats(30)
+            perfis_lentos.append({
+                "rota": rota,
+                "duracao_ms": round(duracao_ms, 3),
+                "data_hora": datetime.now().strftime(FORMATO_DATA_HORA),
+                "perfil": saida.getvalue()
+            })
+
+def _perfilar_ao_sinal(numero_sinal, quadro):
+    """SIGUSR2: coleta por PERFIL_SEGUNDOS_SINAL segundos e grava o resultado em arquivo"""
+    def gravar(amostrador):
+        caminho = os.path.join(tempfile.gettempdir(), f"meu-banco-perfil-{int(amostrador.inicio)}.folded")
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(amostrador.collapsed())
+        print(f"🔥 Perfil gravado em: {caminho}")
+    amostrador.iniciar(PERFIL_SEGUNDOS_SINAL, ao_terminar=gravar)
+
+PERFIL_SEGUNDOS_SINAL = 30
+
+# Dinheiro
+#
+# Todo valor monetário interno (saldos, limites, transações) é um inteiro em
+# centavos. Decimal só aparece na entrada da API: frações de centavo são
+# arredondadas para o centavo mais próximo, com empate indo para o par
+# (ROUND_HALF_EVEN, o arredondamento bancário). Na saída, os centavos viram
+# reais com uma única divisão por 100.
+CENTAVO = Decimal("0.01")
+ARREDONDAMENTO = ROUND_HALF_EVEN
+
+# Maior valor de uma operação e maior saldo de uma conta, em centavos. Os dois
+# ficam abaixo de 2^53: cabem nas colunas 'q' do extrato e no JSON do log e
+# continuam exatos na conversão para reais
+VALOR_MAXIMO = 10**13
+SALDO_MAXIMO = 10**15
+ACIMA_DO_MAXIMO = Decimal(VALOR_MAXIMO + 1).scaleb(-2)
+
+def para_centavos(valor):
+    """
+    Converte um valor em reais (str, int, float ou Decimal) para centavos inteiros
+    Args:
+        valor: valor em reais, como recebido na API
+    Returns:
+        int: valor em centavos
+    """
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return _dentro_do_maximo(valor * 100)
+    texto = str(valor).strip() if isinstance(valor, (str, Decimal)) else repr(valor)
+    
+    # Caminho rápido para o formato usual ("123", "123.4", "123.45")
+    inteiro, _, fracao = texto.partition('.')
+    if (inteiro.isascii() and inteiro.isdigit() and len(inteiro) <= 15 and len(fracao) <= 2
+            and (not fracao or (fracao.isascii() and fracao.isdigit()))):
+        return _dentro_do_maximo(int(inteiro) * 100 + int(fracao.ljust(2, '0') or 0))
+    
+    try:
+        decimal = Decimal(texto)
+    except InvalidOperation:
+        raise ValorInvalido(f"Valor inválido: {valor}. Informe um número como 123.45.")
+    if not decimal.is_finite():
+        raise ValorInvalido(f"Valor inválido: {valor}. Informe um número como 123.45.")
+    # Limitado a um centavo acima do máximo antes do quantize, que falha com
+    # expoentes enormes (1e999999); o excesso é recusado logo abaixo
+    decimal = max(min(decimal, ACIMA_DO_MAXIMO), -ACIMA_DO_MAXIMO)
+    return _dentro_do_maximo(int(decimal.quantize(CENTAVO, rounding=ARREDONDAMENTO).scaleb(2)))
+
+def _dentro_do_maximo(centavos):
+    if abs(centavos) > VALOR_MAXIMO:
+        raise ValorInvalido(f"Valor acima do máximo permitido por operação (R$ {formatar_reais(VALOR_MAXIMO)}).")
+    return centavos
+
+def reais(centavos):
+    """Converte centavos para reais na serialização (JSON)"""
+    return centavos / 100
+
+def formatar_reais(centavos):
+    """Formata centavos como texto em reais com duas casas"""
+    return f"{centavos / 100:.2f}"
+
+# Validação de payloads
+#
+# Cada endpoint declara um esquema (campo -> conversor, obrigatório). O esquema
+# é compilado uma vez na carga do módulo em uma tupla de passos, e a validação
+# de uma requisição é um único laço sobre ela, sem reflexão por chamada.
+
+def campo_texto(valor):
+    """Texto não vazio (números são aceitos e convertidos)"""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        valor = str(valor)
+    if not isinstance(valor, str):
+        raise TypeError("deve ser um texto")
+    valor = valor.strip()
+    if not valor:
+        raise ValueError("não pode ser vazio")
+    return valor
+
+def campo_inteiro(valor):
+    """Inteiro, aceitando também texto numérico ("12")"""
+    if isinstance(valor, bool):
+        raise TypeError("deve ser um número inteiro")
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str) and valor.strip().isdigit():
+        return int(valor)
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    raise TypeError("deve ser um número inteiro")
+
+def campo_inteiro_ate(maximo):
+    """Inteiro não negativo; acima de `maximo`, fica em `maximo`"""
+    def validar(valor):
+        valor = campo_inteiro(valor)
+        if valor < 0:
+            raise ValueError("não pode ser negativo")
+        return min(valor, maximo)
+    return validar
+
+def campo_escolha(*opcoes):
+    """Um dos valores em `opcoes`"""
+    def validar(valor):
+        if valor not in opcoes:
+            raise ValueError(f"inválido: {valor}. Use {' ou '.join(opcoes)}")
+        return valor
+    return validar
+
+def campo_lista(valor):
+    """Lista JSON (os itens são validados por quem a recebe)"""
+    if not isinstance(valor, list):
+        raise TypeError("deve ser uma lista")
+    return valor
+
+def compilar_esquema(campos):
+    """
+    Compila um esquema em uma função de validação
+    Args:
+        campos: dict nome -> conversor, ou nome -> (conversor, obrigatorio)
+    Returns:
+        função(dados) -> dict com os valores convertidos; levanta DadosInvalidos
+    """
+    passos = tuple(
+        (nome, *(regra if isinstance(regra, tuple) else (regra, True)))
+        for nome, regra in campos.items()
+    )
+    nomes = "', '".join(campos)
+    
+    def validar(dados):
+        if not isinstance(dados, dict):
+            raise DadosInvalidos(f"Envie um objeto JSON com os campos '{nomes}'.")
+        resultado = {}
+        for nome, conversor, obrigatorio in passos:
+            valor = dados.get(nome)
+            if valor is None:
+                if obrigatorio:
+                    raise DadosInvalidos(f"Campo obrigatório ausente: {nome}.")
+                continue
+            try:
+                resultado[nome] = conversor(valor)
+            except ValorInvalido:
+                raise
+            except (TypeError, ValueError) as e:
+                raise DadosInvalidos(f"Campo {nome} {e}.")
+        return resultado
+    return validar
+
+# Códigos de tipo guardados na coluna "tipos" do extrato
+TIPOS_TRANSACAO = ("Depósito", "Saque", "Transferência enviada", "Transferência recebida")
+CODIGO_TIPO = {tipo: codigo for codigo, tipo in enumerate(TIPOS_TRANSACAO)}
+
+def transacao_para_dict(tipo, valor, timestamp, contraparte=0):
+    """Monta a transação (valor em centavos) no formato exibido pela API"""
+    transacao = {
+        "tipo": tipo,
+        "valor": reais(valor),
+        "data_hora": datetime.fromtimestamp(timestamp).strftime(FORMATO_DATA_HORA),
+        "timestamp": timestamp
+    }
+    if contraparte:
+        transacao["conta_contraparte"] = contraparte
+    return transacao
+
+def timestamp_da_transacao(transacao):
+    """Timestamp (epoch) da transação, derivado de data_hora em registros antigos"""
+    if 'timestamp' in transacao:
+        return transacao['timestamp']
+    return datetime.strptime(transacao['data_hora'], FORMATO_DATA_HORA).timestamp()
+
+# Armazenamento frio do extrato
+#
+# Transações mais antigas que MEU_BANCO_ARQUIVAR_DIAS saem da memória e vão
+# para segmentos comprimidos (zlib) gravados em append em arquivos frio-*.seg,
+# lidos via mmap só quando uma consulta alcança o trecho arquivado. As posições
+# das transações no extrato não mudam com o arquivamento: cursores continuam
+# válidos e os totais acumulados não são recalculados.
+TAMANHO_MAXIMO_ARQUIVO_FRIO = 256 * 1024 * 1024
+ARQUIVAR_MINIMO = 128
+ARQUIVAR_MAXIMO = 65_536
+
+@dataclass(slots=True, frozen=True)
+class SegmentoFrio:
+    arquivo: str
+    posicao: int
+    tamanho: int
+    inicio: int
+    quantidade: int
+    primeiro_timestamp: float
+    ultimo_timestamp: float
+    # (codigo do tipo, soma em centavos, quantidade) das transações do segmento
+    totais: tuple
+    
+    def para_dict(self):
+        return {
+            "arquivo": self.arquivo,
+            "posicao": self.posicao,
+            "tamanho": self.tamanho,
+            "inicio": self.inicio,
+            "quantidade": self.quantidade,
+            "primeiro_timestamp": self.primeiro_timestamp,
+            "ultimo_timestamp": self.ultimo_timestamp,
+            "totais": [list(total) for total in self.totais]
+        }
+    
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(**dict(dados, totais=tuple(map(tuple, dados['totais']))))
+
+class ArmazemFrio:
+    """
+    Arquivos de segmentos frios: cada segmento é um bloco zlib com as colunas
+    (valores, timestamps, tipos, contrapartes) de um trecho do extrato
+    """
+    
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mapas = {}
+        existentes = sorted(n for n in os.listdir(diretorio) if n.startswith('frio-') and n.endswith('.seg'))
+        self._abrir(int(existentes[-1][5:-4]) if existentes else 1)
+    
+    def _abrir(self, numero):
+        self._nome = f"frio-{numero:06d}.seg"
+        self._arquivo = open(os.path.join(self.diretorio, self._nome), 'ab')
+        self._tamanho = self._arquivo.tell()
+    
+    def gravar(self, inicio, colunas):
+        """Grava as colunas como um segmento (com fsync) e retorna a sua descrição"""
+        valores, timestamps, tipos, contrapartes = colunas
+        totais = {}
+        for codigo, valor in zip(tipos, valores):
+            soma, quantidade = totais.get(codigo, (0, 0))
+            totais[codigo] = (soma + valor, quantidade + 1)
+        bloco = zlib.compress(b"".join(coluna.tobytes() for coluna in colunas), 6)
+        
+        with self._lock:
+            if self._tamanho and self._tamanho + len(bloco) > TAMANHO_MAXIMO_ARQUIVO_FRIO:
+                self._arquivo.close()
+                self._abrir(int(self._nome[5:-4]) + 1)
+            posicao = self._tamanho
+            self._arquivo.write(bloco)
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._tamanho += len(bloco)
+            nome = self._nome
+        
+        return SegmentoFrio(nome, posicao, len(bloco), inicio, len(valores), timestamps[0], timestamps[-1],
+                            tuple((codigo, soma, quantidade) for codigo, (soma, quantidade) in sorted(totais.items())))
+    
+    def ler(self, segmento):
+        """Bytes descomprimidos do segmento, lidos do arquivo mapeado em memória"""
+        fim = segmento.posicao + segmento.tamanho
+        mapa = self._mapas.get(segmento.arquivo)
+        if mapa is None or len(mapa) < fim:
+            with self._lock:
+                mapa = self._mapas.get(segmento.arquivo)
+                if mapa is None or len(mapa) < fim:
+                    # O mapa antigo não é fechado: outra thread pode estar lendo dele
+                    with open(os.path.join(self.diretorio, segmento.arquivo), 'rb') as arquivo:
+                        mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._mapas[segmento.arquivo] = mapa
+        return zlib.decompress(mapa[segmento.posicao:fim])
+
+armazem_frio = None
+
+@lru_cache(maxsize=16)
+def ler_segmento(segmento):
+    """Colunas (valores, timestamps, tipos, contrapartes) do segmento; os mais usados ficam em cache"""
+    dados = armazem_frio.ler(segmento)
+    quantidade = segmento.quantidade
+    colunas = []
+    posicao = 0
+    for codigo, tamanho_item in (('q', 8), ('d', 8), ('b', 1), ('q', 8)):
+        coluna = array(codigo)
+        coluna.frombytes(dados[posicao:posicao + quantidade * tamanho_item])
+        posicao += quantidade * tamanho_item
+        colunas.append(coluna)
+    return tuple(colunas)
+
+class Extrato:
+    """
+    Extrato colunar: valor (centavos), timestamp, código do tipo e conta de
+    contrapartida (transferências; 0 nas demais) de cada transação ficam em
+    arrays tipados e só viram dicts na serialização. Mantém os totais por
+    tipo atualizados a cada inclusão e os timestamps em ordem crescente para
+    consultas por período.
+    
+    As posições 0..base-1 estão arquivadas em segmentos frios; as colunas em
+    memória guardam a partir de base. O arquivamento incrementa `versao` antes
+    e depois de mover as colunas, e as leituras sem lock repetem a consulta se
+    a versão mudou no meio (seqlock).
+    """
+    
+    __slots__ = ('valores', 'timestamps', 'tipos', 'contrapartes', 'total_depositos', 'total_saques',
+                 'numero_depositos', 'numero_saques', 'total_transferencias_enviadas',
+                 'total_transferencias_recebidas', 'segmentos', 'base', 'versao')
+    
+    def __init__(self, transacoes=()):
+        self.valores = array('q')
+        self.timestamps = array('d')
+        self.tipos = array('b')
+        self.contrapartes = array('q')
+        self.total_depositos = 0
+        self.total_saques = 0
+        self.numero_depositos = 0
+        self.numero_saques = 0
+        self.total_transferencias_enviadas = 0
+        self.total_transferencias_recebidas = 0
+        self.segmentos = []
+        self.base = 0
+        self.versao = 0
+        for transacao in transacoes:
+            self.append(transacao)
+    
+    def adicionar(self, tipo, valor, timestamp, contraparte=0):
+        """Inclui uma transação diretamente nas colunas"""
+        # Se o relógio voltar, repete o último timestamp para manter a ordem
+        if self.timestamps:
+            if timestamp < self.timestamps[-1]:
+                timestamp = self.timestamps[-1]
+        elif self.segmentos and timestamp < self.segmentos[-1].ultimo_timestamp:
+            timestamp = self.segmentos[-1].ultimo_timestamp
+        codigo = CODIGO_TIPO[tipo]
+        self.valores.append(valor)
+        self.timestamps.append(timestamp)
+        self.tipos.append(codigo)
+        self.contrapartes.append(contraparte)
+        self._totalizar(tipo, valor, 1)
+    
+    def _totalizar(self, tipo, valor, quantidade):
+        if tipo == 'Depósito':
+            self.total_depositos += valor
+            self.numero_depositos += quantidade
+        elif tipo == 'Saque':
+            self.total_saques += valor
+            self.numero_saques += quantidade
+        elif tipo == 'Transferência enviada':
+            self.total_transferencias_enviadas += valor
+        else:
+            self.total_transferencias_recebidas += valor
+    
+    def append(self, transacao):
+        """Inclui uma transação no formato dict da API (valor em reais)"""
+        self.adicionar(transacao['tipo'], para_centavos(transacao['valor']), timestamp_da_transacao(transacao),
+                       transacao.get('conta_contraparte', 0))
+    
+    def __len__(self):
+        while True:
+            versao = self.versao
+            # contrapartes é a última coluna preenchida em adicionar (e a primeira
+            # esvaziada ao desfazer): leituras sem lock não alcançam linhas incompletas
+            tamanho = self.base + len(self.contrapartes)
+            if versao == self.versao and not versao & 1:
+                return tamanho
+            time.sleep(0)
+    
+    def _linha(self, posicao):
+        """(código do tipo, valor, timestamp, contraparte) da posição, quente ou arquivada"""
+        if posicao < 0:
+            posicao += len(self)
+        while True:
+            versao = self.versao
+            base = self.base
+            try:
+                if posicao >= base:
+                    indice = posicao - base
+                    linha = (self.tipos[indice], self.valores[indice],
+                             self.timestamps[indice], self.contrapartes[indice])
+                else:
+                    linha = self._linha_fria(posicao)
+            except IndexError:
+                if versao == self.versao and not versao & 1:
+                    raise
+                linha = None
+            if versao == self.versao and not versao & 1:
+                return linha
+            time.sleep(0)
+    
+    def _segmento_da_posicao(self, posicao):
+        if posicao < 0:
+            raise IndexError("posição fora do extrato")
+        return self.segmentos[bisect_right(self.segmentos, posicao, key=attrgetter('inicio')) - 1]
+    
+    def _linha_fria(self, posicao):
+        segmento = self._segmento_da_posicao(posicao)
+        valores, timestamps, tipos, contrapartes = ler_segmento(segmento)
+        indice = posicao - segmento.inicio
+        return tipos[indice], valores[indice], timestamps[indice], contrapartes[indice]
+    
+    def _linhas(self, comeco, final):
+        """Percorre as linhas de comeco até final, lendo cada segmento frio uma única vez"""
+        posicao = comeco
+        while posicao < final:
+            if posicao < self.base:
+                # Trechos arquivados nunca mudam: não precisam da verificação de versão
+                segmento = self._segmento_da_posicao(posicao)
+                valores, timestamps, tipos, contrapartes = ler_segmento(segmento)
+                fim_segmento = min(final, segmento.inicio + segmento.quantidade)
+                for indice in range(posicao - segmento.inicio, fim_segmento - segmento.inicio):
+                    yield tipos[indice], valores[indice], timestamps[indice], contrapartes[indice]
+                posicao = fim_segmento
+            else:
+                yield self._linha(posicao)
+                posicao += 1
+    
+    def __getitem__(self, posicao):
+        if isinstance(posicao, slice):
+            comeco, final, passo = posicao.indices(len(self))
+            if passo != 1:
+                return [self[i] for i in range(comeco, final, passo)]
+            return [transacao_para_dict(TIPOS_TRANSACAO[codigo], valor, timestamp, contraparte)
+                    for codigo, valor, timestamp, contraparte in self._linhas(comeco, final)]
+        codigo, valor, timestamp, contraparte = self._linha(posicao)
+        return transacao_para_dict(TIPOS_TRANSACAO[codigo], valor, timestamp, contraparte)
+    
+    def bruta(self, posicao):
+        """Retorna (tipo, valor em centavos, timestamp) sem montar o dict"""
+        codigo, valor, timestamp, _ = self._linha(posicao)
+        return TIPOS_TRANSACAO[codigo], valor, timestamp
+    
+    def __iter__(self):
+        for codigo, valor, timestamp, contraparte in self._linhas(0, len(self)):
+            yield transacao_para_dict(TIPOS_TRANSACAO[codigo], valor, timestamp, contraparte)
+    
+    def desfazer_ultima(self):
+        """Remove a última transação, revertendo os totais (usado ao desfazer lotes)"""
+        self.contrapartes.pop()
+        tipo = TIPOS_TRANSACAO[self.tipos.pop()]
+        self.timestamps.pop()
+        valor = self.valores.pop()
+        self._totalizar(tipo, -valor, -1)
+    
+    def colunas_antigas(self, limite_timestamp, maximo):
+        """
+        Cópia das transações em memória anteriores a limite_timestamp (o lock
+        da conta deve estar adquirido)
+        Returns:
+            tuple: (posição da primeira, colunas)
+        """
+        quantidade = min(bisect_left(self.timestamps, limite_timestamp), maximo)
+        return self.base, (self.valores[:quantidade], self.timestamps[:quantidade],
+                           self.tipos[:quantidade], self.contrapartes[:quantidade])
+    
+    def anexar_segmento(self, segmento):
+        """Troca as primeiras transações em memória pelo segmento frio que as contém (lock da conta adquirido)"""
+        self.versao += 1
+        try:
+            self.segmentos.append(segmento)
+            self.base += segmento.quantidade
+            for coluna in (self.valores, self.timestamps, self.tipos, self.contrapartes):
+                del coluna[:segmento.quantidade]
+        finally:
+            self.versao += 1
+    
+    def para_colunas(self):
+        """Representação compacta usada nos snapshots (trechos arquivados vão como referência)"""
+        while True:
+            versao = self.versao
+            colunas = {
+                "segmentos": [segmento.para_dict() for segmento in list(self.segmentos)],
+                "valores": self.valores.tolist(),
+                "timestamps": self.timestamps.tolist(),
+                "tipos": self.tipos.tolist(),
+                "contrapartes": self.contrapartes.tolist()
+            }
+            if versao == self.versao and not versao & 1:
+                return colunas
+            time.sleep(0)
+    
+    @classmethod
+    def de_colunas(cls, colunas):
+        extrato = cls()
+        for dados in colunas.get('segmentos', ()):
+            segmento = SegmentoFrio.de_dict(dados)
+            extrato.segmentos.append(segmento)
+            extrato.base += segmento.quantidade
+            for codigo, soma, quantidade in segmento.totais:
+                extrato._totalizar(TIPOS_TRANSACAO[codigo], soma, quantidade)
+        # Snapshots anteriores às transferências não têm a coluna de contrapartes
+        contrapartes = colunas.get('contrapartes') or [0] * len(colunas['tipos'])
+        for codigo, valor, timestamp, contraparte in zip(colunas['tipos'], colunas['valores'],
+                                                         colunas['timestamps'], contrapartes):
+            extrato.adicionar(TIPOS_TRANSACAO[codigo], valor, timestamp, contraparte)
+        return extrato
+    
+    def pagina(self, cursor=0, limite=None, inicio=None, fim=None):
+        """
+        Retorna uma página de transações usando busca binária no índice de tempo
+        Args:
+            cursor: posição a partir da qual a página começa
+            limite: quantidade máxima de transações (None = sem limite)
+            inicio: timestamp mínimo (inclusivo)
+            fim: timestamp máximo (exclusivo)
+        Returns:
+            tuple: (transacoes, proximo_cursor ou None se não houver mais)
+        """
+        comeco, final, proximo_cursor = self._intervalo(cursor, limite, inicio, fim)
+        return self[comeco:final], proximo_cursor
+    
+    def iterar(self, cursor=0, inicio=None, fim=None):
+        """Percorre as transações do período sem copiar o trecho selecionado"""
+        comeco, final, _ = self._intervalo(cursor, None, inicio, fim)
+        for codigo, valor, timestamp, contraparte in self._linhas(comeco, final):
+            yield transacao_para_dict(TIPOS_TRANSACAO[codigo], valor, timestamp, contraparte)
+    
+    def brutas(self, comeco=0):
+        """(tipo, valor, timestamp) das transações a partir da posição `comeco`, sem montar dicts"""
+        for codigo, valor, timestamp, _ in self._linhas(comeco, len(self)):
+            yield TIPOS_TRANSACAO[codigo], valor, timestamp
+    
+    def _posicao_do_timestamp(self, timestamp):
+        """Primeira posição com timestamp >= o informado; só lê o segmento frio que o contém"""
+        while True:
+            versao = self.versao
+            segmentos = self.segmentos
+            indice = bisect_left(segmentos, timestamp, key=attrgetter('ultimo_timestamp'))
+            if indice < len(segmentos):
+                segmento = segmentos[indice]
+                return segmento.inicio + bisect_left(ler_segmento(segmento)[1], timestamp)
+            posicao = self.base + bisect_left(self.timestamps, timestamp)
+            if versao == self.versao and not versao & 1:
+                return posicao
+            time.sleep(0)
+    
+    def _intervalo(self, cursor, limite, inicio, fim):
+        primeiro = self._posicao_do_timestamp(inicio) if inicio is not None else 0
+        ultimo = self._posicao_do_timestamp(fim) if fim is not None else len(self)
+        
+        comeco = max(cursor, primeiro)
+        final = ultimo if limite is None else min(ultimo, comeco + limite)
+        proximo_cursor = final if final < ultimo else None
+        return comeco, final, proximo_cursor
+
+@dataclass(slots=True)
+class Cliente:
+    nome: str
+    data_nascimento: str
+    cpf: str
+    endereco: dict
+    
+    def para_dict(self):
+        return {
+            "nome": self.nome,
+            "data_nascimento": self.data_nascimento,
+            "cpf": self.cpf,
+            "endereco": dict(self.endereco)
+        }
+    
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(dados['nome'], dados['data_nascimento'], dados['cpf'], dados['endereco'])
+
+@dataclass(slots=True)
+class Conta:
+    numero_conta: int
+    cpf_titular: str
+    agencia: str = AGENCIA
+    saldo: int = 0
+    extrato: Extrato = field(default_factory=Extrato)
+    numero_saques_hoje: int = 0
+    limite_saque: int = 50000
+    limite_saques_diarios: int = 3
+    limite_valor_diario: int = 150000
+    valor_sacado_hoje: int = 0
+    # Dia (ordinal) a que os contadores de saque se referem; zerados na primeira
+    # operação de um novo dia, sem varrer todas as contas à meia-noite
+    dia_saques: int = 0
+    # Buffer circular (timestamp, valor) dos últimos saques, só na janela de 24h
+    saques_recentes: deque = None
+    
+    def para_dict(self):
+        """Conta no formato da API (valores em reais)"""
+        return {
+            "agencia": self.agencia,
+            "numero_conta": self.numero_conta,
+            "cpf_titular": self.cpf_titular,
+            "saldo": reais(self.saldo),
+            "extrato": list(self.extrato),
+            "numero_saques_hoje": self.numero_saques_hoje,
+            "limite_saque": reais(self.limite_saque),
+            "limite_saques_diarios": self.limite_saques_diarios,
+            "limite_valor_diario": reais(self.limite_valor_diario),
+            "valor_sacado_hoje": reais(self.valor_sacado_hoje)
+        }
+    
+    def para_registro(self):
+        """Conta sem o extrato e com valores em centavos, usada no log e nos snapshots"""
+        return {
+            "agencia": self.agencia,
+            "numero_conta": self.numero_conta,
+            "cpf_titular": self.cpf_titular,
+            "saldo": self.saldo,
+            "numero_saques_hoje": self.numero_saques_hoje,
+            "limite_saque": self.limite_saque,
+            "limite_saques_diarios": self.limite_saques_diarios,
+            "limite_valor_diario": self.limite_valor_diario,
+            "valor_sacado_hoje": self.valor_sacado_hoje,
+            "dia_saques": self.dia_saques,
+            "saques_recentes": list(self.saques_recentes or ())
+        }
+    
+    @classmethod
+    def de_registro(cls, dados, extrato=None):
+        return cls(
+            numero_conta=dados['numero_conta'],
+            cpf_titular=dados['cpf_titular'],
+            agencia=dados['agencia'],
+            saldo=dados['saldo'],
+            extrato=extrato if extrato is not None else Extrato(),
+            numero_saques_hoje=dados['numero_saques_hoje'],
+            limite_saque=dados['limite_saque'],
+            limite_saques_diarios=dados['limite_saques_diarios'],
+            limite_valor_diario=dados.get('limite_valor_diario', cls.limite_valor_diario),
+            valor_sacado_hoje=dados.get('valor_sacado_hoje', 0),
+            dia_saques=dados.get('dia_saques', 0),
+            saques_recentes=(deque(map(tuple, dados['saques_recentes']), maxlen=dados['limite_saques_diarios'])
+                             if dados.get('saques_recentes') else None)
+        )
+    
+    def estado_saques(self):
+        """Cópia dos contadores de saque (usada para desfazer operações de lote)"""
+        recentes = tuple(self.saques_recentes) if self.saques_recentes is not None else None
+        return self.numero_saques_hoje, self.valor_sacado_hoje, self.dia_saques, recentes
+    
+    def restaurar_saques(self, estado):
+        self.numero_saques_hoje, self.valor_sacado_hoje, self.dia_saques, recentes = estado
+        self.saques_recentes = deque(recentes, maxlen=self.limite_saques_diarios) if recentes is not None else None
+
+# Janela dos limites de saque: "dia" (dia do calendário) ou "24h" (últimas 24 horas)
+JANELA_SAQUES = os.environ.get('MEU_BANCO_JANELA_SAQUES', 'dia')
+SEGUNDOS_JANELA = 24 * 60 * 60
+
+def saques_na_janela(conta, agora):
+    """
+    Atualiza e retorna os contadores de saque da conta para o instante informado
+    Args:
+        conta: conta consultada (o lock da conta deve estar adquirido)
+        agora: timestamp atual
+    Returns:
+        tuple: (numero_saques, valor_sacado) dentro da janela vigente
+    """
+    if JANELA_SAQUES == '24h':
+        # O buffer guarda no máximo limite_saques_diarios saques, que é o máximo
+        # possível dentro de 24h; percorrê-lo custa O(1)
+        recentes = conta.saques_recentes or ()
+        na_janela = [valor for timestamp, valor in recentes if agora - timestamp < SEGUNDOS_JANELA]
+        conta.numero_saques_hoje = len(na_janela)
+        conta.valor_sacado_hoje = sum(na_janela)
+    else:
+        hoje = datetime.fromtimestamp(agora).toordinal()
+        if conta.dia_saques != hoje:
+            conta.dia_saques = hoje
+            conta.numero_saques_hoje = 0
+            conta.valor_sacado_hoje = 0
+    return conta.numero_saques_hoje, conta.valor_sacado_hoje
+
+def contabilizar_saque(conta, timestamp, valor):
+    """Marca o dia dos contadores e guarda o saque no buffer da janela de 24h"""
+    conta.dia_saques = datetime.fromtimestamp(timestamp).toordinal()
+    if JANELA_SAQUES == '24h':
+        if conta.saques_recentes is None:
+            conta.saques_recentes = deque(maxlen=conta.limite_saques_diarios)
+        conta.saques_recentes.append((timestamp, valor))
+
+# Resumo do banco
+#
+# Totais globais, volumes por dia e ranking de saldos mantidos a cada operação,
+# para que o /resumo não precise percorrer contas nem extratos. Cada operação
+# acumula as suas mudanças na parcial da faixa de locks da conta, já protegida
+# pelo lock que ela retém; a leitura troca as parciais de todas as faixas de uma
+# vez e as incorpora aos agregados, atualizando o ranking só das contas que
+# mudaram. Na recuperação o resumo é reconstruído uma vez a partir do estado
+# carregado.
+DIAS_RESUMO = 90
+MAXIMO_RANKING = 100
+# Transferências contadas uma vez (pelo envio)
+TIPOS_RESUMO = ("Depósito", "Saque", "Transferência enviada")
+
+class IndiceOrdenado:
+    """
+    Lista ordenada dividida em blocos: inclusão e remoção custam uma busca
+    binária nos máximos dos blocos e um deslocamento dentro de um bloco pequeno,
+    em vez de mover a lista inteira
+    """
+    
+    CARGA = 1000
+    
+    def __init__(self):
+        self._blocos = []
+        self._maximos = []
+    
+    def adicionar(self, item):
+        if not self._blocos:
+            self._blocos.append([item])
+            self._maximos.append(item)
+            return
+        posicao = min(bisect_left(self._maximos, item), len(self._blocos) - 1)
+        bloco = self._blocos[posicao]
+        insort(bloco, item)
+        self._maximos[posicao] = bloco[-1]
+        if len(bloco) > 2 * self.CARGA:
+            self._blocos[posicao:posicao + 1] = [bloco[:self.CARGA], bloco[self.CARGA:]]
+            self._maximos[posicao:posicao + 1] = [bloco[self.CARGA - 1], bloco[-1]]
+    
+    def remover(self, item):
+        """Remove o item; retorna False, sem alterar a lista, se ele não estiver nela"""
+        posicao = bisect_left(self._maximos, item)
+        if posicao == len(self._blocos):
+            return False
+        bloco = self._blocos[posicao]
+        indice = bisect_left(bloco, item)
+        if bloco[indice] != item:
+            return False
+        del bloco[indice]
+        if bloco:
+            self._maximos[posicao] = bloco[-1]
+        else:
+            del self._blocos[posicao]
+            del self._maximos[posicao]
+        return True
+    
+    def primeiros(self, quantidade):
+        return list(islice((item for bloco in self._blocos for item in bloco), quantidade))
+    
+    def __len__(self):
+        return sum(map(len, self._blocos))
+
+class ParcialResumo:
+    """Mudanças de uma faixa de contas ainda fora dos agregados do ResumoBanco (centavos)"""
+    
+    __slots__ = ('saldo_total', 'totais', 'volumes_por_dia', 'saldos', '_dia_atual')
+    
+    def __init__(self):
+        self.saldo_total = 0
+        # tipo -> [total, quantidade]
+        self.totais = {tipo: [0, 0] for tipo in TIPOS_RESUMO}
+        self.volumes_por_dia = {}
+        # numero_conta -> [saldo que o ranking conhece, saldo atual]
+        self.saldos = {}
+        self._dia_atual = (0.0, 0.0, None)
+    
+    def _dia(self, timestamp):
+        """Data (ISO) do timestamp; guarda o intervalo do último dia para evitar conversões"""
+        inicio, fim, dia = self._dia_atual
+        if not inicio <= timestamp < fim:
+            data = datetime.fromtimestamp(timestamp).date()
+            inicio = datetime.combine(data, datetime.min.time()).timestamp()
+            dia = data.isoformat()
+            self._dia_atual = (inicio, datetime.combine(data + timedelta(days=1), datetime.min.time()).timestamp(), dia)
+        return dia
+    
+    def contabilizar(self, tipo, valor, timestamp, sinal=1):
+        total = self.totais.get(tipo)
+        if total is None:
+            return
+        total[0] += sinal * valor
+        total[1] += sinal
+        dia = self._dia(timestamp)
+        volumes = self.volumes_por_dia.get(dia)
+        if volumes is None:
+            volumes = self.volumes_por_dia[dia] = dict.fromkeys(TIPOS_RESUMO, 0)
+        volumes[tipo] += sinal * valor
+    
+    def mover_saldo(self, numero_conta, anterior, novo):
+        if anterior != novo:
+            self.saldo_total += novo - anterior
+            saldos = self.saldos.get(numero_conta)
+            if saldos is None:
+                self.saldos[numero_conta] = [anterior, novo]
+            else:
+                saldos[1] = novo
+
+class ResumoBanco:
+    """Agregados do banco atualizados de forma incremental (valores em centavos)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limpar()
+    
+    def limpar(self):
+        with self._lock:
+            self.numero_contas = 0
+            self.saldo_total = 0
+            self.totais = {tipo: [0, 0] for tipo in TIPOS_RESUMO}
+            self.volumes_por_dia = {}
+            # Ranking por saldo decrescente: itens (-saldo, numero_conta)
+            self.ranking = IndiceOrdenado()
+            # Uma parcial por faixa de locks das contas, protegida pelo lock da faixa
+            self._parciais = [ParcialResumo() for _ in range(NUMERO_LOCKS_CONTAS)]
+    
+    def incluir_conta(self, numero_conta, saldo):
+        """Inclui a conta nos agregados; deve ser chamado antes de ela ficar visível para as operações"""
+        with self._lock:
+            self.numero_contas += 1
+            self.saldo_total += saldo
+            self.ranking.adicionar((-saldo, numero_conta))
+    
+    def registrar(self, tipo, valor, timestamp, saldos, sinal=1):
+        """
+        Contabiliza uma transação e as mudanças de saldo que ela causou (quem
+        chama deve reter os locks das contas envolvidas)
+        Args:
+            tipo: tipo da transação (como no extrato)
+            valor: valor em centavos
+            timestamp: momento da transação
+            saldos: pares (numero_conta, saldo_anterior, saldo_novo); a transação conta na faixa da primeira conta
+            sinal: -1 ao desfazer a transação
+        """
+        parciais = self._parciais
+        parciais[saldos[0][0] % NUMERO_LOCKS_CONTAS].contabilizar(tipo, valor, timestamp, sinal)
+        for numero_conta, anterior, novo in saldos:
+            parciais[numero_conta % NUMERO_LOCKS_CONTAS].mover_saldo(numero_conta, anterior, novo)
+    
+    def _incorporar(self):
+        """Troca as parciais de todas as faixas por vazias e as soma aos agregados (com self._lock retido)"""
+        novas = [ParcialResumo() for _ in range(NUMERO_LOCKS_CONTAS)]
+        # Todas as faixas ao mesmo tempo, na ordem crescente usada pelas operações: a troca
+        # não separa as duas pontas de uma transferência nem o meio de um lote
+        for lock in locks_contas:
+            lock.acquire()
+        try:
+            parciais, self._parciais = self._parciais, novas
+        finally:
+            for lock in reversed(locks_contas):
+                lock.release()
+        for parcial in parciais:
+            self._somar(parcial)
+    
+    def _somar(self, parcial):
+        self.saldo_total += parcial.saldo_total
+        for tipo, (total, quantidade) in parcial.totais.items():
+            acumulado = self.totais[tipo]
+            acumulado[0] += total
+            acumulado[1] += quantidade
+        for dia, volumes in parcial.volumes_por_dia.items():
+            acumulado = self.volumes_por_dia.setdefault(dia, dict.fromkeys(TIPOS_RESUMO, 0))
+            for tipo, valor in volumes.items():
+                acumulado[tipo] += valor
+        for numero_conta, (anterior, novo) in parcial.saldos.items():
+            if anterior != novo:
+                self.ranking.remover((-anterior, numero_conta))
+                self.ranking.adicionar((-novo, numero_conta))
+        while len(self.volumes_por_dia) > DIAS_RESUMO:
+            del self.volumes_por_dia[min(self.volumes_por_dia)]
+    
+    def reconstruir(self, contas):
+        """Recalcula todos os agregados a partir das contas (usado após a recuperação)"""
+        self.limpar()
+        # Segmentos arquivados fora da janela de volumes entram só pelos totais,
+        # sem ser lidos do disco
+        corte = (datetime.now() - timedelta(days=DIAS_RESUMO)).timestamp()
+        parcial = ParcialResumo()
+        with self._lock:
+            for conta in contas:
+                self.numero_contas += 1
+                self.saldo_total += conta.saldo
+                self.ranking.adicionar((-conta.saldo, conta.numero_conta))
+                extrato = conta.extrato
+                comeco = 0
+                for segmento in extrato.segmentos:
+                    if segmento.ultimo_timestamp >= corte:
+                        break
+                    for codigo, soma, quantidade in segmento.totais:
+                        total = parcial.totais.get(TIPOS_TRANSACAO[codigo])
+                        if total is not None:
+                            total[0] += soma
+                            total[1] += quantidade
+                    comeco = segmento.inicio + segmento.quantidade
+                for tipo, valor, timestamp in extrato.brutas(comeco):
+                    parcial.contabilizar(tipo, valor, timestamp)
+            self._somar(parcial)
+    
+    def dados(self, top=10, dias=30):
+        """Fotografia dos agregados (centavos), sem percorrer contas"""
+        with self._lock:
+            self._incorporar()
+            ultimos_dias = sorted(self.volumes_por_dia)[-dias:] if dias > 0 else []
+            return {
+                "numero_contas": self.numero_contas,
+                "saldo_total": self.saldo_total,
+                "totais": {tipo: list(total) for tipo, total in self.totais.items()},
+                "volumes_por_dia": {dia: dict(self.volumes_por_dia[dia]) for dia in ultimos_dias},
+                "maiores_saldos": [(-saldo, numero) for saldo, numero in self.ranking.primeiros(top)]
+            }
+
+resumo = ResumoBanco()
+
+def juntar_resumos(parciais, top=10, dias=30):
+    """Combina os dados de resumo de vários shards"""
+    total = {"numero_contas": 0, "saldo_total": 0, "totais": {}, "volumes_por_dia": {}, "maiores_saldos": []}
+    for parcial in parciais:
+        total["numero_contas"] += parcial["numero_contas"]
+        total["saldo_total"] += parcial["saldo_total"]
+        for tipo, (valor, quantidade) in parcial["totais"].items():
+            acumulado = total["totais"].setdefault(tipo, [0, 0])
+            acumulado[0] += valor
+            acumulado[1] += quantidade
+        for dia, volumes in parcial["volumes_por_dia"].items():
+            acumulado = total["volumes_por_dia"].setdefault(dia, dict.fromkeys(volumes, 0))
+            for tipo, valor in volumes.items():
+                acumulado[tipo] += valor
+        total["maiores_saldos"].extend(map(tuple, parcial["maiores_saldos"]))
+    total["maiores_saldos"] = sorted(total["maiores_saldos"], key=lambda item: (-item[0], item[1]))[:top]
+    total["volumes_por_dia"] = {dia: total["volumes_por_dia"][dia] for dia in sorted(total["volumes_por_dia"])[-dias:]}
+    return total
+
+def formatar_resumo(dados):
+    """Resumo no formato da API (valores em reais)"""
+    totais = dados["totais"]
+    return {
+        "sucesso": True,
+        "numero_contas": dados["numero_contas"],
+        "saldo_total": reais(dados["saldo_total"]),
+        "total_depositos": reais(totais["Depósito"][0]),
+        "numero_depositos": totais["Depósito"][1],
+        "total_saques": reais(totais["Saque"][0]),
+        "numero_saques": totais["Saque"][1],
+        "total_transferencias": reais(totais["Transferência enviada"][0]),
+        "numero_transferencias": totais["Transferência enviada"][1],
+        "volumes_por_dia": [
+            {
+                "dia": dia,
+                "depositos": reais(volumes["Depósito"]),
+                "saques": reais(volumes["Saque"]),
+                "transferencias": reais(volumes["Transferência enviada"])
+            }
+            for dia, volumes in dados["volumes_por_dia"].items()
+        ],
+        "maiores_saldos": [{"numero_conta": numero, "saldo": reais(saldo)} for saldo, numero in dados["maiores_saldos"]]
+    }
+
+def indexar_cliente(cliente):
+    """Registra o cliente na lista e no índice por CPF"""
+    clientes.append(cliente)
+    clientes_por_cpf[cliente.cpf] = cliente
+
+def indexar_conta(conta):
+    """Registra a conta no resumo, na lista e nos índices por número e por CPF do titular"""
+    # No resumo antes de ficar visível: nenhuma operação na conta chega antes dela ao ranking
+    resumo.incluir_conta(conta.numero_conta, conta.saldo)
+    contas.append(conta)
+    contas_por_numero[conta.numero_conta] = conta
+    contas_por_cpf.setdefault(conta.cpf_titular, []).append(conta)
+
 def validar_cpf(cpf):
     """Valida se o CPF já existe no sistema"""
-    for cliente in clientes:
-        if cliente['cpf'] == cpf:
-            return False
-    return True
+    return cpf not in clientes_por_cpf
 
 def buscar_cliente_por_cpf(cpf):
     """Busca um cliente pelo CPF"""
-    for cliente in clientes:
-        if cliente['cpf'] == cpf:
-            return cliente
-    return None
+    return clientes_por_cpf.get(cpf)
+
+def buscar_contas_por_cpf(cpf):
+    """Retorna as contas de um titular (lista vazia se não houver)"""
+    return contas_por_cpf.get(cpf, [])
 
 def criar_cliente(nome, data_nascimento, cpf, logradouro, numero, bairro, cidade_uf):
     """Cria um novo cliente no sistema"""
-    if not validar_cpf(cpf):
-        return {"sucesso": False, "mensagem": "CPF já cadastrado no sistema!"}
-    
-    cliente = {
-        "nome": nome,
-        "data_nascimento": data_nascimento,
-        "cpf": cpf,
-        "endereco": {
-            "logradouro": logradouro,
-            "numero": numero,
-            "bairro": bairro,
-            "cidade_uf": cidade_uf
-        }
-    }
+    cliente = Cliente(nome, data_nascimento, cpf, {
+        "logradouro": logradouro,
+        "numero": numero,
+        "bairro": bairro,
+        "cidade_uf": cidade_uf
+    })
     
-    clientes.append(cliente)
-    return {"sucesso": True, "mensagem": "Cliente cadastrado com sucesso!", "cliente": cliente}
+    with lock_cadastro:
+        if not validar_cpf(cpf):
+            return {"sucesso": False, "mensagem": "CPF já cadastrado no sistema!"}
+        registrar_alteracoes(({"op": "cliente", "cliente": cliente.para_dict()},))
+        indexar_cliente(cliente)
+    return {"sucesso": True, "mensagem": "Cliente cadastrado com sucesso!", "cliente": cliente.para_dict()}
 
 def criar_conta_bancaria(cpf):
     """Cria uma nova conta bancária para um cliente existente"""
+    cliente = buscar_cliente_por_cpf(cpf)
+    if not cliente:
+        return {"sucesso": False, "mensagem": "Cliente não encontrado! Cadastre o cliente primeiro."}
+    
+    conta = Conta(numero_conta=alocar_numero_conta(), cpf_titular=cpf)
+    registrar_conta(conta)
+    
+    return {"sucesso": True, "mensagem": f"Conta {conta.numero_conta} criada com sucesso!", "conta": conta.para_dict()}
+
+def registrar_conta(conta):
+    """Grava a criação da conta no log e a torna visível nos índices"""
+    # O registro vai para o log antes da conta ficar visível, para que nenhum
+    # depósito nela seja gravado antes da sua criação
+    with lock_cadastro:
+        registrar_alteracoes(({"op": "conta", "conta": conta.para_registro()},))
+        indexar_conta(conta)
+
+def buscar_conta(numero_conta):
+    """Busca uma conta pelo número"""
+    return contas_por_numero.get(int(numero_conta))
+
+def registrar_transacao(extrato, tipo, valor, contraparte=0, timestamp=None):
+    """Inclui a transação no extrato colunar ou, se for uma lista comum, como dict"""
+    if timestamp is None:
+        timestamp = time.time()
+    if isinstance(extrato, Extrato):
+        extrato.adicionar(tipo, valor, timestamp, contraparte)
+    else:
+        extrato.append(transacao_para_dict(tipo, valor, timestamp, contraparte))
+
+def deposito(saldo, valor, extrato, /):
+    """
+    Função de depósito com argumentos positional-only
+    Args:
+        saldo: saldo atual da conta (centavos)
+        valor: valor a ser depositado (centavos)
+        extrato: lista de transações
+    Returns:
+        tuple: (novo_saldo, extrato_atualizado)
+    """
+    if valor <= 0:
+        raise ValorInvalido("Valor inválido! Tente novamente com um valor acima de 0.")
+    
+    novo_saldo = saldo + valor
+    if novo_saldo > SALDO_MAXIMO:
+        raise LimiteExcedido(f"O saldo máximo de uma conta é de R$ {formatar_reais(SALDO_MAXIMO)}.")
+    registrar_transacao(extrato, "Depósito", valor)
+    
+    return novo_saldo, extrato
+
+def saque(*, saldo, valor, extrato, limite, numero_saques, limite_saques,
+          valor_sacado=0, limite_valor_diario=None):
+    """
+    Função de saque com argumentos keyword-only
+    Args:
+        saldo: saldo atual da conta (centavos)
+        valor: valor a ser sacado (centavos)
+        extrato: lista de transações
+        limite: limite por saque (centavos)
+        numero_saques: número de saques já realizados hoje
+        limite_saques: limite de saques diários
+        valor_sacado: total já sacado hoje (centavos)
+        limite_valor_diario: total máximo de saques por dia (centavos, None = sem limite)
+    Returns:
+        tuple: (novo_saldo, extrato_atualizado, numero_saques_atualizado)
+    """
+    if numero_saques >= limite_saques:
+        raise LimiteExcedido(f"Você atingiu o limite de saques diário ({limite_saques}). Tente novamente em 24 horas!")
+    
+    if valor > limite:
+        raise LimiteExcedido(f"O valor limite por saque é de R$ {formatar_reais(limite)}. Solicite um valor menor!")
+    
+    if limite_valor_diario is not None and valor_sacado + valor > limite_valor_diario:
+        disponivel = max(limite_valor_diario - valor_sacado, 0)
+        raise LimiteExcedido(f"O limite diário de saques é de R$ {formatar_reais(limite_valor_diario)}. "
+                             f"Você ainda pode sacar R$ {formatar_reais(disponivel)} hoje.")
+    
+    if valor > saldo:
+        raise SaldoInsuficiente(f"Saldo insuficiente! Seu saldo atual é de R$ {formatar_reais(saldo)}")
+    
+    if valor <= 0:
+        raise ValorInvalido("Valor inválido! Digite um valor acima de 0.")
+    
+    novo_saldo = saldo - valor
+    registrar_transacao(extrato, "Saque", valor)
+    
+    return novo_saldo, extrato, numero_saques + 1
+
+def transferencia(saldo_origem, saldo_destino, valor, /, *, extrato_origem, extrato_destino,
+                  numero_origem, numero_destino):
+    """
+    Função de transferência entre contas: debita, credita e registra lançamentos
+    ligados (cada um aponta para a outra conta) nos dois extratos
+    Args:
+        saldo_origem: saldo atual da conta de origem (centavos)
+        saldo_destino: saldo atual da conta de destino (centavos)
+        valor: valor a ser transferido (centavos)
+        extrato_origem, extrato_destino: extratos das duas contas
+        numero_origem, numero_destino: números das contas
+    Returns:
+        tuple: (novo_saldo_origem, novo_saldo_destino)
+    """
+    if numero_origem == numero_destino:
+        raise OperacaoRecusada("A conta de destino deve ser diferente da conta de origem.")
+    
+    if valor <= 0:
+        raise ValorInvalido("Valor inválido! Digite um valor acima de 0.")
+    
+    if valor > saldo_origem:
+        raise SaldoInsuficiente(f"Saldo insuficiente! Seu saldo atual é de R$ {formatar_reais(saldo_origem)}")
+    
+    if saldo_destino + valor > SALDO_MAXIMO:
+        raise LimiteExcedido(f"O saldo máximo de uma conta é de R$ {formatar_reais(SALDO_MAXIMO)}.")
+    
+    timestamp = time.time()
+    registrar_transacao(extrato_origem, "Transferência enviada", valor, numero_destino, timestamp)
+    registrar_transacao(extrato_destino, "Transferência recebida", valor, numero_origem, timestamp)
+    
+    return saldo_origem - valor, saldo_destino + valor
+
+def exibir_extrato(saldo, /, *, extrato, incluir_transacoes=True):
+    """
+    Função de extrato com argumentos mistos
+    Args:
+        saldo: saldo atual em centavos (posicional)
+        extrato: lista de transações (nomeado)
+        incluir_transacoes: se False, retorna só saldo e totais (sem ler o histórico)
+    Returns:
+        dict: informações do extrato formatadas
+    """
+    if not isinstance(extrato, Extrato):
+        extrato = Extrato(extrato)
+    
+    total_depositos = extrato.total_depositos
+    total_saques = extrato.total_saques
+    numero_depositos = extrato.numero_depositos
+    numero_saques = extrato.numero_saques
+    
+    return {
+        "saldo": reais(saldo),
+        "transacoes": list(extrato) if incluir_transacoes else [],
+        "total_depositos": reais(total_depositos),
+        "total_saques": reais(total_saques),
+        "numero_depositos": numero_depositos,
+        "numero_saques": numero_saques,
+        "total_transferencias_enviadas": reais(extrato.total_transferencias_enviadas),
+        "total_transferencias_recebidas": reais(extrato.total_transferencias_recebidas)
+    }
+
+def _aplicar_deposito(conta, valor):
+    """Aplica um depósito na conta (o lock da conta deve estar adquirido) e retorna o registro de log"""
+    try:
+        novo_saldo, extrato_atualizado = deposito(conta.saldo, valor, conta.extrato)
+    except OperacaoRecusada as e:
+        metricas.contar("meu_banco_operacoes_total", (("op", "deposito"), ("resultado", e.motivo)))
+        raise
+    metricas.contar("meu_banco_operacoes_total", (("op", "deposito"), ("resultado", "sucesso")))
+    
+    _, valor, timestamp = extrato_atualizado.bruta(-1)
+    resumo.registrar("Depósito", valor, timestamp, ((conta.numero_conta, conta.saldo, novo_saldo),))
+    conta.saldo = novo_saldo
+    conta.extrato = extrato_atualizado
+    
+    return {
+        "op": "deposito",
+        "numero_conta": conta.numero_conta,
+        "indice": len(extrato_atualizado) - 1,
+        "valor": valor,
+        "timestamp": timestamp,
+        "saldo": novo_saldo
+    }
+
+def _aplicar_saque(conta, valor):
+    """Aplica um saque na conta (o lock da conta deve estar adquirido) e retorna o registro de log"""
+    numero_saques, valor_sacado = saques_na_janela(conta, time.time())
+    try:
+        novo_saldo, extrato_atualizado, numero_saques_atualizado = saque(
+            saldo=conta.saldo, valor=valor, extrato=conta.extrato,
+            limite=conta.limite_saque, numero_saques=numero_saques,
+            limite_saques=conta.limite_saques_diarios,
+            valor_sacado=valor_sacado, limite_valor_diario=conta.limite_valor_diario
+        )
+    except OperacaoRecusada as e:
+        metricas.contar("meu_banco_operacoes_total", (("op", "saque"), ("resultado", e.motivo)))
+        raise
+    metricas.contar("meu_banco_operacoes_total", (("op", "saque"), ("resultado", "sucesso")))
+    
+    _, valor, timestamp = extrato_atualizado.bruta(-1)
+    resumo.registrar("Saque", valor, timestamp, ((conta.numero_conta, conta.saldo, novo_saldo),))
+    conta.saldo = novo_saldo
+    conta.extrato = extrato_atualizado
+    conta.numero_saques_hoje = numero_saques_atualizado
+    conta.valor_sacado_hoje = valor_sacado + valor
+    contabilizar_saque(conta, timestamp, valor)
+    
+    return {
+        "op": "saque",
+        "numero_conta": conta.numero_conta,
+        "indice": len(extrato_atualizado) - 1,
+        "valor": valor,
+        "timestamp": timestamp,
+        "saldo": novo_saldo,
+        "numero_saques_hoje": numero_saques_atualizado,
+        "valor_sacado_hoje": conta.valor_sacado_hoje
+    }
+
+def realizar_deposito(conta, valor):
+    """Aplica um depósito na conta e registra a operação na persistência"""
+    with lock_da_conta(conta.numero_conta):
+        registro = _aplicar_deposito(conta, valor)
+        registrar_alteracoes((registro,))
+    return registro['saldo']
+
+def realizar_saque(conta, valor):
+    """Aplica um saque na conta e registra a operação na persistência"""
+    with lock_da_conta(conta.numero_conta):
+        registro = _aplicar_saque(conta, valor)
+        registrar_alteracoes((registro,))
+    return registro['saldo']
+
+def _aplicar_transferencia(origem, destino, valor):
+    """Aplica uma transferência (os locks das duas contas devem estar adquiridos) e retorna o registro de log"""
+    try:
+        novo_saldo_origem, novo_saldo_destino = transferencia(
+            origem.saldo, destino.saldo, valor,
+            extrato_origem=origem.extrato, extrato_destino=destino.extrato,
+            numero_origem=origem.numero_conta, numero_destino=destino.numero_conta
+        )
+    except OperacaoRecusada as e:
+        metricas.contar("meu_banco_operacoes_total", (("op", "transferencia"), ("resultado", e.motivo)))
+        raise
+    metricas.contar("meu_banco_operacoes_total", (("op", "transferencia"), ("resultado", "sucesso")))
+    
+    _, valor, timestamp = origem.extrato.bruta(-1)
+    resumo.registrar("Transferência enviada", valor, timestamp, (
+        (origem.numero_conta, origem.saldo, novo_saldo_origem),
+        (destino.numero_conta, destino.saldo, novo_saldo_destino),
+    ))
+    origem.saldo = novo_saldo_origem
+    destino.saldo = novo_saldo_destino
+    
+    return {
+        "op": "transferencia",
+        "numero_conta": origem.numero_conta,
+        "conta_destino": destino.numero_conta,
+        "indice": len(origem.extrato) - 1,
+        "indice_destino": len(destino.extrato) - 1,
+        "valor": valor,
+        "timestamp": timestamp,
+        "saldo": novo_saldo_origem,
+        "saldo_destino": novo_saldo_destino
+    }
+
+def realizar_transferencia(origem, destino, valor):
+    """
+    Transfere entre duas contas de forma atômica e registra a operação na persistência
+    Returns:
+        tuple: (novo_saldo_origem, novo_saldo_destino)
+    """
+    # Locks sempre na ordem crescente do índice da faixa: duas transferências
+    # em sentidos opostos nunca esperam uma pela outra em ciclo
+    indices_locks = sorted({origem.numero_conta % NUMERO_LOCKS_CONTAS, destino.numero_conta % NUMERO_LOCKS_CONTAS})
+    for indice in indices_locks:
+        locks_contas[indice].acquire()
+    try:
+        registro = _aplicar_transferencia(origem, destino, valor)
+        registrar_alteracoes((registro,))
+    finally:
+        for indice in reversed(indices_locks):
+            locks_contas[indice].release()
+    return registro['saldo'], registro['saldo_destino']
+
+# Operações em lote
+LIMITE_OPERACOES_LOTE = 100_000
+ATOMICIDADES_LOTE = ("por_item", "tudo_ou_nada")
+
+OPERACOES_LOTE = {
+    "deposito": _aplicar_deposito,
+    "saque": _aplicar_saque,
+}
+
+validar_operacao_lote = compilar_esquema({
+    "tipo": campo_escolha(*OPERACOES_LOTE),
+    "numero_conta": campo_inteiro,
+    "valor": para_centavos,
+})
+
+def _ler_operacao_lote(operacao):
+    """Valida o formato de uma operação do lote e retorna (tipo, numero_conta, valor)"""
+    dados = validar_operacao_lote(operacao)
+    return dados['tipo'], dados['numero_conta'], dados['valor']
+
+def _desfazer_lote(aplicadas):
+    """Desfaz, da última para a primeira, operações de lote aplicadas em memória e ainda fora do log"""
+    for conta, saldo, estado_saques in reversed(aplicadas):
+        tipo, valor, timestamp = conta.extrato.bruta(-1)
+        resumo.registrar(tipo, valor, timestamp, ((conta.numero_conta, conta.saldo, saldo),), sinal=-1)
+        conta.extrato.desfazer_ultima()
+        conta.saldo = saldo
+        conta.restaurar_saques(estado_saques)
+
+def _lote_rejeitado(quantidade, posicao, erro):
+    """Resposta de um lote tudo_ou_nada desfeito: a operação que falhou e as demais, não aplicadas"""
+    nao_aplicada = f"Não aplicada: a operação {posicao} do lote falhou."
+    resultados = [{"indice": indice, "sucesso": False, "mensagem": nao_aplicada} for indice in range(quantidade)]
+    resultados[posicao]["mensagem"] = str(erro)
+    return {
+        "sucesso": False,
+        "mensagem": f"Lote rejeitado: operação {posicao} falhou ({erro}). Nenhuma operação foi aplicada.",
+        "aplicadas": 0,
+        "falhas": quantidade,
+        "indice_falha": posicao,
+        "resultados": resultados
+    }
+
+def executar_lote(operacoes, atomicidade="por_item"):
+    """
+    Executa depósitos e saques em lote com as mesmas regras das operações avulsas
+    Args:
+        operacoes: lista de dicts com tipo ('deposito'/'saque'), numero_conta e valor
+        atomicidade: 'por_item' aplica o que for válido; 'tudo_ou_nada' desfaz
+            o lote inteiro se qualquer operação falhar
+    Returns:
+        dict: resultado geral e resultado de cada operação, na ordem recebida
+    """
+    if atomicidade not in ATOMICIDADES_LOTE:
+        raise ValueError(f"Atomicidade inválida: {atomicidade}. Use por_item ou tudo_ou_nada.")
+    if len(operacoes) > LIMITE_OPERACOES_LOTE:
+        raise ValueError(f"O lote pode ter no máximo {LIMITE_OPERACOES_LOTE} operações.")
+    
+    lidas = []
+    for operacao in operacoes:
+        try:
+            lidas.append(_ler_operacao_lote(operacao))
+        except ValueError as e:
+            lidas.append(e)
+    
+    # Todos os locks envolvidos são adquiridos em ordem crescente, evitando deadlock
+    # com outros lotes, e ficam retidos até o lote inteiro estar no log
+    indices_locks = sorted({numero % NUMERO_LOCKS_CONTAS for numero in
+                            (l[1] for l in lidas if not isinstance(l, ValueError))})
+    for indice in indices_locks:
+        locks_contas[indice].acquire()
+    try:
+        resultados = []
+        registros = []
+        desfazer = []
+        try:
+            for posicao, lida in enumerate(lidas):
+                try:
+                    if isinstance(lida, ValueError):
+                        raise lida
+                    tipo, numero_conta, valor = lida
+                    conta = buscar_conta(numero_conta)
+                    if not conta:
+                        raise ValueError("Conta não encontrada!")
+                    
+                    estado_anterior = (conta, conta.saldo, conta.estado_saques())
+                    registro = OPERACOES_LOTE[tipo](conta, valor)
+                    desfazer.append(estado_anterior)
+                    registros.append(registro)
+                    resultados.append({"indice": posicao, "sucesso": True, "saldo": reais(registro['saldo'])})
+                except ValueError as e:
+                    if atomicidade == "tudo_ou_nada":
+                        _desfazer_lote(desfazer)
+                        return _lote_rejeitado(len(lidas), posicao, e)
+                    resultados.append({"indice": posicao, "sucesso": False, "mensagem": str(e)})
+        except Exception:
+            # Erro inesperado no meio do lote: nada pode ficar em memória sem
+            # estar no log. No tudo_ou_nada o lote é desfeito; no por_item as
+            # operações já aplicadas são gravadas antes de o erro subir
+            if atomicidade == "tudo_ou_nada":
+                _desfazer_lote(desfazer)
+            else:
+                registrar_alteracoes(registros)
+            raise
+        
+        registrar_alteracoes(registros)
+    finally:
+        for indice in reversed(indices_locks):
+            locks_contas[indice].release()
+    
+    return {
+        "sucesso": len(registros) == len(lidas),
+        "mensagem": f"{len(registros)} de {len(lidas)} operações realizadas com sucesso!",
+        "aplicadas": len(registros),
+        "falhas": len(lidas) - len(registros),
+        "resultados": resultados
+    }
+
+# Persistência
+#
+# Cada operação bem-sucedida vira um registro no log. Os registros guardam o
+# estado resultante (saldo, posição no extrato), então reaplicá-los é
+# idempotente: um snapshot feito com operações em andamento não causa
+# duplicidade na recuperação. Como cada conta só é alterada com o seu lock,
+# os registros de uma mesma conta aparecem no log na ordem em que ocorreram.
+
+def aplicar_registro(registro):
+    """Reaplica um registro do log sobre o estado em memória"""
     global numero_conta_sequencial
     
-    cliente = buscar_cliente_por_cpf(cpf)
-    if not cliente:
-        return {"sucesso": False, "mensagem": "Cliente não encontrado! Cadastre o cliente primeiro."}
+    op = registro['op']
+    if op == 'cliente':
+        if validar_cpf(registro['cliente']['cpf']):
+            indexar_cliente(Cliente.de_dict(registro['cliente']))
+    elif op == 'conta':
+        dados = registro['conta']
+        if dados['numero_conta'] not in contas_por_numero:
+            indexar_conta(Conta.de_registro(dados))
+        numero_conta_sequencial = max(numero_conta_sequencial, dados['numero_conta'] + 1)
+    elif op in ('deposito', 'saque'):
+        conta = contas_por_numero[registro['numero_conta']]
+        if registro['indice'] >= len(conta.extrato):
+            tipo = "Depósito" if op == 'deposito' else "Saque"
+            conta.extrato.adicionar(tipo, registro['valor'], registro['timestamp'])
+        conta.saldo = registro['saldo']
+        if op == 'saque':
+            conta.numero_saques_hoje = registro['numero_saques_hoje']
+            conta.valor_sacado_hoje = registro.get('valor_sacado_hoje', 0)
+            # O snapshot pode já trazer este saque no buffer da janela de 24h
+            if (registro['timestamp'], registro['valor']) not in (conta.saques_recentes or ()):
+                contabilizar_saque(conta, registro['timestamp'], registro['valor'])
+    elif op == 'transferencia':
+        origem = contas_por_numero[registro['numero_conta']]
+        destino = contas_por_numero[registro['conta_destino']]
+        if registro['indice'] >= len(origem.extrato):
+            origem.extrato.adicionar("Transferência enviada", registro['valor'], registro['timestamp'],
+                                     destino.numero_conta)
+        if registro['indice_destino'] >= len(destino.extrato):
+            destino.extrato.adicionar("Transferência recebida", registro['valor'], registro['timestamp'],
+                                      origem.numero_conta)
+        origem.saldo = registro['saldo']
+        destino.saldo = registro['saldo_destino']
+    else:
+        raise ValueError(f"Registro de log desconhecido: {op}")
+
+def estado_atual():
+    """
+    Retorna o estado completo do banco em formato serializável
+    
+    Nenhum lock fica retido pela cópia inteira: o do cadastro só enquanto as
+    listas são copiadas e o de cada conta só enquanto ela é copiada. Operações
+    feitas no meio da cópia também estão no log e são reaplicadas sem duplicar.
+    """
+    with lock_cadastro:
+        lista_clientes = list(clientes)
+        lista_contas = list(contas)
+        sequencial = numero_conta_sequencial
+    
+    registros_contas = []
+    for conta in lista_contas:
+        with lock_da_conta(conta.numero_conta):
+            registros_contas.append(dict(conta.para_registro(), extrato=conta.extrato.para_colunas()))
+    return {
+        "clientes": [cliente.para_dict() for cliente in lista_clientes],
+        "contas": registros_contas,
+        "numero_conta_sequencial": sequencial
+    }
+
+def carregar_estado(estado):
+    """Substitui o estado em memória pelo conteúdo de um snapshot"""
+    global numero_conta_sequencial
+    
+    clientes.clear()
+    contas.clear()
+    clientes_por_cpf.clear()
+    contas_por_numero.clear()
+    contas_por_cpf.clear()
+    resumo.limpar()
+    for cliente in estado['clientes']:
+        indexar_cliente(Cliente.de_dict(cliente))
+    for conta in estado['contas']:
+        indexar_conta(Conta.de_registro(conta, extrato=Extrato.de_colunas(conta['extrato'])))
+    numero_conta_sequencial = estado['numero_conta_sequencial']
+
+class PersistenciaMemoria:
+    """Backend padrão: nada é gravado, o estado vive apenas em memória"""
+    
+    def registrar(self, registro):
+        pass
+    
+    def registrar_lote(self, registros):
+        pass
+    
+    def fechar(self):
+        pass
+
+class PersistenciaWAL:
+    """
+    Log de escrita antecipada (append-only) com group commit e snapshots
+    Args:
+        diretorio: pasta onde ficam os segmentos do log e os snapshots
+        registros_por_snapshot: quantidade mínima de registros entre snapshots
+            (com muitos cadastros, o intervalo cresce com o tamanho do estado)
+    """
+    
+    def __init__(self, diretorio, registros_por_snapshot=100_000):
+        self.diretorio = diretorio
+        self.registros_por_snapshot = registros_por_snapshot
+        os.makedirs(diretorio, exist_ok=True)
+        
+        self._lock_escrita = threading.Lock()
+        self._lock_fsync = threading.Lock()
+        self._lock_snapshot = threading.Lock()
+        self._escritos = 0
+        self._sincronizados = 0
+        self._desde_snapshot = 0
+        self._snapshot_agendado = False
+        self._segmento = None
+        self._arquivo = None
+    
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+    
+    def _segmentos(self):
+        return sorted(n for n in os.listdir(self.diretorio) if n.startswith('wal-') and n.endswith('.log'))
+    
+    def _abrir_segmento(self, numero):
+        if self._arquivo:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._arquivo.close()
+        self._segmento = f"wal-{numero:012d}.log"
+        self._arquivo = open(self._caminho(self._segmento), 'a', encoding='utf-8')
+    
+    def recuperar(self):
+        """Carrega o último snapshot e reaplica a cauda do log"""
+        inicio = None
+        caminho_snapshot = self._caminho('snapshot.json')
+        if os.path.exists(caminho_snapshot):
+            with open(caminho_snapshot, 'rb') as arquivo:
+                snapshot = decodificar_json(arquivo.read())
+            carregar_estado(snapshot['estado'])
+            inicio = snapshot['segmento']
+        
+        segmentos = [n for n in self._segmentos() if inicio is None or n >= inicio]
+        reaplicados = 0
+        for nome in segmentos:
+            # Leitura binária: uma queda pode cortar a última linha no meio de
+            # um caractere multibyte, e o texto só é decodificado linha a linha
+            with open(self._caminho(nome), 'r+b') as arquivo:
+                posicao = 0
+                for linha in iter(arquivo.readline, b''):
+                    try:
+                        registro = decodificar_json(linha.decode('utf-8'))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        if arquivo.readline():
+                            raise ValueError(f"Registro corrompido no log: {nome}, byte {posicao}.")
+                        # Última linha incompleta de uma queda no meio da escrita
+                        arquivo.truncate(posicao)
+                        break
+                    aplicar_registro(registro)
+                    posicao += len(linha)
+                    reaplicados += 1
+        
+        proximo = int(segmentos[-1][4:-4]) + 1 if segmentos else 1
+        self._abrir_segmento(proximo)
+        return reaplicados
+    
+    def registrar(self, registro):
+        """Grava o registro no log e só retorna depois do fsync (group commit)"""
+        self.registrar_lote([registro])
+    
+    def registrar_lote(self, registros):
+        """Grava vários registros com uma única escrita e um único fsync"""
+        if not registros:
+            return
+        linhas = "".join(codificar_json(registro).decode('utf-8') + "\n" for registro in registros)
+        with self._lock_escrita:
+            self._arquivo.write(linhas)
+            self._escritos += len(registros)
+            self._desde_snapshot += len(registros)
+            sequencia = self._escritos
+            # Um snapshot custa O(tamanho do estado); exigir pelo menos esse número de
+            # registros desde o último mantém o custo amortizado constante por registro
+            agendar = (not self._snapshot_agendado and
+                       self._desde_snapshot >= max(self.registros_por_snapshot, len(clientes) + len(contas)))
+            if agendar:
+                self._snapshot_agendado = True
+        self._sincronizar_ate(sequencia)
+        
+        # Quem grava ainda segura os locks das contas alteradas: o snapshot roda
+        # em outra thread, que espera esses locks serem liberados
+        if agendar:
+            threading.Thread(target=self.snapshot, name="meu-banco-snapshot", daemon=True).start()
+    
+    def _sincronizar_ate(self, sequencia):
+        # Quem entra primeiro faz o fsync de tudo que já foi escrito;
+        # as threads que estavam esperando encontram o trabalho pronto.
+        with self._lock_fsync:
+            if self._sincronizados >= sequencia:
+                return
+            with self._lock_escrita:
+                self._arquivo.flush()
+                alvo = self._escritos
+                descritor = self._arquivo.fileno()
+            os.fsync(descritor)
+            self._sincronizados = alvo
+    
+    def snapshot(self):
+        """Grava um snapshot compacto do estado e descarta os segmentos antigos"""
+        if not self._lock_snapshot.acquire(blocking=False):
+            return
+        try:
+            with self._lock_fsync, self._lock_escrita:
+                if self._arquivo is None:
+                    return
+                self._abrir_segmento(int(self._segmento[4:-4]) + 1)
+                segmento = self._segmento
+                self._sincronizados = self._escritos
+                self._desde_snapshot = 0
+            
+            temporario = self._caminho('snapshot.json.tmp')
+            with open(temporario, 'wb') as arquivo:
+                arquivo.write(codificar_json({"segmento": segmento, "estado": estado_atual()}))
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            os.replace(temporario, self._caminho('snapshot.json'))
+            
+            for nome in self._segmentos():
+                if nome < segmento:
+                    os.remove(self._caminho(nome))
+        finally:
+            self._snapshot_agendado = False
+            self._lock_snapshot.release()
+    
+    def fechar(self):
+        # Um snapshot em andamento termina antes de o segmento ser fechado
+        with self._lock_snapshot, self._lock_fsync, self._lock_escrita:
+            if self._arquivo:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+                self._arquivo.close()
+                self._arquivo = None
+
+persistencia = PersistenciaMemoria()
+
+def configurar_persistencia(backend):
+    """Troca o backend de persistência, recuperando o estado salvo se houver"""
+    global persistencia
+    
+    persistencia.fechar()
+    if hasattr(backend, 'recuperar'):
+        backend.recuperar()
+        # A reaplicação do log altera saldos e extratos diretamente
+        resumo.reconstruir(contas)
+    persistencia = backend
+
+# Feed de alterações
+#
+# Cada registro gravado no log também é publicado, já durável, em um buffer
+# circular em memória com número de sequência crescente. Sistemas externos
+# (fraude, relatórios) leem a partir da última sequência vista, por long-poll
+# ou Server-Sent Events, em vez de varrer todas as contas. A leitura é puxada
+# pelo consumidor: o servidor não acumula nada por assinante, e quem atrasa
+# mais que a capacidade do buffer recebe o aviso de quantos eventos perdeu.
+CAPACIDADE_FEED = int(os.environ.get('MEU_BANCO_FEED_CAPACIDADE', 100_000))
+# Cada assinante ocupa uma thread enquanto espera; o limite deve ficar abaixo de --workers
+MAXIMO_ASSINANTES_FEED = int(os.environ.get('MEU_BANCO_FEED_ASSINANTES', 4))
+LIMITE_LEITURA_FEED = 1000
+ESPERA_MAXIMA_FEED = 60
+# Comentário enviado no SSE quando não há eventos, para detectar conexões mortas
+INTERVALO_HEARTBEAT_SSE = 15
+# Conexões SSE são encerradas depois disso; o cliente reconecta com Last-Event-ID
+DURACAO_MAXIMA_SSE = 300
+INTERVALO_CONSULTA_SHARDS = 0.05
+
+class FeedAlteracoes:
+    """
+    Buffer circular dos registros confirmados, numerados em sequência
+    
+    A numeração começa na época do processo (o instante da carga em
+    microssegundos), então continua crescente depois de um reinício. Como o
+    buffer recomeça vazio, quem retoma de uma sequência de outra época recebe
+    reiniciado=True; perdidos conta só os eventos que saíram do buffer.
+    Args:
+        capacidade: eventos mantidos em memória
+    """
+    
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self._eventos = [None] * capacidade
+        self._condicao = threading.Condition(threading.Lock())
+        self.proxima = self.epoca = time.time_ns() // 1000
+    
+    @property
+    def primeira(self):
+        """Sequência mais antiga ainda disponível no buffer"""
+        return max(self.proxima - self.capacidade, self.epoca)
+    
+    def publicar(self, registros):
+        if not registros:
+            return
+        agora = time.time()
+        with self._condicao:
+            for registro in registros:
+                self._eventos[self.proxima % self.capacidade] = (self.proxima, agora, registro)
+                self.proxima += 1
+            self._condicao.notify_all()
+    
+    def ler(self, desde=None, limite=LIMITE_LEITURA_FEED, espera=0):
+        """
+        Eventos a partir de uma sequência
+        Args:
+            desde: primeira sequência desejada (None = a mais antiga disponível)
+            limite: máximo de eventos retornados
+            espera: segundos aguardando um evento novo quando não houver nenhum
+        Returns:
+            tuple: (eventos (sequencia, timestamp, registro), próxima sequência a pedir,
+                    eventos perdidos, se `desde` é de outra época do processo)
+        """
+        with self._condicao:
+            # desde=0 pede tudo desde o início da época; uma sequência fora da
+            # época atual vem de antes de um reinício e recomeça do início dela
+            reiniciado = bool(desde) and not self.epoca <= desde <= self.proxima
+            if desde is None:
+                desde = self.primeira
+            elif reiniciado or desde < self.epoca:
+                desde = self.epoca
+            if espera > 0:
+                self._condicao.wait_for(lambda: self.proxima > desde, timeout=espera)
+            comeco = max(desde, self.primeira)
+            # Só os eventos que de fato saíram do buffer, limitados à capacidade
+            perdidos = min(comeco - desde, self.capacidade)
+            fim = min(self.proxima, comeco + limite)
+            eventos = [self._eventos[sequencia % self.capacidade] for sequencia in range(comeco, fim)]
+        if perdidos:
+            metricas.contar("meu_banco_feed_eventos_perdidos_total", (), perdidos)
+        if reiniciado:
+            metricas.contar("meu_banco_feed_reinicios_total")
+        return eventos, fim, perdidos, reiniciado
+
+feed_alteracoes = FeedAlteracoes(CAPACIDADE_FEED)
+assinantes_feed = threading.BoundedSemaphore(MAXIMO_ASSINANTES_FEED)
+
+def registrar_alteracoes(registros):
+    """Grava os registros no log e, depois de duráveis, publica-os no feed de alterações"""
+    persistencia.registrar_lote(registros)
+    feed_alteracoes.publicar(registros)
+
+def evento_para_dict(sequencia, timestamp, registro):
+    """Evento do feed no formato da API (valores em reais)"""
+    op = registro['op']
+    evento = {"sequencia": sequencia, "tipo": op, "timestamp": timestamp}
+    if op == 'cliente':
+        evento["cliente"] = registro['cliente']
+    elif op == 'conta':
+        dados = registro['conta']
+        evento.update(agencia=dados['agencia'], numero_conta=dados['numero_conta'],
+                      cpf_titular=dados['cpf_titular'], saldo=reais(dados['saldo']))
+    else:
+        evento.update(numero_conta=registro['numero_conta'], valor=reais(registro['valor']),
+                      saldo=reais(registro['saldo']), timestamp=registro['timestamp'])
+        if op == 'transferencia':
+            evento.update(conta_destino=registro['conta_destino'], saldo_destino=reais(registro['saldo_destino']))
+    evento["data_hora"] = datetime.fromtimestamp(evento["timestamp"]).strftime(FORMATO_DATA_HORA)
+    return evento
+
+def servico_alteracoes(desde=None, limite=LIMITE_LEITURA_FEED, espera=0):
+    """Leitura do feed já convertida para a API (nos shards, sempre sem espera)"""
+    eventos, proxima, perdidos, reiniciado = feed_alteracoes.ler(desde, limite, espera)
+    return {
+        "eventos": [evento_para_dict(*evento) for evento in eventos],
+        "proxima": proxima,
+        "perdidos": perdidos,
+        "epoca": feed_alteracoes.epoca,
+        "reiniciado": reiniciado
+    }
+
+def ler_alteracoes(desde, limite, espera, shard=None):
+    """Leitura do feed local ou, no modo particionado, do feed do shard informado"""
+    if roteador is None:
+        return servico_alteracoes(desde, limite, espera)
+    if shard is None or not 0 <= shard < roteador.total:
+        raise ValueError(f"No modo particionado, informe o shard (0 a {roteador.total - 1}).")
+    if shard == roteador.local:
+        return servico_alteracoes(desde, limite, espera)
+    # A espera é feita aqui, consultando o shard de tempos em tempos, para não prender uma thread de serviço dele
+    prazo = time.monotonic() + espera
+    while True:
+        resultado = roteador.chamar(shard, "alteracoes", desde, limite)
+        if (resultado["eventos"] or resultado["perdidos"] or resultado["reiniciado"]
+                or time.monotonic() >= prazo):
+            return resultado
+        desde = resultado["proxima"]
+        time.sleep(INTERVALO_CONSULTA_SHARDS)
+
+def arquivar_conta(conta, limite_timestamp):
+    """Move para segmentos frios as transações da conta anteriores ao limite; retorna quantas"""
+    arquivadas = 0
+    while True:
+        with lock_da_conta(conta.numero_conta):
+            extrato = conta.extrato
+            inicio, colunas = extrato.colunas_antigas(limite_timestamp, ARQUIVAR_MAXIMO)
+        if len(colunas[0]) < ARQUIVAR_MINIMO:
+            return arquivadas
+        
+        # Compressão e fsync fora do lock: as operações na conta só acrescentam
+        # transações no fim, então o trecho copiado continua o mesmo
+        segmento = armazem_frio.gravar(inicio, colunas)
+        with lock_da_conta(conta.numero_conta):
+            if conta.extrato is not extrato or extrato.base != inicio:
+                return arquivadas
+            extrato.anexar_segmento(segmento)
+        arquivadas += segmento.quantidade
+
+def arquivar_extratos(idade_segundos):
+    """Arquiva em todas as contas as transações mais antigas que a idade informada"""
+    limite_timestamp = time.time() - idade_segundos
+    return sum(arquivar_conta(conta, limite_timestamp) for conta in islice(contas, len(contas)))
+
+def configurar_armazem_frio(diretorio_dados=None):
+    """
+    Abre o armazenamento frio (necessário para ler segmentos citados em snapshots)
+    e, se MEU_BANCO_ARQUIVAR_DIAS estiver definido, inicia o arquivamento periódico
+    """
+    global armazem_frio
+    
+    dias = os.environ.get('MEU_BANCO_ARQUIVAR_DIAS')
+    if diretorio_dados:
+        diretorio = os.path.join(diretorio_dados, 'frio')
+    elif dias:
+        diretorio = tempfile.mkdtemp(prefix='meu-banco-frio-')
+        atexit.register(shutil.rmtree, diretorio, True)
+    else:
+        return
+    armazem_frio = ArmazemFrio(diretorio)
+    ler_segmento.cache_clear()
+    
+    if dias:
+        idade = float(dias) * 24 * 3600
+        intervalo = float(os.environ.get('MEU_BANCO_ARQUIVAR_INTERVALO', 300))
+        
+        def arquivar_periodicamente():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    arquivar_extratos(idade)
+                except OSError as e:
+                    print(f"⚠️ Falha ao arquivar transações: {e}")
+        
+        threading.Thread(target=arquivar_periodicamente, name='meu-banco-arquivador', daemon=True).start()
+
+LIMITE_PAGINA_MAXIMO = 1000
+
+def ler_filtro_data(valor, *, fim=False):
+    """
+    Converte o parâmetro de data da URL em timestamp
+    Args:
+        valor: data ISO (AAAA-MM-DD), data e hora ISO ou timestamp numérico
+        fim: se True, retorna o limite exclusivo (o dia inteiro é incluído)
+    Returns:
+        float ou None se o parâmetro não foi informado
+    """
+    if not valor:
+        return None
+    try:
+        timestamp = float(valor)
+        data_apenas = False
+    except ValueError:
+        try:
+            momento = datetime.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f"Data inválida: {valor}. Use o formato AAAA-MM-DD.")
+        data_apenas = len(valor) == 10
+        if fim and data_apenas:
+            momento += timedelta(days=1)
+        timestamp = momento.timestamp()
+    
+    if fim and not data_apenas:
+        timestamp = math.nextafter(timestamp, math.inf)
+    return timestamp
+
+# Exportação em streaming (NDJSON / CSV)
+LINHAS_POR_BLOCO = 500
+
+CAMPOS_LISTAGEM_CONTAS = ("agencia", "numero_conta", "titular", "cpf", "saldo")
+CAMPOS_TRANSACAO = ("tipo", "valor", "data_hora", "timestamp", "conta_contraparte")
+
+def _linhas_ndjson(itens, campos):
+    for item in itens:
+        yield codificar_json(item).decode('utf-8') + "\n"
+
+def _linhas_csv(itens, campos):
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=campos, extrasaction='ignore')
+    escritor.writeheader()
+    for item in itens:
+        escritor.writerow(item)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+FORMATOS_STREAMING = {
+    "ndjson": (_linhas_ndjson, "application/x-ndjson"),
+    "csv": (_linhas_csv, "text/csv"),
+}
+
+def resposta_streaming(itens, formato, campos):
+    """
+    Gera uma resposta HTTP em blocos (chunked) a partir de um iterador,
+    sem materializar o resultado inteiro em memória
+    """
+    if formato not in FORMATOS_STREAMING:
+        raise ValueError(f"Formato inválido: {formato}. Use ndjson ou csv.")
+    gerar_linhas, tipo_conteudo = FORMATOS_STREAMING[formato]
+    
+    def blocos():
+        linhas = gerar_linhas(itens, campos)
+        while True:
+            bloco = "".join(islice(linhas, LINHAS_POR_BLOCO))
+            if not bloco:
+                break
+            yield bloco
+    
+    return Response(blocos(), mimetype=tipo_conteudo)
+
+def iterar_contas_info():
+    """Percorre as contas gerando o resumo exibido na listagem"""
+    # islice até o tamanho atual: contas criadas durante a listagem ficam de fora
+    for conta in islice(contas, len(contas)):
+        cliente = buscar_cliente_por_cpf(conta.cpf_titular)
+        yield {
+            "agencia": conta.agencia,
+            "numero_conta": conta.numero_conta,
+            "titular": cliente.nome if cliente else "Cliente não encontrado",
+            "cpf": conta.cpf_titular,
+            "saldo": reais(conta.saldo)
+        }
+
+# Serviços
+#
+# As rotas delegam a estes serviços, que recebem e devolvem apenas dados
+# simples. No modo normal eles são chamados diretamente; no modo particionado
+# (--shards) rodam no processo que é dono da conta ou do cliente.
+
+def servico_criar_conta(cpf, numero_conta):
+    """Cria a conta com o número já alocado (o titular é validado por quem chama)"""
+    conta = Conta(numero_conta=numero_conta, cpf_titular=cpf)
+    registrar_conta(conta)
+    return {"sucesso": True, "mensagem": f"Conta {numero_conta} criada com sucesso!", "conta": conta.para_dict()}
+
+def servico_depositar(numero_conta, valor):
+    conta = buscar_conta(numero_conta)
+    if not conta:
+        return {"sucesso": False, "mensagem": "Conta não encontrada!"}
+    
+    novo_saldo = realizar_deposito(conta, valor)
+    return {
+        "sucesso": True,
+        "mensagem": f"Depósito de R$ {formatar_reais(valor)} realizado com sucesso!",
+        "saldo": reais(novo_saldo)
+    }
+
+def servico_sacar(numero_conta, valor):
+    conta = buscar_conta(numero_conta)
+    if not conta:
+        return {"sucesso": False, "mensagem": "Conta não encontrada!"}
+    
+    novo_saldo = realizar_saque(conta, valor)
+    return {
+        "sucesso": True,
+        "mensagem": f"Saque de R$ {formatar_reais(valor)} realizado com sucesso!",
+        "saldo": reais(novo_saldo)
+    }
+
+def servico_transferir(numero_origem, numero_destino, valor):
+    origem = buscar_conta(numero_origem)
+    destino = buscar_conta(numero_destino)
+    if not origem or not destino:
+        return {"sucesso": False, "mensagem": "Conta não encontrada!"}
+    
+    novo_saldo, _ = realizar_transferencia(origem, destino, valor)
+    return {
+        "sucesso": True,
+        "mensagem": f"Transferência de R$ {formatar_reais(valor)} para a conta {numero_destino} realizada com sucesso!",
+        "saldo": reais(novo_saldo)
+    }
+
+def servico_extrato(numero_conta, pagina=None):
+    """
+    Extrato da conta
+    Args:
+        numero_conta: número da conta
+        pagina: None para o extrato completo ou dict com cursor, limite, inicio e fim
+    """
+    conta = buscar_conta(numero_conta)
+    if not conta:
+        return {"sucesso": False, "mensagem": "Conta não encontrada!"}
+    
+    resultado = exibir_extrato(conta.saldo, extrato=conta.extrato, incluir_transacoes=pagina is None)
+    if pagina is not None:
+        transacoes, proximo_cursor = conta.extrato.pagina(**pagina)
+        resultado['transacoes'] = transacoes
+        resultado['proximo_cursor'] = proximo_cursor
+    
+    resultado['sucesso'] = True
+    resultado['numero_conta'] = numero_conta
+    resultado['agencia'] = conta.agencia
+    return resultado
+
+def servico_transacoes(numero_conta, cursor=0, inicio=None, fim=None):
+    """Iterador das transações do período (usado na exportação em streaming)"""
+    conta = buscar_conta(numero_conta)
+    if not conta:
+        raise ValueError("Conta não encontrada!")
+    return conta.extrato.iterar(cursor=cursor, inicio=inicio, fim=fim)
+
+def servico_existe_cliente(cpf):
+    return not validar_cpf(cpf)
+
+def servico_nomes_clientes(cpfs):
+    """Nome de cada CPF informado que estiver cadastrado neste processo"""
+    return {cpf: clientes_por_cpf[cpf].nome for cpf in cpfs if cpf in clientes_por_cpf}
+
+def servico_contas_sem_titular():
+    """Resumo das contas deste processo sem o nome do titular"""
+    return [(conta.agencia, conta.numero_conta, conta.cpf_titular, conta.saldo)
+            for conta in islice(contas, len(contas))]
+
+def servico_maior_numero_conta():
+    return max(contas_por_numero, default=0)
+
+def servico_importar_clientes(registros):
+    """
+    Cadastra clientes em massa, com um único registro em lote no log
+    Args:
+        registros: dicts já validados com os campos de /criar_cliente
+    Returns:
+        list: posições (em registros) recusadas por CPF já cadastrado ou repetido
+    """
+    with lock_cadastro:
+        # Uma interseção de conjuntos, em vez de uma consulta por linha
+        existentes = clientes_por_cpf.keys() & {registro['cpf'] for registro in registros}
+        novos = []
+        recusados = []
+        for posicao, registro in enumerate(registros):
+            cpf = registro['cpf']
+            if cpf in existentes:
+                recusados.append(posicao)
+                continue
+            existentes.add(cpf)
+            novos.append(Cliente(registro['nome'], registro['data_nascimento'], cpf, {
+                "logradouro": registro['logradouro'],
+                "numero": registro['numero'],
+                "bairro": registro['bairro'],
+                "cidade_uf": registro['cidade_uf']
+            }))
+        registrar_alteracoes([{"op": "cliente", "cliente": cliente.para_dict()} for cliente in novos])
+        for cliente in novos:
+            indexar_cliente(cliente)
+    return recusados
+
+def servico_importar_contas(pares):
+    """Cria contas em massa a partir de pares (cpf, numero_conta); os titulares são validados por quem chama"""
+    novas = [Conta(numero_conta=numero_conta, cpf_titular=cpf) for cpf, numero_conta in pares]
+    with lock_cadastro:
+        registrar_alteracoes([{"op": "conta", "conta": conta.para_registro()} for conta in novas])
+        for conta in novas:
+            indexar_conta(conta)
+    return len(novas)
+
+def servico_http(variaveis, corpo):
+    """
+    Atende no app Flask deste processo uma requisição encaminhada por outro
+    (EncaminhadorShards) e devolve a resposta inteira
+    Returns:
+        tuple: (status, cabeçalhos, corpo)
+    """
+    environ = dict(variaveis)
+    environ.update({
+        'CONTENT_LENGTH': str(len(corpo)),
+        'wsgi.version': (1, 0),
+        'wsgi.input': io.BytesIO(corpo),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        # Já chegou ao dono: o EncaminhadorShards não relê o corpo
+        'meu_banco.encaminhada': True,
+    })
+    resposta = {}
+    
+    def start_response(status, cabecalhos, exc_info=None):
+        resposta['status'] = status
+        resposta['cabecalhos'] = cabecalhos
+    
+    iteravel = app.wsgi_app(environ, start_response)
+    try:
+        corpo = b"".join(iteravel)
+    finally:
+        if hasattr(iteravel, 'close'):
+            iteravel.close()
+    return resposta['status'], resposta['cabecalhos'], corpo
+
+SERVICOS = {
+    "http": servico_http,
+    "criar_cliente": criar_cliente,
+    "criar_conta": servico_criar_conta,
+    "depositar": servico_depositar,
+    "sacar": servico_sacar,
+    "transferir": servico_transferir,
+    "extrato": servico_extrato,
+    "transacoes": servico_transacoes,
+    "lote": executar_lote,
+    "existe_cliente": servico_existe_cliente,
+    "nomes_clientes": servico_nomes_clientes,
+    "contas_sem_titular": servico_contas_sem_titular,
+    "maior_numero_conta": servico_maior_numero_conta,
+    "alocar_faixa_contas": alocar_faixa_contas,
+    "garantir_numeracao": garantir_numeracao,
+    "importar_clientes": servico_importar_clientes,
+    "importar_contas": servico_importar_contas,
+    "metricas": metricas.coletar,
+    "resumo": resumo.dados,
+    "alteracoes": servico_alteracoes,
+}
+
+# Particionamento entre processos (shards)
+#
+# Contas ficam no shard numero_conta % N e clientes no shard crc32(cpf) % N.
+# Cada shard é um processo com o próprio app Flask, e todos atendem HTTP no
+# mesmo socket de escuta, aberto pelo processo principal (como um servidor
+# pre-fork). Uma requisição de conta ou cliente de outro shard segue inteira
+# para o dono (EncaminhadorShards); as rotas que envolvem vários shards, como a
+# listagem de contas, consultam os demais pelos serviços (scatter-gather). O
+# shard 0 é quem numera as contas.
+#
+# Os processos conversam por pares de Pipes (pedidos e respostas), um para
+# cada origem e destino: várias chamadas ficam em andamento ao mesmo tempo,
+# identificadas por número, e uma thread de quem chamou entrega cada resposta
+# a quem a espera. Sem servidor HTTP nos shards (importação pela linha de
+# comando, testes), o processo principal atende as rotas e faz o mesmo papel.
+
+# Threads que executam os serviços pedidos a um shard pelos outros processos
+THREADS_SERVICOS_SHARD = 16
+
+def _executar_servico(nome, args):
+    """Executa um serviço pedido por outro processo; generators viram lista para atravessar o Pipe"""
+    resultado = SERVICOS[nome](*args)
+    if isinstance(resultado, GeneratorType):
+        resultado = list(resultado)
+    return resultado
+
+def _atender_conexao(pedidos, respostas, executor):
+    """Recebe os pedidos de um processo e devolve cada resposta assim que o serviço termina"""
+    lock_envio = threading.Lock()
+    
+    def executar(identificador, nome, args):
+        try:
+            resposta = ("ok", _executar_servico(nome, args))
+        except Exception as e:
+            resposta = ("erro", (motivo_do_erro(e), str(e)))
+        with lock_envio:
+            try:
+                respostas.send((identificador, resposta))
+            except OSError:
+                pass  # quem pediu já encerrou
+    
+    while True:
+        try:
+            identificador, nome, args = pedidos.recv()
+        except (EOFError, OSError):
+            break
+        executor.submit(executar, identificador, nome, args)
+
+def _executar_shard(indice, total, entradas, saidas, diretorio_dados, servidor):
+    """
+    Processo shard: recupera o estado, atende os serviços pedidos pelos outros
+    processos e, se `servidor` for informado, também as requisições HTTP
+    Args:
+        entradas: pares (pedidos, respostas) vindos do processo principal (o primeiro) e dos outros shards
+        saidas: pares (envio, leitura) até cada outro shard, por índice
+        servidor: (modo, socket de escuta, workers, max_conexoes) ou None
+    """
+    global roteador, numero_conta_sequencial
+    
+    configurar_armazem_frio(diretorio_dados)
+    if diretorio_dados:
+        configurar_persistencia(PersistenciaWAL(diretorio_dados))
+    conexoes = [None if shard == indice else ConexaoShard(shard, *saidas[shard]) for shard in range(total)]
+    roteador = RoteadorShards(total, local=indice, conexoes=conexoes)
+    
+    executor = ThreadPoolExecutor(max_workers=THREADS_SERVICOS_SHARD, thread_name_prefix=f"meu-banco-shard-{indice}")
+    atendimentos = [threading.Thread(target=_atender_conexao, args=(pedidos, respostas, executor), daemon=True)
+                    for pedidos, respostas in entradas]
+    # Quem pedir um número de conta ao shard 0 espera a numeração alcançar a maior conta de todos os shards
+    with lock_numero_conta:
+        for atendimento in atendimentos:
+            atendimento.start()
+        if indice == 0:
+            maior = max(roteador.em_todos("maior_numero_conta").values())
+            numero_conta_sequencial = max(numero_conta_sequencial, maior + 1)
+    
+    if servidor is None:
+        # O shard vive enquanto o processo principal mantiver a conexão aberta
+        atendimentos[0].join()
+    else:
+        def parar_com_o_principal():
+            atendimentos[0].join()
+            signal.raise_signal(signal.SIGINT)
+        
+        threading.Thread(target=parar_com_o_principal, daemon=True).start()
+        try:
+            servir(*servidor)
+        except KeyboardInterrupt:
+            pass
+    persistencia.fechar()
+
+class ConexaoShard:
+    """
+    Lado de quem chama de um par de Pipes até um shard
+    Args:
+        shard: índice do shard de destino
+        envio: Pipe por onde seguem os pedidos
+        leitura: Pipe por onde chegam as respostas
+    """
+    
+    def __init__(self, shard, envio, leitura):
+        self.shard = shard
+        self.envio = envio
+        # Só a escrita no Pipe é exclusiva; as respostas chegam pela thread leitora
+        self.lock = threading.Lock()
+        self._pendentes = {}
+        self._sequencia = count()
+        threading.Thread(target=self._receber, args=(leitura,),
+                         name=f"meu-banco-shard-{shard}-respostas", daemon=True).start()
+    
+    def _receber(self, leitura):
+        """Entrega cada resposta do shard à chamada que a espera, até o shard encerrar"""
+        while True:
+            try:
+                identificador, resposta = leitura.recv()
+            except (EOFError, OSError):
+                break
+            self._pendentes.pop(identificador).set_result(resposta)
+        leitura.close()
+        while self._pendentes:
+            _, futuro = self._pendentes.popitem()
+            futuro.set_result(self._encerrado())
+    
+    def _encerrado(self):
+        return ("erro", ("erro", f"O shard {self.shard} foi encerrado."))
+    
+    def enviar(self, nome, args):
+        """Envia o pedido sem esperar; o Future recebe ("ok", resultado) ou ("erro", (motivo, mensagem))"""
+        identificador = next(self._sequencia)
+        futuro = self._pendentes[identificador] = Future()
+        try:
+            with self.lock:
+                self.envio.send((identificador, nome, args))
+        except OSError:
+            self._pendentes.pop(identificador, None)
+            futuro.set_result(self._encerrado())
+        return futuro
+    
+    def fechar(self):
+        # Sem pedidos, o shard deixa de atender esta conexão e fecha as respostas, o que encerra a thread leitora
+        self.envio.close()
+
+class RoteadorShards:
+    """
+    Encaminha os serviços para os N shards
+    
+    No processo principal, sobe os processos shard (e, com `servidor`, cada um
+    atende HTTP no socket informado); dentro de um shard, recebe as conexões
+    até os demais e executa localmente os serviços do próprio índice.
+    Args:
+        total: quantidade de shards
+        diretorio_dados: se informado, cada shard persiste em diretorio_dados/shard-<i>
+        servidor: (modo, socket de escuta, workers, max_conexoes) para os shards atenderem HTTP
+        local: índice do shard deste processo (só dentro de um shard)
+        conexoes: ConexaoShard de cada shard, None no local (só dentro de um shard)
+    """
+    
+    def __init__(self, total, diretorio_dados=None, servidor=None, *, local=None, conexoes=None):
+        self.total = total
+        self.local = local
+        self.processos = []
+        self.conexoes = conexoes if conexoes is not None else self._iniciar_processos(diretorio_dados, servidor)
+    
+    def _iniciar_processos(self, diretorio_dados, servidor):
+        contexto = multiprocessing.get_context('spawn')
+        # Um par de Pipes para cada origem (None é este processo) e destino
+        entradas = [[] for _ in range(self.total)]
+        saidas = [{} for _ in range(self.total)]
+        proprias = []
+        for destino in range(self.total):
+            for origem in (None, *range(self.total)):
+                if origem == destino:
+                    continue
+                leitura_pedidos, envio_pedidos = contexto.Pipe(duplex=False)
+                leitura_respostas, envio_respostas = contexto.Pipe(duplex=False)
+                entradas[destino].append((leitura_pedidos, envio_respostas))
+                if origem is None:
+                    proprias.append((envio_pedidos, leitura_respostas))
+                else:
+                    saidas[origem][destino] = (envio_pedidos, leitura_respostas)
+        
+        for indice in range(self.total):
+            diretorio = os.path.join(diretorio_dados, f"shard-{indice}") if diretorio_dados else None
+            processo = contexto.Process(target=_executar_shard,
+                                        args=(indice, self.total, entradas[indice], saidas[indice], diretorio, servidor),
+                                        name=f"meu-banco-shard-{indice}", daemon=True)
+            processo.start()
+            self.processos.append(processo)
+            # As pontas do shard já foram duplicadas para ele
+            for par in (*entradas[indice], *saidas[indice].values()):
+                for conexao in par:
+                    conexao.close()
+        return [ConexaoShard(shard, envio, leitura) for shard, (envio, leitura) in enumerate(proprias)]
+    
+    def shard_da_conta(self, numero_conta):
+        return int(numero_conta) % self.total
+    
+    def shard_do_cliente(self, cpf):
+        return zlib.crc32(str(cpf).encode('utf-8')) % self.total
+    
+    def chamar(self, shard, nome, *args):
+        """Executa um serviço no shard e devolve o resultado (erros viram ValueError)"""
+        return self.chamar_varios({shard: (nome, args)})[shard]
+    
+    def chamar_varios(self, chamadas):
+        """Envia chamadas a vários shards de uma vez e espera todas as respostas; a do shard local roda aqui"""
+        futuros = {shard: self.conexoes[shard].enviar(nome, args)
+                   for shard, (nome, args) in chamadas.items() if shard != self.local}
+        resultados = {}
+        if self.local in chamadas:
+            resultados[self.local] = _executar_servico(*chamadas[self.local])
+        
+        for shard, futuro in futuros.items():
+            status, valor = futuro.result()
+            if status == "erro":
+                motivo, mensagem = valor
+                raise RECUSAS.get(motivo, ValueError)(mensagem)
+            resultados[shard] = valor
+        return resultados
+    
+    def em_todos(self, nome, *args):
+        return self.chamar_varios({shard: (nome, args) for shard in range(self.total)})
+    
+    def nos_outros(self, nome, *args):
+        """Como em_todos, mas sem o shard deste processo"""
+        return self.chamar_varios({shard: (nome, args) for shard in range(self.total) if shard != self.local})
+    
+    def criar_conta(self, cpf):
+        if not self.chamar(self.shard_do_cliente(cpf), "existe_cliente", cpf):
+            return {"sucesso": False, "mensagem": "Cliente não encontrado! Cadastre o cliente primeiro."}
+        numero_conta = alocar_numero_conta()
+        return self.chamar(self.shard_da_conta(numero_conta), "criar_conta", cpf, numero_conta)
+    
+    def listar_contas(self):
+        """Scatter-gather: junta as contas de todos os shards e busca os nomes dos titulares"""
+        contas_shards = [c for lista in self.em_todos("contas_sem_titular").values() for c in lista]
+        
+        cpfs_por_shard = {}
+        for _, _, cpf, _ in contas_shards:
+            cpfs_por_shard.setdefault(self.shard_do_cliente(cpf), set()).add(cpf)
+        nomes = {}
+        for parcial in self.chamar_varios({shard: ("nomes_clientes", (list(cpfs),))
+                                           for shard, cpfs in cpfs_por_shard.items()}).values():
+            nomes.update(parcial)
+        
+        return [{
+            "agencia": agencia,
+            "numero_conta": numero_conta,
+            "titular": nomes.get(cpf, "Cliente não encontrado"),
+            "cpf": cpf,
+            "saldo": reais(saldo)
+        } for agencia, numero_conta, cpf, saldo in sorted(contas_shards, key=lambda c: c[1])]
+    
+    def importar_clientes(self, registros):
+        """Divide os clientes pelo shard do CPF; retorna as posições recusadas"""
+        grupos = {}
+        for posicao, registro in enumerate(registros):
+            grupos.setdefault(self.shard_do_cliente(registro['cpf']), []).append(posicao)
+        respostas = self.chamar_varios({shard: ("importar_clientes", ([registros[p] for p in posicoes],))
+                                        for shard, posicoes in grupos.items()})
+        return sorted(grupos[shard][p] for shard, recusados in respostas.items() for p in recusados)
     
-    conta = {
-        "agencia": AGENCIA,
-        "numero_conta": numero_conta_sequencial,
-        "cpf_titular": cpf,
-        "saldo": 0,
-        "extrato": [],
-        "numero_saques_hoje": 0,
-        "limite_saque": 500,
-        "limite_saques_diarios": 3
-    }
+    def importar_contas(self, pares):
+        grupos = {}
+        for par in pares:
+            grupos.setdefault(self.shard_da_conta(par[1]), []).append(par)
+        importadas = sum(self.chamar_varios({shard: ("importar_contas", (lista,))
+                                             for shard, lista in grupos.items()}).values())
+        if pares:
+            self.chamar(0, "garantir_numeracao", max(numero for _, numero in pares))
+        return importadas
     
-    contas.append(conta)
-    numero_conta_sequencial += 1
+    def executar_lote(self, operacoes, atomicidade="por_item"):
+        """Divide o lote por shard; tudo_ou_nada só é aceito se envolver um único shard"""
+        if len(operacoes) > LIMITE_OPERACOES_LOTE:
+            raise ValueError(f"O lote pode ter no máximo {LIMITE_OPERACOES_LOTE} operações.")
+        
+        grupos = {}
+        for posicao, operacao in enumerate(operacoes):
+            try:
+                shard = self.shard_da_conta(operacao['numero_conta'])
+            except (KeyError, TypeError, ValueError):
+                shard = 0  # o shard valida e devolve o erro da operação
+            grupos.setdefault(shard, []).append(posicao)
+        if atomicidade == "tudo_ou_nada" and len(grupos) > 1:
+            raise ValueError("No modo particionado, lotes tudo_ou_nada devem envolver contas de um único shard.")
+        
+        respostas = self.chamar_varios({shard: ("lote", ([operacoes[p] for p in posicoes], atomicidade))
+                                        for shard, posicoes in grupos.items()})
+        resultados = []
+        for shard, resposta in respostas.items():
+            for resultado in resposta['resultados']:
+                resultado['indice'] = grupos[shard][resultado['indice']]
+                resultados.append(resultado)
+            if not resposta['sucesso'] and atomicidade == "tudo_ou_nada":
+                resposta['indice_falha'] = grupos[shard][resposta['indice_falha']]
+                resposta['resultados'] = resultados
+                return resposta
+        resultados.sort(key=lambda r: r['indice'])
+        
+        aplicadas = sum(r['aplicadas'] for r in respostas.values())
+        return {
+            "sucesso": aplicadas == len(operacoes),
+            "mensagem": f"{aplicadas} de {len(operacoes)} operações realizadas com sucesso!",
+            "aplicadas": aplicadas,
+            "falhas": len(operacoes) - aplicadas,
+            "resultados": resultados
+        }
     
-    return {"sucesso": True, "mensagem": f"Conta {conta['numero_conta']} criada com sucesso!", "conta": conta}
+    def encerrar(self):
+        # Sem a conexão do processo principal, cada shard para de atender e fecha o log
+        for conexao in self.conexoes:
+            if conexao is not None:
+                conexao.fechar()
+        for processo in self.processos:
+            processo.join(timeout=5)
 
-def buscar_conta(numero_conta):
-    """Busca uma conta pelo número"""
-    for conta in contas:
-        if conta['numero_conta'] == int(numero_conta):
-            return conta
-    return None
+roteador = None
 
-def deposito(saldo, valor, extrato, /):
+def iniciar_shards(total, diretorio_dados=None, servidor=None):
     """
-    Função de depósito com argumentos positional-only
+    Sobe os processos shard e passa a encaminhar as operações para eles
     Args:
-        saldo: saldo atual da conta
-        valor: valor a ser depositado
-        extrato: lista de transações
-    Returns:
-        tuple: (novo_saldo, extrato_atualizado)
+        servidor: (modo, socket de escuta, workers, max_conexoes) para os shards atenderem HTTP
     """
-    if valor <= 0:
-        raise ValueError("Valor inválido! Tente novamente com um valor acima de 0.")
+    global roteador
     
-    novo_saldo = saldo + valor
-    transacao = {
-        "tipo": "Depósito",
-        "valor": valor,
-        "data_hora": datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    }
-    extrato.append(transacao)
+    roteador = RoteadorShards(total, diretorio_dados, servidor)
+    atexit.register(roteador.encerrar)
+    return roteador
+
+def servico_transferir_particionado(numero_origem, numero_destino, valor):
+    """Transferência no processo principal: as duas contas precisam estar no mesmo shard"""
+    if roteador is None:
+        return servico_transferir(numero_origem, numero_destino, valor)
+    shard = roteador.shard_da_conta(numero_origem)
+    if roteador.shard_da_conta(numero_destino) != shard:
+        raise OperacaoRecusada("No modo particionado, transferências devem envolver contas de um único shard.")
+    return roteador.chamar(shard, "transferir", numero_origem, numero_destino, valor)
+
+def chamar_servico(nome, *args, conta=None, cpf=None):
+    """Executa o serviço localmente ou no shard dono da conta/CPF informado"""
+    if roteador is None:
+        return SERVICOS[nome](*args)
+    shard = roteador.shard_da_conta(conta) if conta is not None else roteador.shard_do_cliente(cpf)
+    return roteador.chamar(shard, nome, *args)
+
+# Variáveis do environ que acompanham uma requisição encaminhada (além das HTTP_*)
+VARIAVEIS_ENCAMINHADAS = ('REQUEST_METHOD', 'SCRIPT_NAME', 'PATH_INFO', 'QUERY_STRING', 'CONTENT_TYPE',
+                          'SERVER_NAME', 'SERVER_PORT', 'SERVER_PROTOCOL', 'REMOTE_ADDR', 'wsgi.url_scheme')
+# Corpos maiores seguem pelo app local (as rotas encaminhadas recebem JSON pequeno),
+# exceto com Idempotency-Key, que precisa chegar ao dono da chave
+TAMANHO_MAXIMO_ENCAMINHADO = 64 * 1024
+
+class EncaminhadorShards:
+    """
+    Middleware WSGI do modo particionado: cadastro de cliente, depósito, saque,
+    transferência dentro de um shard e extrato paginado vão inteiros para o
+    shard dono, que faz o roteamento Flask, a validação e o JSON; requisições
+    com Idempotency-Key vão para o shard dono da chave, que guarda a resposta
+    para as repetições. Aqui só se lê a chave de roteamento; o resto segue
+    para o app local, que consulta os shards pelos serviços.
+    Args:
+        wsgi_app: aplicação WSGI local (o wsgi_app do Flask)
+    """
     
-    return novo_saldo, extrato
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+    
+    def __call__(self, environ, start_response):
+        if roteador is None or 'meu_banco.encaminhada' in environ:
+            return self.wsgi_app(environ, start_response)
+        destino = self._destino(environ)
+        if destino is None or destino[0] == roteador.local:
+            return self.wsgi_app(environ, start_response)
+        
+        shard, corpo = destino
+        variaveis = {chave: valor for chave, valor in environ.items()
+                     if chave.startswith('HTTP_') or chave in VARIAVEIS_ENCAMINHADAS}
+        status, cabecalhos, corpo = roteador.chamar(shard, "http", variaveis, corpo)
+        start_response(status, cabecalhos)
+        return [corpo]
+    
+    @staticmethod
+    def _destino(environ):
+        """(shard, corpo) da requisição, ou None se ela deve ser atendida aqui"""
+        metodo = environ['REQUEST_METHOD']
+        caminho = environ.get('PATH_INFO', '')
+        chave = environ.get('HTTP_IDEMPOTENCY_KEY') or None
+        if metodo == 'GET':
+            numero = caminho.removeprefix('/extrato/')
+            # Os formatos em streaming são paginados por quem recebeu a requisição
+            if numero != caminho and numero.isdigit() and 'formato' not in parse_qs(environ.get('QUERY_STRING', '')):
+                return roteador.shard_da_conta(numero), b''
+            return None
+        if metodo != 'POST' or (chave is None and caminho not in ('/criar_cliente', '/depositar', '/sacar',
+                                                                  '/transferir')):
+            return None
+        
+        try:
+            tamanho = int(environ['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            return None
+        if chave is None and tamanho > TAMANHO_MAXIMO_ENCAMINHADO:
+            return None
+        corpo = environ['wsgi.input'].read(tamanho)
+        # O app local ainda pode precisar ler o corpo
+        environ['wsgi.input'] = io.BytesIO(corpo)
+        if chave is not None:
+            return roteador.shard_do_cliente(chave), corpo
+        try:
+            dados = decodificar_json(corpo)
+            if caminho == '/criar_cliente':
+                return roteador.shard_do_cliente(dados['cpf']), corpo
+            if caminho == '/transferir':
+                shard = roteador.shard_da_conta(dados['numero_conta_origem'])
+                # Entre shards diferentes, quem recusa é o app local
+                if roteador.shard_da_conta(dados['numero_conta_destino']) != shard:
+                    return None
+                return shard, corpo
+            return roteador.shard_da_conta(dados['numero_conta']), corpo
+        except (ValueError, TypeError, KeyError):
+            # Corpo inválido: o app local responde com a mensagem de validação
+            return None
+
+app.wsgi_app = EncaminhadorShards(app.wsgi_app)
+
+# Importação em massa
+#
+# O arquivo é lido em blocos: cada bloco é validado, tem os CPFs checados de
+# uma vez contra o índice e recebe uma faixa contígua de números de conta. O
+# custo é linear no tamanho do arquivo e a memória fica limitada a um bloco.
+TAMANHO_BLOCO_IMPORTACAO = 10_000
+FORMATOS_IMPORTACAO = ("csv", "ndjson")
+# Uma importação por vez: as seguintes esperam a atual terminar
+lock_importacao = threading.Lock()
 
-def saque(*, saldo, valor, extrato, limite, numero_saques, limite_saques):
+def campo_quantidade_contas(valor):
+    """Quantidade de contas a abrir para o cliente (vazio = 1)"""
+    if valor == '':
+        return 1
+    quantidade = campo_inteiro(valor)
+    if not 0 <= quantidade <= 100:
+        raise ValueError("deve estar entre 0 e 100")
+    return quantidade
+
+validar_linha_importacao = compilar_esquema({
+    "nome": campo_texto,
+    "data_nascimento": campo_texto,
+    "cpf": campo_texto,
+    "logradouro": campo_texto,
+    "numero": campo_texto,
+    "bairro": campo_texto,
+    "cidade_uf": campo_texto,
+    "contas": (campo_quantidade_contas, False),
+})
+
+def importar_cadastros(arquivo, formato="csv", tamanho_bloco=TAMANHO_BLOCO_IMPORTACAO):
     """
-    Função de saque com argumentos keyword-only
+    Importa clientes e abre as suas contas a partir de um arquivo CSV ou NDJSON
     Args:
-        saldo: saldo atual da conta
-        valor: valor a ser sacado
-        extrato: lista de transações
-        limite: limite por saque
-        numero_saques: número de saques já realizados hoje
-        limite_saques: limite de saques diários
-    Returns:
-        tuple: (novo_saldo, extrato_atualizado, numero_saques_atualizado)
+        arquivo: iterável de linhas de texto (arquivo aberto, stream da requisição)
+        formato: 'csv' (com cabeçalho) ou 'ndjson'
+        tamanho_bloco: linhas processadas por vez
+    Yields:
+        dict: {"rejeitada": {...}} para cada linha recusada, {"progresso": {...}}
+        ao fim de cada bloco e {"resumo": {...}} no final
     """
-    if numero_saques >= limite_saques:
-        raise ValueError("Você atingiu o limite de saques diário (3). Tente novamente em 24 horas!")
+    if formato not in FORMATOS_IMPORTACAO:
+        raise ValueError(f"Formato inválido: {formato}. Use csv ou ndjson.")
+    linhas = csv.DictReader(arquivo) if formato == 'csv' else (linha for linha in arquivo if linha.strip())
     
-    if valor > limite:
-        raise ValueError(f"O valor limite por saque é de R$ {limite:.2f}. Solicite um valor menor!")
+    contagem = {"linhas": 0, "clientes": 0, "contas": 0, "rejeitadas": 0}
+    with lock_importacao:
+        inicio = time.perf_counter()
+        yield from _importar_blocos(linhas, tamanho_bloco, contagem, inicio)
     
-    if valor > saldo:
-        raise ValueError(f"Saldo insuficiente! Seu saldo atual é de R$ {saldo:.2f}")
+    yield {"resumo": dict(contagem, segundos=round(time.perf_counter() - inicio, 3))}
+
+def _importar_blocos(linhas, tamanho_bloco, contagem, inicio):
+    importar_clientes = servico_importar_clientes if roteador is None else roteador.importar_clientes
+    importar_contas = servico_importar_contas if roteador is None else roteador.importar_contas
     
-    if valor <= 0:
-        raise ValueError("Valor inválido! Digite um valor acima de 0.")
+    while bloco := list(islice(linhas, tamanho_bloco)):
+        validos = []
+        numeros_linha = []
+        for item in bloco:
+            contagem["linhas"] += 1
+            try:
+                if isinstance(item, str):
+                    try:
+                        item = decodificar_json(item)
+                    except ValueError:
+                        raise DadosInvalidos("Linha não é um JSON válido.")
+                validos.append(validar_linha_importacao(item))
+                numeros_linha.append(contagem["linhas"])
+            except ValueError as e:
+                contagem["rejeitadas"] += 1
+                yield {"rejeitada": {"linha": contagem["linhas"], "motivo": str(e)}}
+        
+        recusados = set(importar_clientes(validos))
+        for posicao in sorted(recusados):
+            contagem["rejeitadas"] += 1
+            yield {"rejeitada": {"linha": numeros_linha[posicao], "motivo": "CPF já cadastrado no sistema!"}}
+        aceitos = [registro for posicao, registro in enumerate(validos) if posicao not in recusados]
+        
+        pares = []
+        numero_conta = alocar_faixa_contas(sum(registro.get('contas', 1) for registro in aceitos))
+        for registro in aceitos:
+            for _ in range(registro.get('contas', 1)):
+                pares.append((registro['cpf'], numero_conta))
+                numero_conta += 1
+        importar_contas(pares)
+        
+        contagem["clientes"] += len(aceitos)
+        contagem["contas"] += len(pares)
+        yield {"progresso": dict(contagem, segundos=round(time.perf_counter() - inicio, 3))}
+
+def importar_arquivo(caminho):
+    """Importação pela linha de comando: progresso no terminal e recusas em <arquivo>.rejeitadas.ndjson"""
+    formato = 'ndjson' if caminho.endswith(('.ndjson', '.jsonl')) else 'csv'
+    caminho_rejeitadas = caminho + '.rejeitadas.ndjson'
+    with open(caminho, encoding='utf-8', newline='') as arquivo, \
+            open(caminho_rejeitadas, 'w', encoding='utf-8') as rejeitadas:
+        for evento in importar_cadastros(arquivo, formato):
+            if "rejeitada" in evento:
+                rejeitadas.write(codificar_json(evento["rejeitada"]).decode('utf-8') + "\n")
+                continue
+            if "progresso" in evento:
+                contagem = evento["progresso"]
+                print(f"📥 {contagem['linhas']} linhas: {contagem['clientes']} clientes, {contagem['contas']} contas, "
+                      f"{contagem['rejeitadas']} rejeitadas ({contagem['segundos']}s)")
+            else:
+                contagem = evento["resumo"]
+                print(f"✅ Importação concluída em {contagem['segundos']}s")
+    if contagem["rejeitadas"]:
+        print(f"⚠️ Linhas rejeitadas em: {caminho_rejeitadas}")
+    else:
+        os.remove(caminho_rejeitadas)
+    return contagem
+
+# Interface HTML integrada no código Python
+CSS_INTERFACE = """
+body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+.container { max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+h1 { color: #2c3e50; text-align: center; }
+.menu { display: flex; justify-content: center; gap: 10px; margin-bottom: 30px; }
+.menu button { padding: 10px 20px; background-color: #3498db; color: white; border: none; border-radius: 5px; cursor: pointer; }
+.menu button:hover { background-color: #2980b9; }
+.menu button.active { background-color: #27ae60; }
+.section { display: none; padding: 20px; background-color: #f8f9fa; border-radius: 8px; margin-bottom: 20px; }
+.section.active { display: block; }
+.form-group { margin-bottom: 15px; }
+label { display: block; margin-bottom: 5px; font-weight: bold; color: #34495e; }
+input { width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px; box-sizing: border-box; }
+button { background-color: #27ae60; color: white; padding: 10px 20px; border: none; border-radius: 5px; cursor: pointer; }
+button:hover { background-color: #229954; }
+.alert { padding: 10px; margin: 10px 0; border-radius: 5px; }
+.alert-success { background-color: #d4edda; color: #155724; border: 1px solid #c3e6cb; }
+.alert-error { background-color: #f8d7da; color: #721c24; border: 1px solid #f5c6cb; }
+.two-columns { display: grid; grid-template-columns: 1fr 1fr; gap: 15px; }
+.result { background: white; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #3498db; }
+"""
+
+JS_INTERFACE = """
+function showAlert(message, type = 'success') {
+    const alertsDiv = document.getElementById('alerts');
+    const alertClass = type === 'success' ? 'alert-success' : 'alert-error';
+    alertsDiv.innerHTML = `<div class="alert ${alertClass}">${message}</div>`;
+    setTimeout(() => alertsDiv.innerHTML = '', 5000);
+}
+
+function showSection(sectionName) {
+    document.querySelectorAll('.section').forEach(section => section.classList.remove('active'));
+    document.getElementById(sectionName).classList.add('active');
+    document.querySelectorAll('.menu button').forEach(btn => btn.classList.remove('active'));
+    event.target.classList.add('active');
+}
+
+async function criarCliente(event) {
+    event.preventDefault();
+    const formData = {
+        nome: document.getElementById('nome').value,
+        data_nascimento: document.getElementById('data_nascimento').value,
+        cpf: document.getElementById('cpf').value,
+        logradouro: document.getElementById('logradouro').value,
+        numero: document.getElementById('numero').value,
+        bairro: document.getElementById('bairro').value,
+        cidade_uf: document.getElementById('cidade_uf').value
+    };
     
-    novo_saldo = saldo - valor
-    transacao = {
-        "tipo": "Saque",
-        "valor": valor,
-        "data_hora": datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    try {
+        const response = await fetch('/criar_cliente', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(formData)
+        });
+        const result = await response.json();
+        showAlert(result.sucesso ? '✅ ' + result.mensagem : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
+        if (result.sucesso) event.target.reset();
+    } catch (error) {
+        showAlert('❌ Erro: ' + error.message, 'error');
     }
-    extrato.append(transacao)
+}
+
+async function criarConta(event) {
+    event.preventDefault();
+    const cpf = document.getElementById('cpf_conta').value;
     
-    return novo_saldo, extrato, numero_saques + 1
+    try {
+        const response = await fetch('/criar_conta', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ cpf: cpf })
+        });
+        const result = await response.json();
+        showAlert(result.sucesso ? '✅ ' + result.mensagem : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
+        if (result.sucesso) event.target.reset();
+    } catch (error) {
+        showAlert('❌ Erro: ' + error.message, 'error');
+    }
+}
 
-def exibir_extrato(saldo, /, *, extrato):
-    """
-    Função de extrato com argumentos mistos
-    Args:
-        saldo: saldo atual (posicional)
-        extrato: lista de transações (nomeado)
-    Returns:
-        dict: informações do extrato formatadas
-    """
-    total_depositos = sum(t['valor'] for t in extrato if t['tipo'] == 'Depósito')
-    total_saques = sum(t['valor'] for t in extrato if t['tipo'] == 'Saque')
-    numero_depositos = len([t for t in extrato if t['tipo'] == 'Depósito'])
-    numero_saques = len([t for t in extrato if t['tipo'] == 'Saque'])
+async function listarContas() {
+    try {
+        const response = await fetch('/listar_contas');
+        const contas = await response.json();
+        const lista = document.getElementById('listaContas');
+        
+        if (contas.length > 0) {
+            let html = '<h3>Contas Cadastradas:</h3>';
+            contas.forEach(conta => {
+                html += `<div class="result">
+                    <strong>Conta: ${conta.agencia}-${conta.numero_conta}</strong><br>
+                    Titular: ${conta.titular}<br>
+                    CPF: ${conta.cpf}<br>
+                    Saldo: R$ ${conta.saldo.toFixed(2)}
+                </div>`;
+            });
+            lista.innerHTML = html;
+        } else {
+            lista.innerHTML = '<p>Nenhuma conta cadastrada.</p>';
+        }
+    } catch (error) {
+        showAlert('❌ Erro: ' + error.message, 'error');
+    }
+}
+
+async function realizarDeposito(event) {
+    event.preventDefault();
+    const formData = {
+        numero_conta: document.getElementById('conta_deposito').value,
+        valor: document.getElementById('valor_deposito').value
+    };
     
-    return {
-        "saldo": saldo,
-        "transacoes": extrato,
-        "total_depositos": total_depositos,
-        "total_saques": total_saques,
-        "numero_depositos": numero_depositos,
-        "numero_saques": numero_saques
+    try {
+        const response = await fetch('/depositar', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(formData)
+        });
+        const result = await response.json();
+        showAlert(result.sucesso ? `✅ ${result.mensagem} Saldo: R$ ${result.saldo.toFixed(2)}` : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
+        if (result.sucesso) event.target.reset();
+    } catch (error) {
+        showAlert('❌ Erro: ' + error.message, 'error');
     }
+}
+
+async function realizarSaque(event) {
+    event.preventDefault();
+    const formData = {
+        numero_conta: document.getElementById('conta_saque').value,
+        valor: document.getElementById('valor_saque').value
+    };
+    
+    try {
+        const response = await fetch('/sacar', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(formData)
+        });
+        const result = await response.json();
+        showAlert(result.sucesso ? `✅ ${result.mensagem} Saldo: R$ ${result.saldo.toFixed(2)}` : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
+        if (result.sucesso) event.target.reset();
+    } catch (error) {
+        showAlert('❌ Erro: ' + error.message, 'error');
+    }
+}
+
+async function realizarTransferencia(event) {
+    event.preventDefault();
+    const formData = {
+        numero_conta_origem: document.getElementById('conta_origem').value,
+        numero_conta_destino: document.getElementById('conta_destino').value,
+        valor: document.getElementById('valor_transferencia').value
+    };
+    
+    try {
+        const response = await fetch('/transferir', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(formData)
+        });
+        const result = await response.json();
+        showAlert(result.sucesso ? `✅ ${result.mensagem} Saldo: R$ ${result.saldo.toFixed(2)}` : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
+        if (result.sucesso) event.target.reset();
+    } catch (error) {
+        showAlert('❌ Erro: ' + error.message, 'error');
+    }
+}
+
+async function consultarExtrato() {
+    const numeroConta = document.getElementById('conta_extrato').value;
+    if (!numeroConta) {
+        showAlert('❌ Digite o número da conta', 'error');
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/extrato/${numeroConta}`);
+        const result = await response.json();
+        
+        if (result.sucesso) {
+            let html = `<h3>📋 Extrato da Conta ${result.agencia}-${result.numero_conta}</h3>
+                <div class="result">
+                    <strong>Saldo Atual: R$ ${result.saldo.toFixed(2)}</strong><br>
+                    Total Depósitos: R$ ${result.total_depositos.toFixed(2)} (${result.numero_depositos})<br>
+                    Total Saques: R$ ${result.total_saques.toFixed(2)} (${result.numero_saques})<br>
+                    Transferências: R$ ${result.total_transferencias_enviadas.toFixed(2)} enviadas, R$ ${result.total_transferencias_recebidas.toFixed(2)} recebidas
+                </div>
+                <h4>Transações:</h4>`;
+            
+            if (result.transacoes && result.transacoes.length > 0) {
+                result.transacoes.forEach(transacao => {
+                    const entrada = transacao.tipo === 'Depósito' || transacao.tipo === 'Transferência recebida';
+                    const emoji = entrada ? '📈' : '📉';
+                    const contraparte = transacao.conta_contraparte ? ` (conta ${transacao.conta_contraparte})` : '';
+                    html += `<div class="result">
+                        <strong>${emoji} ${transacao.tipo}${contraparte}</strong> - R$ ${transacao.valor.toFixed(2)}<br>
+                        <small>${transacao.data_hora}</small>
+                    </div>`;
+                });
+            } else {
+                html += '<p>Nenhuma transação encontrada.</p>';
+            }
+            
+            document.getElementById('extratoResults').innerHTML = html;
+        } else {
+            showAlert('❌ ' + result.mensagem, 'error');
+        }
+    } catch (error) {
+        showAlert('❌ Erro: ' + error.message, 'error');
+    }
+}
+"""
 
-# Interface HTML integrada no código Python
 HTML_INTERFACE = """
 <!DOCTYPE html>
 <html lang="pt-BR">
@@ -163,27 +3241,7 @@ HTML_INTERFACE = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Sistema Bancário - Arquivo Único</title>
-    <style>
-        body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
-        .container { max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-        h1 { color: #2c3e50; text-align: center; }
-        .menu { display: flex; justify-content: center; gap: 10px; margin-bottom: 30px; }
-        .menu button { padding: 10px 20px; background-color: #3498db; color: white; border: none; border-radius: 5px; cursor: pointer; }
-        .menu button:hover { background-color: #2980b9; }
-        .menu button.active { background-color: #27ae60; }
-        .section { display: none; padding: 20px; background-color: #f8f9fa; border-radius: 8px; margin-bottom: 20px; }
-        .section.active { display: block; }
-        .form-group { margin-bottom: 15px; }
-        label { display: block; margin-bottom: 5px; font-weight: bold; color: #34495e; }
-        input { width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px; box-sizing: border-box; }
-        button { background-color: #27ae60; color: white; padding: 10px 20px; border: none; border-radius: 5px; cursor: pointer; }
-        button:hover { background-color: #229954; }
-        .alert { padding: 10px; margin: 10px 0; border-radius: 5px; }
-        .alert-success { background-color: #d4edda; color: #155724; border: 1px solid #c3e6cb; }
-        .alert-error { background-color: #f8d7da; color: #721c24; border: 1px solid #f5c6cb; }
-        .two-columns { display: grid; grid-template-columns: 1fr 1fr; gap: 15px; }
-        .result { background: white; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #3498db; }
-    </style>
+    <link rel="stylesheet" href="/static/{css}">
 </head>
 <body>
     <div class="container">
@@ -194,11 +3252,12 @@ HTML_INTERFACE = """
             <button onclick="showSection('conta')">Conta</button>
             <button onclick="showSection('deposito')">Depósito</button>
             <button onclick="showSection('saque')">Saque</button>
+            <button onclick="showSection('transferencia')">Transferência</button>
             <button onclick="showSection('extrato')">Extrato</button>
         </div>
-
+        
         <div id="alerts"></div>
-
+        
         <!-- Seção Cliente -->
         <div id="cliente" class="section active">
             <h2>📋 Cadastrar Cliente</h2>
@@ -240,7 +3299,7 @@ HTML_INTERFACE = """
                 <button type="submit">💾 Cadastrar</button>
             </form>
         </div>
-
+        
         <!-- Seção Conta -->
         <div id="conta" class="section">
             <h2>💳 Criar Conta</h2>
@@ -254,7 +3313,7 @@ HTML_INTERFACE = """
             <button onclick="listarContas()" style="margin-top: 10px; background-color: #3498db;">📋 Listar Contas</button>
             <div id="listaContas"></div>
         </div>
-
+        
         <!-- Seção Depósito -->
         <div id="deposito" class="section">
             <h2>📈 Depósito</h2>
@@ -270,7 +3329,7 @@ HTML_INTERFACE = """
                 <button type="submit">💸 Depositar</button>
             </form>
         </div>
-
+        
         <!-- Seção Saque -->
         <div id="saque" class="section">
             <h2>📉 Saque</h2>
@@ -287,7 +3346,29 @@ HTML_INTERFACE = """
                 <button type="submit" style="background-color: #e74c3c;">💵 Sacar</button>
             </form>
         </div>
-
+        
+        <!-- Seção Transferência -->
+        <div id="transferencia" class="section">
+            <h2>🔁 Transferência</h2>
+            <form onsubmit="realizarTransferencia(event)">
+                <div class="two-columns">
+                    <div class="form-group">
+                        <label>Conta de Origem:</label>
+                        <input type="number" id="conta_origem" required>
+                    </div>
+                    <div class="form-group">
+                        <label>Conta de Destino:</label>
+                        <input type="number" id="conta_destino" required>
+                    </div>
+                </div>
+                <div class="form-group">
+                    <label>Valor (R$):</label>
+                    <input type="number" id="valor_transferencia" step="0.01" min="0.01" required>
+                </div>
+                <button type="submit">🔁 Transferir</button>
+            </form>
+        </div>
+        
         <!-- Seção Extrato -->
         <div id="extrato" class="section">
             <h2>📊 Extrato</h2>
@@ -299,292 +3380,881 @@ HTML_INTERFACE = """
             <div id="extratoResults"></div>
         </div>
     </div>
+    
+    <script src="/static/{js}"></script>
+</body>
+</html>
+"""
 
-    <script>
-        function showAlert(message, type = 'success') {
-            const alertsDiv = document.getElementById('alerts');
-            const alertClass = type === 'success' ? 'alert-success' : 'alert-error';
-            alertsDiv.innerHTML = `<div class="alert ${alertClass}">${message}</div>`;
-            setTimeout(() => alertsDiv.innerHTML = '', 5000);
-        }
+# Conteúdo estático pré-processado
+#
+# Página, CSS e JS são comprimidos uma única vez na inicialização (gzip e, se
+# o pacote brotli estiver instalado, br) e servidos com ETag forte. O CSS e o
+# JS têm o hash do conteúdo no nome e podem ficar em cache indefinidamente; a
+# página é revalidada a cada acesso e responde 304 quando nada mudou.
+CACHE_PAGINA = "no-cache"
+CACHE_ASSET = "public, max-age=31536000, immutable"
 
-        function showSection(sectionName) {
-            document.querySelectorAll('.section').forEach(section => section.classList.remove('active'));
-            document.getElementById(sectionName).classList.add('active');
-            document.querySelectorAll('.menu button').forEach(btn => btn.classList.remove('active'));
-            event.target.classList.add('active');
-        }
+class RecursoEstatico:
+    """Conteúdo estático com as variantes comprimidas já calculadas"""
+    
+    def __init__(self, conteudo, tipo, cache_control):
+        corpo = conteudo.encode('utf-8')
+        self.tipo = tipo
+        self.cache_control = cache_control
+        self.hash = hashlib.sha256(corpo).hexdigest()[:16]
+        self.variantes = {}
+        if brotli is not None:
+            self.variantes['br'] = brotli.compress(corpo, quality=11)
+        self.variantes['gzip'] = gzip.compress(corpo, compresslevel=9, mtime=0)
+        self.variantes['identity'] = corpo
+    
+    def responder(self):
+        codificacao = request.accept_encodings.best_match(list(self.variantes), default='identity')
+        etag = f"{self.hash}-{codificacao}"
+        
+        # If-None-Match usa comparação fraca: W/"etag" (proxies que recomprimem) também vale
+        if request.if_none_match.contains_weak(etag):
+            resposta = Response(status=304)
+        else:
+            resposta = Response(self.variantes[codificacao], mimetype=self.tipo)
+            if codificacao != 'identity':
+                resposta.headers['Content-Encoding'] = codificacao
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = self.cache_control
+        resposta.headers['Vary'] = 'Accept-Encoding'
+        return resposta
 
-        async function criarCliente(event) {
-            event.preventDefault();
-            const formData = {
-                nome: document.getElementById('nome').value,
-                data_nascimento: document.getElementById('data_nascimento').value,
-                cpf: document.getElementById('cpf').value,
-                logradouro: document.getElementById('logradouro').value,
-                numero: document.getElementById('numero').value,
-                bairro: document.getElementById('bairro').value,
-                cidade_uf: document.getElementById('cidade_uf').value
-            };
-            
-            try {
-                const response = await fetch('/criar_cliente', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify(formData)
-                });
-                const result = await response.json();
-                showAlert(result.sucesso ? '✅ ' + result.mensagem : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
-                if (result.sucesso) event.target.reset();
-            } catch (error) {
-                showAlert('❌ Erro: ' + error.message, 'error');
-            }
-        }
+def _preparar_estaticos():
+    css = RecursoEstatico(CSS_INTERFACE, 'text/css', CACHE_ASSET)
+    js = RecursoEstatico(JS_INTERFACE, 'application/javascript', CACHE_ASSET)
+    assets = {f"app.{css.hash}.css": css, f"app.{js.hash}.js": js}
+    
+    html = HTML_INTERFACE.replace('{css}', f"app.{css.hash}.css").replace('{js}', f"app.{js.hash}.js")
+    return RecursoEstatico(html, 'text/html', CACHE_PAGINA), assets
 
-        async function criarConta(event) {
-            event.preventDefault();
-            const cpf = document.getElementById('cpf_conta').value;
-            
-            try {
-                const response = await fetch('/criar_conta', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({ cpf: cpf })
-                });
-                const result = await response.json();
-                showAlert(result.sucesso ? '✅ ' + result.mensagem : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
-                if (result.sucesso) event.target.reset();
-            } catch (error) {
-                showAlert('❌ Erro: ' + error.message, 'error');
-            }
-        }
+PAGINA_INICIAL, ASSETS_ESTATICOS = _preparar_estaticos()
 
-        async function listarContas() {
-            try {
-                const response = await fetch('/listar_contas');
-                const contas = await response.json();
-                const lista = document.getElementById('listaContas');
-                
-                if (contas.length > 0) {
-                    let html = '<h3>Contas Cadastradas:</h3>';
-                    contas.forEach(conta => {
-                        html += `<div class="result">
-                            <strong>Conta: ${conta.agencia}-${conta.numero_conta}</strong><br>
-                            Titular: ${conta.titular}<br>
-                            CPF: ${conta.cpf}<br>
-                            Saldo: R$ ${conta.saldo.toFixed(2)}
-                        </div>`;
-                    });
-                    lista.innerHTML = html;
-                } else {
-                    lista.innerHTML = '<p>Nenhuma conta cadastrada.</p>';
-                }
-            } catch (error) {
-                showAlert('❌ Erro: ' + error.message, 'error');
-            }
-        }
+def medir_rota(funcao):
+    """Registra a latência e a quantidade de requisições da rota"""
+    rota = funcao.__name__.removeprefix('api_')
+    rotulos = (("rota", rota),)
+    
+    executar = funcao
+    if PERFIL_LENTO_MS is not None:
+        def executar(*args, **kwargs):
+            return executar_com_cprofile(rota, funcao, args, kwargs)
+    
+    @wraps(funcao)
+    def rota_medida(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return executar(*args, **kwargs)
+        finally:
+            metricas.observar("meu_banco_latencia_segundos", rotulos, time.perf_counter() - inicio)
+    return rota_medida
 
-        async function realizarDeposito(event) {
-            event.preventDefault();
-            const formData = {
-                numero_conta: document.getElementById('conta_deposito').value,
-                valor: document.getElementById('valor_deposito').value
-            };
-            
-            try {
-                const response = await fetch('/depositar', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify(formData)
-                });
-                const result = await response.json();
-                showAlert(result.sucesso ? `✅ ${result.mensagem} Saldo: R$ ${result.saldo.toFixed(2)}` : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
-                if (result.sucesso) event.target.reset();
-            } catch (error) {
-                showAlert('❌ Erro: ' + error.message, 'error');
-            }
-        }
+def exigir_admin(funcao):
+    """Restringe a rota ao token MEU_BANCO_TOKEN_ADMIN ou, sem token, a conexões locais"""
+    @wraps(funcao)
+    def rota_admin(*args, **kwargs):
+        token = os.environ.get('MEU_BANCO_TOKEN_ADMIN')
+        if token:
+            autorizado = hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+        else:
+            autorizado = request.remote_addr in ('127.0.0.1', '::1')
+        if not autorizado:
+            return jsonify({"sucesso": False, "mensagem": "Acesso negado."}), 403
+        return funcao(*args, **kwargs)
+    return rota_admin
 
-        async function realizarSaque(event) {
-            event.preventDefault();
-            const formData = {
-                numero_conta: document.getElementById('conta_saque').value,
-                valor: document.getElementById('valor_saque').value
-            };
-            
-            try {
-                const response = await fetch('/sacar', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify(formData)
-                });
-                const result = await response.json();
-                showAlert(result.sucesso ? `✅ ${result.mensagem} Saldo: R$ ${result.saldo.toFixed(2)}` : '❌ ' + result.mensagem, result.sucesso ? 'success' : 'error');
-                if (result.sucesso) event.target.reset();
-            } catch (error) {
-                showAlert('❌ Erro: ' + error.message, 'error');
-            }
-        }
+def resposta_erro(erro):
+    """Resposta padrão de falha, contabilizando o motivo"""
+    rota = (request.endpoint or "").removeprefix('api_')
+    metricas.contar("meu_banco_erros_total", (("rota", rota), ("motivo", motivo_do_erro(erro))))
+    return jsonify({"sucesso": False, "mensagem": str(erro)})
 
-        async function consultarExtrato() {
-            const numeroConta = document.getElementById('conta_extrato').value;
-            if (!numeroConta) {
-                showAlert('❌ Digite o número da conta', 'error');
-                return;
-            }
-            
-            try {
-                const response = await fetch(`/extrato/${numeroConta}`);
-                const result = await response.json();
+# Idempotência
+#
+# Clientes que repetem uma requisição (timeout, reconexão) enviam o mesmo
+# cabeçalho Idempotency-Key; a primeira resposta fica guardada e as repetições
+# a recebem de volta sem executar a operação de novo. O cache é dividido em
+# partições com lock próprio, cada uma com LRU, TTL e teto de memória.
+TAMANHO_MAXIMO_CHAVE = 255
+
+class CacheIdempotencia:
+    """Cache LRU/TTL de respostas por Idempotency-Key, particionado por hash da chave"""
+    
+    def __init__(self, particoes=16, limite_bytes=64 * 1024 * 1024, ttl=24 * 3600):
+        self.ttl = ttl
+        self.limite_por_particao = limite_bytes // particoes
+        self._particoes = [
+            {"lock": threading.Lock(), "entradas": OrderedDict(), "pendentes": {}, "bytes": 0}
+            for _ in range(particoes)
+        ]
+    
+    def _particao(self, chave):
+        return self._particoes[hash(chave) % len(self._particoes)]
+    
+    def reservar(self, chave, impressao):
+        """
+        Consulta a chave e, se ela for nova, a reserva para quem chamou
+        Returns:
+            (corpo, status) da resposta guardada, ou None se quem chamou deve
+            executar a operação e depois chamar guardar() ou liberar()
+        """
+        particao = self._particao(chave)
+        while True:
+            with particao["lock"]:
+                entrada = particao["entradas"].get(chave)
+                if entrada is not None and entrada[0] <= time.monotonic():
+                    self._remover(particao, chave, "ttl")
+                    entrada = None
+                if entrada is not None:
+                    if entrada[1] != impressao:
+                        metricas.contar("meu_banco_idempotencia_total", (("resultado", "conflito"),))
+                        raise DadosInvalidos("Idempotency-Key já usada com outra requisição.")
+                    particao["entradas"].move_to_end(chave)
+                    metricas.contar("meu_banco_idempotencia_total", (("resultado", "acerto"),))
+                    return entrada[2], entrada[3]
                 
-                if (result.sucesso) {
-                    let html = `<h3>📋 Extrato da Conta ${result.agencia}-${result.numero_conta}</h3>
-                        <div class="result">
-                            <strong>Saldo Atual: R$ ${result.saldo.toFixed(2)}</strong><br>
-                            Total Depósitos: R$ ${result.total_depositos.toFixed(2)} (${result.numero_depositos})<br>
-                            Total Saques: R$ ${result.total_saques.toFixed(2)} (${result.numero_saques})
-                        </div>
-                        <h4>Transações:</h4>`;
-                    
-                    if (result.transacoes && result.transacoes.length > 0) {
-                        result.transacoes.forEach(transacao => {
-                            const emoji = transacao.tipo === 'Depósito' ? '📈' : '📉';
-                            html += `<div class="result">
-                                <strong>${emoji} ${transacao.tipo}</strong> - R$ ${transacao.valor.toFixed(2)}<br>
-                                <small>${transacao.data_hora}</small>
-                            </div>`;
-                        });
-                    } else {
-                        html += '<p>Nenhuma transação encontrada.</p>';
-                    }
-                    
-                    document.getElementById('extratoResults').innerHTML = html;
-                } else {
-                    showAlert('❌ ' + result.mensagem, 'error');
-                }
-            } catch (error) {
-                showAlert('❌ Erro: ' + error.message, 'error');
-            }
+                evento = particao["pendentes"].get(chave)
+                if evento is None:
+                    particao["pendentes"][chave] = threading.Event()
+                    metricas.contar("meu_banco_idempotencia_total", (("resultado", "falta"),))
+                    return None
+            # A mesma chave está em execução em outra thread: espera o resultado
+            if not evento.wait(30):
+                raise OperacaoRecusada("Requisição com esta Idempotency-Key ainda em processamento.")
+    
+    def guardar(self, chave, impressao, corpo, status):
+        """Guarda a resposta da chave reservada e acorda quem estiver esperando"""
+        tamanho = len(chave) + len(corpo) + len(impressao) + 200
+        particao = self._particao(chave)
+        with particao["lock"]:
+            if tamanho <= self.limite_por_particao:
+                entradas = particao["entradas"]
+                entradas[chave] = (time.monotonic() + self.ttl, impressao, corpo, status, tamanho)
+                particao["bytes"] += tamanho
+                while particao["bytes"] > self.limite_por_particao:
+                    mais_antiga, entrada = next(iter(entradas.items()))
+                    motivo = "ttl" if entrada[0] <= time.monotonic() else "lru"
+                    self._remover(particao, mais_antiga, motivo)
+            particao["pendentes"].pop(chave).set()
+    
+    def liberar(self, chave):
+        """Desfaz a reserva sem guardar resposta (a operação pode ser repetida)"""
+        particao = self._particao(chave)
+        with particao["lock"]:
+            particao["pendentes"].pop(chave).set()
+    
+    @staticmethod
+    def _remover(particao, chave, motivo):
+        entrada = particao["entradas"].pop(chave)
+        particao["bytes"] -= entrada[4]
+        metricas.contar("meu_banco_idempotencia_remocoes_total", (("motivo", motivo),))
+    
+    def estatisticas(self):
+        """Ocupação atual do cache (as contagens de acertos e remoções estão nas métricas)"""
+        entradas = bytes_usados = 0
+        for particao in self._particoes:
+            with particao["lock"]:
+                entradas += len(particao["entradas"])
+                bytes_usados += particao["bytes"]
+        return {
+            "entradas": entradas,
+            "bytes": bytes_usados,
+            "limite_bytes": self.limite_por_particao * len(self._particoes)
         }
-    </script>
-</body>
-</html>
-"""
+
+cache_idempotencia = CacheIdempotencia(
+    limite_bytes=int(os.environ.get('MEU_BANCO_IDEMPOTENCIA_MB', 64)) * 1024 * 1024,
+    ttl=int(os.environ.get('MEU_BANCO_IDEMPOTENCIA_TTL', 24 * 3600))
+)
+
+def idempotente(funcao):
+    """Devolve a resposta guardada quando a requisição repete uma Idempotency-Key"""
+    @wraps(funcao)
+    def rota_idempotente(*args, **kwargs):
+        chave = request.headers.get('Idempotency-Key')
+        if not chave:
+            return funcao(*args, **kwargs)
+        try:
+            if len(chave) > TAMANHO_MAXIMO_CHAVE:
+                raise DadosInvalidos(f"Idempotency-Key deve ter no máximo {TAMANHO_MAXIMO_CHAVE} caracteres.")
+            impressao = hashlib.blake2b(request.path.encode() + b"\0" + request.get_data(),
+                                        digest_size=16).digest()
+            guardada = cache_idempotencia.reservar(chave, impressao)
+        except Exception as e:
+            return resposta_erro(e)
+        
+        if guardada is not None:
+            corpo, status = guardada
+            resposta = Response(corpo, status=status, mimetype='application/json')
+            resposta.headers['Idempotent-Replayed'] = 'true'
+            return resposta
+        
+        try:
+            resposta = app.make_response(funcao(*args, **kwargs))
+        except BaseException:
+            cache_idempotencia.liberar(chave)
+            raise
+        if resposta.status_code >= 500:
+            cache_idempotencia.liberar(chave)
+        else:
+            cache_idempotencia.guardar(chave, impressao, resposta.get_data(), resposta.status_code)
+        return resposta
+    return rota_idempotente
+
+# Esquemas dos payloads das rotas
+validar_criar_cliente = compilar_esquema({
+    "nome": campo_texto,
+    "data_nascimento": campo_texto,
+    "cpf": campo_texto,
+    "logradouro": campo_texto,
+    "numero": campo_texto,
+    "bairro": campo_texto,
+    "cidade_uf": campo_texto,
+})
+validar_criar_conta = compilar_esquema({"cpf": campo_texto})
+validar_movimentacao = compilar_esquema({"numero_conta": campo_inteiro, "valor": para_centavos})
+validar_transferencia = compilar_esquema({
+    "numero_conta_origem": campo_inteiro,
+    "numero_conta_destino": campo_inteiro,
+    "valor": para_centavos,
+})
+validar_parametros_resumo = compilar_esquema({
+    "top": (campo_inteiro_ate(MAXIMO_RANKING), False),
+    "dias": (campo_inteiro_ate(DIAS_RESUMO), False),
+})
+validar_lote = compilar_esquema({
+    "operacoes": campo_lista,
+    "atomicidade": (campo_escolha(*ATOMICIDADES_LOTE), False),
+})
 
 # Rotas Flask
 @app.route('/')
 def index():
-    return HTML_INTERFACE
+    return PAGINA_INICIAL.responder()
+
+@app.route('/static/<nome>')
+def static_asset(nome):
+    recurso = ASSETS_ESTATICOS.get(nome)
+    if recurso is None:
+        return Response("Recurso não encontrado", status=404)
+    return recurso.responder()
 
 @app.route('/criar_cliente', methods=['POST'])
+@medir_rota
 def api_criar_cliente():
     try:
-        data = request.get_json()
-        resultado = criar_cliente(
+        data = validar_criar_cliente(request.get_json(silent=True))
+        resultado = chamar_servico(
+            'criar_cliente',
             data['nome'], data['data_nascimento'], data['cpf'],
-            data['logradouro'], data['numero'], data['bairro'], data['cidade_uf']
+            data['logradouro'], data['numero'], data['bairro'], data['cidade_uf'],
+            cpf=data['cpf']
         )
         return jsonify(resultado)
     except Exception as e:
-        return jsonify({"sucesso": False, "mensagem": str(e)})
+        return resposta_erro(e)
 
 @app.route('/criar_conta', methods=['POST'])
+@medir_rota
 def api_criar_conta():
     try:
-        data = request.get_json()
-        resultado = criar_conta_bancaria(data['cpf'])
+        data = validar_criar_conta(request.get_json(silent=True))
+        if roteador is None:
+            resultado = criar_conta_bancaria(data['cpf'])
+        else:
+            resultado = roteador.criar_conta(data['cpf'])
         return jsonify(resultado)
     except Exception as e:
-        return jsonify({"sucesso": False, "mensagem": str(e)})
+        return resposta_erro(e)
 
 @app.route('/listar_contas')
+@medir_rota
 def api_listar_contas():
     try:
-        contas_info = []
-        for conta in contas:
-            cliente = buscar_cliente_por_cpf(conta['cpf_titular'])
-            contas_info.append({
-                "agencia": conta['agencia'],
-                "numero_conta": conta['numero_conta'],
-                "titular": cliente['nome'] if cliente else "Cliente não encontrado",
-                "cpf": conta['cpf_titular'],
-                "saldo": conta['saldo']
-            })
-        return jsonify(contas_info)
+        contas_info = iterar_contas_info() if roteador is None else roteador.listar_contas()
+        
+        formato = request.args.get('formato')
+        if formato:
+            return resposta_streaming(contas_info, formato, CAMPOS_LISTAGEM_CONTAS)
+        
+        return jsonify(list(contas_info))
     except Exception as e:
-        return jsonify({"sucesso": False, "mensagem": str(e)})
+        return resposta_erro(e)
 
 @app.route('/depositar', methods=['POST'])
+@medir_rota
+@idempotente
 def api_depositar():
     try:
-        data = request.get_json()
-        conta = buscar_conta(data['numero_conta'])
-        
-        if not conta:
-            return jsonify({"sucesso": False, "mensagem": "Conta não encontrada!"})
-        
-        valor = float(data['valor'])
-        novo_saldo, extrato_atualizado = deposito(conta['saldo'], valor, conta['extrato'])
-        
-        conta['saldo'] = novo_saldo
-        conta['extrato'] = extrato_atualizado
-        
-        return jsonify({
-            "sucesso": True,
-            "mensagem": f"Depósito de R$ {valor:.2f} realizado com sucesso!",
-            "saldo": novo_saldo
-        })
+        data = validar_movimentacao(request.get_json(silent=True))
+        numero_conta, valor = data['numero_conta'], data['valor']
+        return jsonify(chamar_servico('depositar', numero_conta, valor, conta=numero_conta))
     except Exception as e:
-        return jsonify({"sucesso": False, "mensagem": str(e)})
+        return resposta_erro(e)
 
 @app.route('/sacar', methods=['POST'])
+@medir_rota
+@idempotente
 def api_sacar():
     try:
-        data = request.get_json()
-        conta = buscar_conta(data['numero_conta'])
-        
-        if not conta:
-            return jsonify({"sucesso": False, "mensagem": "Conta não encontrada!"})
-        
-        valor = float(data['valor'])
-        novo_saldo, extrato_atualizado, numero_saques_atualizado = saque(
-            saldo=conta['saldo'], valor=valor, extrato=conta['extrato'],
-            limite=conta['limite_saque'], numero_saques=conta['numero_saques_hoje'],
-            limite_saques=conta['limite_saques_diarios']
-        )
-        
-        conta['saldo'] = novo_saldo
-        conta['extrato'] = extrato_atualizado
-        conta['numero_saques_hoje'] = numero_saques_atualizado
+        data = validar_movimentacao(request.get_json(silent=True))
+        numero_conta, valor = data['numero_conta'], data['valor']
+        return jsonify(chamar_servico('sacar', numero_conta, valor, conta=numero_conta))
+    except Exception as e:
+        return resposta_erro(e)
+
+@app.route('/importar', methods=['POST'])
+@medir_rota
+@exigir_admin
+def api_importar():
+    try:
+        formato = request.args.get('formato') or ('ndjson' if request.mimetype == 'application/x-ndjson' else 'csv')
+        if formato not in FORMATOS_IMPORTACAO:
+            raise ValueError(f"Formato inválido: {formato}. Use csv ou ndjson.")
+        arquivo = io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8', newline='')
+        eventos = importar_cadastros(arquivo, formato)
+        linhas = (codificar_json(evento).decode('utf-8') + "\n" for evento in eventos)
+        return Response(stream_with_context(linhas), mimetype='application/x-ndjson')
+    except Exception as e:
+        return resposta_erro(e)
+
+@app.route('/transferir', methods=['POST'])
+@medir_rota
+@idempotente
+def api_transferir():
+    try:
+        data = validar_transferencia(request.get_json(silent=True))
+        return jsonify(servico_transferir_particionado(
+            data['numero_conta_origem'], data['numero_conta_destino'], data['valor']
+        ))
+    except Exception as e:
+        return resposta_erro(e)
+
+@app.route('/lote', methods=['POST'])
+@medir_rota
+def api_lote():
+    try:
+        atomicidade = request.args.get('atomicidade', 'por_item')
+        if request.mimetype == 'application/x-ndjson':
+            operacoes = decodificar_ndjson(request.get_data())
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                dados = validar_lote(data)
+                atomicidade = dados.get('atomicidade', atomicidade)
+                operacoes = dados['operacoes']
+            else:
+                operacoes = data
+        if not isinstance(operacoes, list):
+            raise ValueError("Envie uma lista de operações.")
         
-        return jsonify({
-            "sucesso": True,
-            "mensagem": f"Saque de R$ {valor:.2f} realizado com sucesso!",
-            "saldo": novo_saldo
-        })
+        if roteador is None:
+            return jsonify(executar_lote(operacoes, atomicidade))
+        return jsonify(roteador.executar_lote(operacoes, atomicidade))
     except Exception as e:
-        return jsonify({"sucesso": False, "mensagem": str(e)})
+        return resposta_erro(e)
 
 @app.route('/extrato/<int:numero_conta>')
+@medir_rota
 def api_extrato(numero_conta):
     try:
-        conta = buscar_conta(numero_conta)
+        cursor = int(request.args.get('cursor', 0))
+        inicio = ler_filtro_data(request.args.get('from'))
+        fim = ler_filtro_data(request.args.get('to'), fim=True)
         
-        if not conta:
-            return jsonify({"sucesso": False, "mensagem": "Conta não encontrada!"})
+        formato = request.args.get('formato')
+        if formato:
+            transacoes = chamar_servico('transacoes', numero_conta, cursor, inicio, fim, conta=numero_conta)
+            return resposta_streaming(transacoes, formato, CAMPOS_TRANSACAO)
         
-        resultado = exibir_extrato(conta['saldo'], extrato=conta['extrato'])
-        resultado['sucesso'] = True
-        resultado['numero_conta'] = numero_conta
-        resultado['agencia'] = conta['agencia']
+        pagina = None
+        parametros = ('cursor', 'limite', 'from', 'to')
+        if any(p in request.args for p in parametros):
+            limite = min(int(request.args.get('limite', LIMITE_PAGINA_MAXIMO)), LIMITE_PAGINA_MAXIMO)
+            if limite <= 0:
+                raise ValueError("O limite da página deve ser maior que 0.")
+            pagina = {"cursor": cursor, "limite": limite, "inicio": inicio, "fim": fim}
         
+        return jsonify(chamar_servico('extrato', numero_conta, pagina, conta=numero_conta))
+    except Exception as e:
+        return resposta_erro(e)
+
+@app.route('/resumo')
+@medir_rota
+def api_resumo():
+    try:
+        parametros = validar_parametros_resumo(request.args.to_dict())
+        top = parametros.get('top', 10)
+        dias = parametros.get('dias', 30)
+        if roteador is None:
+            dados = resumo.dados(top, dias)
+        else:
+            dados = juntar_resumos(roteador.em_todos("resumo", top, dias).values(), top, dias)
+        return jsonify(formatar_resumo(dados))
+    except Exception as e:
+        return resposta_erro(e)
+
+def _parametros_feed():
+    """desde (ou Last-Event-ID + 1), limite, espera e shard da leitura do feed"""
+    desde = request.args.get('desde')
+    if desde is None and request.headers.get('Last-Event-ID'):
+        desde = int(request.headers['Last-Event-ID']) + 1
+    desde = int(desde) if desde is not None else None
+    limite = min(int(request.args.get('limite', LIMITE_LEITURA_FEED)), LIMITE_LEITURA_FEED)
+    if limite <= 0:
+        raise ValueError("O limite deve ser maior que 0.")
+    espera = min(max(float(request.args.get('espera', 0)), 0), ESPERA_MAXIMA_FEED)
+    shard = int(request.args['shard']) if request.args.get('shard') else None
+    return desde, limite, espera, shard
+
+def resposta_feed_ocupado():
+    metricas.contar("meu_banco_feed_recusas_total")
+    resposta = jsonify({"sucesso": False, "mensagem": "Limite de assinantes do feed atingido. Tente novamente."})
+    resposta.status_code = 503
+    resposta.headers['Retry-After'] = '1'
+    return resposta
+
+# As rotas do feed não passam por medir_rota: o tempo de espera do long-poll
+# distorceria o histograma de latência
+@app.route('/alteracoes')
+@exigir_admin
+def api_alteracoes():
+    try:
+        desde, limite, espera, shard = _parametros_feed()
+        if not assinantes_feed.acquire(blocking=False):
+            return resposta_feed_ocupado()
+        try:
+            resultado = ler_alteracoes(desde, limite, espera, shard)
+        finally:
+            assinantes_feed.release()
+        resultado['sucesso'] = True
         return jsonify(resultado)
     except Exception as e:
-        return jsonify({"sucesso": False, "mensagem": str(e)})
+        return resposta_erro(e)
 
-if __name__ == '__main__':
-    print("🏦 Sistema Bancário iniciado!")
-    print("📍 Acesse: http://localhost:5000")
+@app.route('/alteracoes/stream')
+@exigir_admin
+def api_alteracoes_stream():
+    try:
+        desde, limite, _, shard = _parametros_feed()
+        if not assinantes_feed.acquire(blocking=False):
+            return resposta_feed_ocupado()
+        try:
+            # A primeira leitura fica fora do stream para que erros virem uma resposta comum
+            resultado = ler_alteracoes(desde, limite, 0, shard)
+        except Exception:
+            assinantes_feed.release()
+            raise
+    except Exception as e:
+        return resposta_erro(e)
+    
+    def eventos_sse(resultado):
+        prazo = time.monotonic() + DURACAO_MAXIMA_SSE
+        yield "retry: 1000\n\n"
+        while True:
+            partes = []
+            if resultado["perdidos"] or resultado["reiniciado"]:
+                eventos = resultado["eventos"]
+                lacuna = {"perdidos": resultado["perdidos"], "epoca": resultado["epoca"],
+                          "reiniciado": resultado["reiniciado"],
+                          "primeira_disponivel": eventos[0]["sequencia"] if eventos else resultado["proxima"]}
+                partes.append(f"event: lacuna\ndata: {codificar_json(lacuna).decode('utf-8')}\n\n")
+            for evento in resultado["eventos"]:
+                partes.append(f"id: {evento['sequencia']}\nevent: {evento['tipo']}\n"
+                              f"data: {codificar_json(evento).decode('utf-8')}\n\n")
+            # Um bloco por leitura; o próximo só é lido depois que este foi enviado
+            yield "".join(partes) or ": ping\n\n"
+            if time.monotonic() >= prazo:
+                return
+            resultado = ler_alteracoes(resultado["proxima"], limite, INTERVALO_HEARTBEAT_SSE, shard)
+    
+    resposta = Response(eventos_sse(resultado), mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    # O servidor chama close() mesmo se o cliente sair antes do primeiro bloco
+    resposta.call_on_close(assinantes_feed.release)
+    return resposta
+
+@app.route('/metrics')
+def api_metrics():
+    dados = metricas.coletar()
+    if roteador is not None:
+        for parcial in roteador.nos_outros("metricas").values():
+            Metricas._somar(dados, parcial)
+    
+    uso = cache_idempotencia.estatisticas()
+    medidores = "".join(
+        f"# TYPE meu_banco_idempotencia_{nome} gauge\nmeu_banco_idempotencia_{nome} {valor}\n"
+        for nome, valor in uso.items()
+    )
+    return Response(Metricas.exportar(dados) + medidores, mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/idempotencia')
+@exigir_admin
+def api_admin_idempotencia():
+    contadores = metricas.coletar()[0]
+    acertos = contadores.get(("meu_banco_idempotencia_total", (("resultado", "acerto"),)), 0)
+    faltas = contadores.get(("meu_banco_idempotencia_total", (("resultado", "falta"),)), 0)
+    return jsonify({
+        **cache_idempotencia.estatisticas(),
+        "acertos": acertos,
+        "faltas": faltas,
+        "taxa_acerto": acertos / (acertos + faltas) if acertos + faltas else 0.0,
+        "remocoes": {
+            motivo: contadores.get(("meu_banco_idempotencia_remocoes_total", (("motivo", motivo),)), 0)
+            for motivo in ("lru", "ttl")
+        }
+    })
+
+@app.route('/admin/perfil', methods=['GET', 'POST'])
+@exigir_admin
+def api_admin_perfil():
+    try:
+        if request.method == 'POST':
+            segundos = min(float(request.args.get('segundos', 10)), 300)
+            intervalo = max(float(request.args.get('intervalo', 0.005)), 0.001)
+            if not amostrador.iniciar(segundos, intervalo):
+                return jsonify({"sucesso": False, "mensagem": "Já existe uma coleta em andamento."})
+            return jsonify({"sucesso": True, "mensagem": f"Coleta de {segundos:g}s iniciada."})
+        
+        resposta = Response(amostrador.collapsed(), mimetype='text/plain')
+        resposta.headers['X-Perfil-Ativo'] = str(amostrador.ativo).lower()
+        resposta.headers['X-Perfil-Amostras'] = str(amostrador.amostras)
+        return resposta
+    except Exception as e:
+        return resposta_erro(e)
+
+@app.route('/admin/perfis_lentos')
+@exigir_admin
+def api_admin_perfis_lentos():
+    return jsonify({
+        "limite_ms": PERFIL_LENTO_MS,
+        "perfis": list(perfis_lentos)
+    })
+
+# Modos de execução
+#
+# dev:  servidor de desenvolvimento do Flask (debug ligado)
+# wsgi: servidor WSGI multithread de produção (waitress)
+# asgi: adaptador ASGI/asyncio servido pelo uvicorn
+#
+# O estado fica em memória, então todos os modos rodam em um único processo;
+# "workers" é o número de threads que atendem as requisições.
+
+# Corpo máximo aceito pelo adaptador ASGI; o /importar lê o corpo em streaming
+# e aceita arquivos maiores
+TAMANHO_MAXIMO_CORPO = int(os.environ.get('MEU_BANCO_CORPO_MAXIMO', 32 * 1024 * 1024))
+LIMITES_CORPO = {'/importar': int(os.environ.get('MEU_BANCO_IMPORTACAO_MAXIMA', 16 * 1024 ** 3))}
+# Blocos do corpo recebidos e ainda não lidos pela rota; com a fila cheia, o
+# adaptador para de receber e o servidor para de ler o socket
+BLOCOS_CORPO_EM_ESPERA = 8
+
+class CorpoGrandeDemais(DadosInvalidos):
+    def __init__(self, limite):
+        super().__init__(f"O corpo da requisição passa do limite de {limite} bytes.")
+
+class CorpoASGI(io.RawIOBase):
+    """
+    wsgi.input que entrega o corpo conforme ele chega: a thread da rota espera
+    cada bloco que o loop recebe, em vez de o corpo inteiro ser lido antes
+    Args:
+        fila: asyncio.Queue com os blocos (bytes), None no fim ou a exceção a levantar
+        loop: loop asyncio dono da fila
+    """
+    
+    def __init__(self, fila, loop):
+        self._fila = fila
+        self._loop = loop
+        self._bloco = memoryview(b'')
+        self._terminado = False
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, destino):
+        while not self._bloco:
+            if self._terminado:
+                return 0
+            item = asyncio.run_coroutine_threadsafe(self._fila.get(), self._loop).result()
+            if item is None or isinstance(item, Exception):
+                self._terminado = True
+                if item is not None:
+                    raise item
+                continue
+            self._bloco = memoryview(item)
+        quantidade = min(len(destino), len(self._bloco))
+        destino[:quantidade] = self._bloco[:quantidade]
+        self._bloco = self._bloco[quantidade:]
+        return quantidade
+
+class AppASGI:
+    """
+    Adaptador ASGI para as mesmas rotas Flask: o loop asyncio cuida das
+    conexões e cada requisição roda num pool limitado de threads
+    Args:
+        wsgi_app: aplicação WSGI (o app Flask)
+        workers: threads que executam as rotas
+        max_requisicoes: requisições atendidas ao mesmo tempo; as demais aguardam
+            sem que o corpo delas seja lido
+        max_corpo: tamanho máximo do corpo (LIMITES_CORPO define exceções por rota)
+    """
+    
+    def __init__(self, wsgi_app, workers=8, max_requisicoes=1000, max_corpo=TAMANHO_MAXIMO_CORPO):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='meu-banco')
+        self.semaforo = asyncio.Semaphore(max_requisicoes)
+        self.max_corpo = max_corpo
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                mensagem = await receive()
+                if mensagem['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif mensagem['type'] == 'lifespan.shutdown':
+                    persistencia.fechar()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+        
+        limite = LIMITES_CORPO.get(scope['path'], self.max_corpo)
+        declarado = next((valor for nome, valor in scope.get('headers', ()) if nome.lower() == b'content-length'), None)
+        if declarado is not None and declarado.isdigit() and int(declarado) > limite:
+            await self._recusar_corpo(send, limite)
+            return
+        
+        # Nada do corpo é lido antes de a requisição ter a sua vez
+        async with self.semaforo:
+            primeira = await receive()
+            if primeira['type'] != 'http.request':
+                return
+            corpo = primeira.get('body', b'')
+            if len(corpo) > limite:
+                await self._recusar_corpo(send, limite)
+                return
+            loop = asyncio.get_running_loop()
+            desconexao = loop.create_future()
+            if primeira.get('more_body'):
+                # Corpo em vários blocos: a rota lê cada um quando ele chega
+                fila = asyncio.Queue(BLOCOS_CORPO_EM_ESPERA)
+                fila.put_nowait(corpo)
+                environ = self._environ(scope, io.BufferedReader(CorpoASGI(fila, loop)))
+            else:
+                fila = None
+                environ = self._environ(scope, io.BytesIO(corpo), len(corpo))
+            recepcao = asyncio.ensure_future(self._receber(receive, fila, desconexao, limite - len(corpo), limite))
+            try:
+                await self._atender(environ, send, desconexao)
+            finally:
+                recepcao.cancel()
+    
+    @staticmethod
+    async def _recusar_corpo(send, limite):
+        corpo = codificar_json({"sucesso": False, "mensagem": str(CorpoGrandeDemais(limite))})
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'application/json'), (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': corpo})
+    
+    @staticmethod
+    async def _receber(receive, fila, desconexao, restante, limite):
+        """Passa os blocos seguintes do corpo para a fila e resolve `desconexao` quando o cliente sair"""
+        while fila is not None:
+            mensagem = await receive()
+            if mensagem['type'] == 'http.disconnect':
+                desconexao.set_result(None)
+                await fila.put(ConnectionResetError("O cliente desconectou antes de enviar o corpo."))
+                return
+            bloco = mensagem.get('body', b'')
+            restante -= len(bloco)
+            if restante < 0:
+                # O resto do corpo não é recebido: a rota encerra com o erro
+                await fila.put(CorpoGrandeDemais(limite))
+                return
+            if bloco:
+                await fila.put(bloco)
+            if not mensagem.get('more_body'):
+                await fila.put(None)
+                break
+        # Depois do corpo, o servidor só entrega a mensagem de desconexão; se
+        # entregar outra coisa, a conexão simplesmente não é acompanhada
+        if (await receive())['type'] == 'http.disconnect':
+            desconexao.set_result(None)
+    
+    async def _atender(self, environ, send, desconexao):
+        loop = asyncio.get_running_loop()
+        resposta = {}
+        
+        def start_response(status, cabecalhos, exc_info=None):
+            resposta['status'] = int(status.split(' ', 1)[0])
+            resposta['cabecalhos'] = [(nome.lower().encode('latin-1'), valor.encode('latin-1'))
+                                      for nome, valor in cabecalhos]
+        
+        # A rota e cada bloco do streaming podem rodar em threads diferentes do
+        # pool, mas sempre no mesmo contexto: o stream_with_context guarda o
+        # contexto da requisição em ContextVars
+        contexto = contextvars.copy_context()
+        iteravel = await loop.run_in_executor(self.executor, contexto.run, self.wsgi_app, environ, start_response)
+        proximo = None
+        try:
+            await send({'type': 'http.response.start', 'status': resposta['status'],
+                        'headers': resposta['cabecalhos']})
+            # Respostas em streaming são consumidas bloco a bloco no pool; se o
+            # cliente desconectar, o stream é encerrado (e o que ele retém, liberado)
+            blocos = iter(iteravel)
+            while True:
+                proximo = loop.run_in_executor(self.executor, contexto.run, next, blocos, None)
+                await asyncio.wait((proximo, desconexao), return_when=asyncio.FIRST_COMPLETED)
+                if not proximo.done():
+                    return
+                bloco = proximo.result()
+                if bloco is None:
+                    break
+                if bloco:
+                    await send({'type': 'http.response.body', 'body': bloco, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # O contexto só pode estar ativo em uma thread: o close espera o bloco pendente
+            if proximo is not None and not proximo.done():
+                await asyncio.wait((proximo,))
+            if hasattr(iteravel, 'close'):
+                contexto.run(iteravel.close)
+    
+    @staticmethod
+    def _environ(scope, entrada, tamanho=None):
+        servidor = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': servidor[0],
+            'SERVER_PORT': str(servidor[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': entrada,
+            # A entrada termina junto com o corpo: sem Content-Length, lê-se até o fim
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if tamanho is not None:
+            environ['CONTENT_LENGTH'] = str(tamanho)
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+        for nome, valor in scope.get('headers', []):
+            nome = nome.decode('latin-1').upper().replace('-', '_')
+            valor = valor.decode('latin-1')
+            if nome in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[nome] = valor
+                continue
+            chave = f"HTTP_{nome}"
+            environ[chave] = f"{environ[chave]},{valor}" if chave in environ else valor
+        return environ
+
+def servir_wsgi(host, porta, workers, max_conexoes, soquete=None):
+    """Serve o app com o waitress (threads fixas e limite de conexões)"""
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("O modo wsgi precisa do waitress: pip install waitress")
+    if soquete is not None:
+        serve(app, sockets=[soquete], threads=workers, connection_limit=max_conexoes)
+    else:
+        serve(app, host=host, port=porta, threads=workers, connection_limit=max_conexoes)
+
+def servir_asgi(host, porta, workers, max_conexoes, soquete=None):
+    """Serve o adaptador ASGI com o uvicorn (um processo, loop asyncio)"""
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("O modo asgi precisa do uvicorn: pip install uvicorn")
+    endereco = {"fd": soquete.fileno()} if soquete is not None else {"host": host, "port": porta}
+    uvicorn.run(AppASGI(app, workers=workers, max_requisicoes=max_conexoes), **endereco,
+                workers=1, limit_concurrency=max_conexoes, lifespan='on', log_level='warning')
+
+def servir(modo, soquete, workers, max_conexoes):
+    """Atende HTTP num socket de escuta já aberto (cada processo shard chama com o mesmo socket)"""
+    if modo == 'wsgi':
+        servir_wsgi(None, None, workers, max_conexoes, soquete)
+    elif modo == 'asgi':
+        servir_asgi(None, None, workers, max_conexoes, soquete)
+    else:
+        # O servidor do werkzeug, com uma thread por conexão (sem reloader nem depurador); com vários
+        # processos no mesmo terminal, o log de acesso embaralharia as linhas e fica só o de erros
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        host, porta = soquete.getsockname()[:2]
+        make_server(host, porta, app, threaded=True, fd=soquete.fileno()).serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sistema Bancário")
+    parser.add_argument('--modo', choices=('dev', 'wsgi', 'asgi'), default='dev',
+                        help="servidor utilizado (padrão: dev)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--porta', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=8,
+                        help="threads que atendem as requisições (wsgi/asgi)")
+    parser.add_argument('--max-conexoes', type=int, default=1000,
+                        help="conexões simultâneas aceitas (wsgi/asgi)")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="processos entre os quais contas e clientes são particionados")
+    parser.add_argument('--importar', metavar='ARQUIVO',
+                        help="importa clientes e contas de um CSV/NDJSON e encerra")
+    args = parser.parse_args(argv)
+    
+    if hasattr(signal, 'SIGUSR2'):
+        signal.signal(signal.SIGUSR2, _perfilar_ao_sinal)
+    
+    diretorio_dados = os.environ.get('MEU_BANCO_DADOS')
+    if diretorio_dados:
+        print(f"💾 Dados persistidos em: {diretorio_dados}")
+    if args.shards > 1 and not args.importar:
+        # Cada shard atende HTTP no mesmo socket; este processo só os acompanha
+        soquete = socket.create_server((args.host, args.porta), backlog=args.max_conexoes)
+        iniciar_shards(args.shards, diretorio_dados, (args.modo, soquete, args.workers, args.max_conexoes))
+        soquete.close()
+        print(f"🏦 Sistema Bancário iniciado! (modo {args.modo}, contas particionadas em {args.shards} processos)")
+        print(f"📍 Acesse: http://localhost:{args.porta}")
+        print("=" * 50)
+        try:
+            for processo in roteador.processos:
+                processo.join()
+        except KeyboardInterrupt:
+            pass  # os shards recebem o mesmo Ctrl+C e encerram sozinhos
+        return
+    if args.shards > 1:
+        iniciar_shards(args.shards, diretorio_dados)
+    else:
+        configurar_armazem_frio(diretorio_dados)
+        if diretorio_dados:
+            configurar_persistencia(PersistenciaWAL(diretorio_dados))
+    
+    if args.importar:
+        # O processo só importa e encerra: milhões de objetos novos e permanentes
+        # fariam cada coleta completa do gc percorrer tudo de novo, então a coleta
+        # fica desligada até o fim
+        gc.disable()
+        importar_arquivo(args.importar)
+        return
+    
+    print(f"🏦 Sistema Bancário iniciado! (modo {args.modo})")
+    print(f"📍 Acesse: http://localhost:{args.porta}")
     print("=" * 50)
-    app.run(host='0.0.0.0', port=5000, debug=True)
-    
\ No newline at end of file
+    if args.modo == 'wsgi':
+        servir_wsgi(args.host, args.porta, args.workers, args.max_conexoes)
+    elif args.modo == 'asgi':
+        servir_asgi(args.host, args.porta, args.workers, args.max_conexoes)
+    else:
+        app.run(host=args.host, port=args.porta, debug=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import pytest
+
+import meu_banco
+
+def pytest_addoption(parser):
+    parser.addoption("--lentos", action="store_true", help="executa também os testes marcados como lentos")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "lento: teste demorado, só executado com --lentos")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--lentos"):
+        return
+    pular = pytest.mark.skip(reason="teste lento: use --lentos")
+    for item in items:
+        if "lento" in item.keywords:
+            item.add_marker(pular)
+
+@pytest.fixture
+def banco():
+    """meu_banco com estado vazio e persistência em memória"""
+    meu_banco.configurar_persistencia(meu_banco.PersistenciaMemoria())
+    meu_banco.carregar_estado({"clientes": [], "contas": [], "numero_conta_sequencial": 1})
+    yield meu_banco
+    meu_banco.carregar_estado({"clientes": [], "contas": [], "numero_conta_sequencial": 1})
+
+@pytest.fixture
+def abrir_contas(banco):
+    """Cria `quantidade` contas (um cliente cada) sem limites de saque e retorna os números"""
+    def abrir(quantidade):
+        numeros = []
+        for indice in range(quantidade):
+            cpf = f"{indice + 1:011d}"
+            banco.criar_cliente(f"Cliente {indice}", "01/01/1990", cpf, "Rua A", "1", "Centro", "São Paulo/SP")
+            conta = banco.buscar_conta(banco.criar_conta_bancaria(cpf)["conta"]["numero_conta"])
+            conta.limite_saque = banco.SALDO_MAXIMO
+            conta.limite_saques_diarios = 10**9
+            conta.limite_valor_diario = None
+            numeros.append(conta.numero_conta)
+        return numeros
+    return abrir
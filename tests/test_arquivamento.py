@@ -0,0 +1,213 @@
+import threading
+import time
+
+import pytest
+
+import meu_banco
+
+INICIO = 1_700_000_000.0
+TRANSACOES = 1_000
+
+@pytest.fixture
+def armazem(tmp_path, monkeypatch):
+    """Armazenamento frio em tmp_path, com o cache de segmentos limpo antes e depois"""
+    monkeypatch.setattr(meu_banco, "armazem_frio", meu_banco.ArmazemFrio(str(tmp_path / "frio")))
+    meu_banco.ler_segmento.cache_clear()
+    yield meu_banco.armazem_frio
+    meu_banco.ler_segmento.cache_clear()
+
+@pytest.fixture
+def conta_com_historico(abrir_contas, armazem):
+    """Conta com TRANSACOES transações de tipos variados, uma por minuto a partir de INICIO"""
+    conta = meu_banco.buscar_conta(abrir_contas(1)[0])
+    tipos = ("Depósito", "Saque", "Transferência enviada", "Transferência recebida")
+    for posicao in range(TRANSACOES):
+        tipo = tipos[posicao % len(tipos)]
+        conta.extrato.adicionar(tipo, 100 + posicao, INICIO + 60 * posicao, 2 if "Transferência" in tipo else 0)
+    return conta
+
+def _totais(extrato):
+    return (extrato.total_depositos, extrato.numero_depositos, extrato.total_saques, extrato.numero_saques,
+            extrato.total_transferencias_enviadas, extrato.total_transferencias_recebidas)
+
+def test_segmentos_frios_guardam_as_transacoes_arquivadas(conta_com_historico, armazem, monkeypatch):
+    monkeypatch.setattr(meu_banco, "ARQUIVAR_MAXIMO", 300)
+    extrato = conta_com_historico.extrato
+    antes, totais = list(extrato), _totais(extrato)
+    
+    arquivadas = meu_banco.arquivar_conta(conta_com_historico, INICIO + 60 * 730)
+    
+    assert arquivadas == 730
+    assert extrato.base == 730
+    assert len(extrato.valores) == TRANSACOES - 730
+    assert [(s.inicio, s.quantidade) for s in extrato.segmentos] == [(0, 300), (300, 300), (600, 130)]
+    assert list(extrato) == antes
+    assert _totais(extrato) == totais
+    assert [extrato[posicao] for posicao in (0, 299, 300, 729, 730, -1)] == \
+           [antes[posicao] for posicao in (0, 299, 300, 729, 730, -1)]
+    assert extrato.bruta(650) == (antes[650]["tipo"], 100 + 650, INICIO + 60 * 650)
+    
+    segmento = extrato.segmentos[1]
+    assert (segmento.primeiro_timestamp, segmento.ultimo_timestamp) == (INICIO + 60 * 300, INICIO + 60 * 599)
+    assert sum(quantidade for _, _, quantidade in segmento.totais) == 300
+    valores, timestamps, tipos, contrapartes = meu_banco.ler_segmento(segmento)
+    assert list(valores) == list(range(400, 700))
+    assert list(timestamps) == [INICIO + 60 * posicao for posicao in range(300, 600)]
+    # A leitura direta do arquivo (sem o cache) devolve o mesmo conteúdo
+    assert armazem.ler(segmento) == b"".join(coluna.tobytes() for coluna in (valores, timestamps, tipos, contrapartes))
+    
+    # O que sobra antes do limite é pouco demais para um segmento
+    assert meu_banco.arquivar_conta(conta_com_historico, INICIO + 60 * (730 + meu_banco.ARQUIVAR_MINIMO - 1)) == 0
+    assert extrato.base == 730
+
+def test_paginacao_atravessa_a_fronteira_quente_fria(conta_com_historico, monkeypatch):
+    monkeypatch.setattr(meu_banco, "ARQUIVAR_MAXIMO", 256)
+    extrato = conta_com_historico.extrato
+    antes = list(extrato)
+    meu_banco.arquivar_conta(conta_com_historico, INICIO + 60 * 600)
+    assert extrato.base == 512
+    
+    paginas = []
+    cursor = 0
+    while cursor is not None:
+        pagina, cursor = extrato.pagina(cursor, 100)
+        paginas.append(pagina)
+    assert [transacao for pagina in paginas for transacao in pagina] == antes
+    assert len(paginas) == 10
+    
+    # Período que começa no meio de um segmento frio e termina na parte em memória
+    inicio, fim = INICIO + 60 * 250 + 30, INICIO + 60 * 800
+    no_periodo = [transacao for transacao in antes if inicio <= transacao["timestamp"] < fim]
+    pagina, cursor = extrato.pagina(0, 200, inicio, fim)
+    assert pagina == no_periodo[:200]
+    assert cursor == 251 + 200
+    pagina, cursor = extrato.pagina(cursor, 1_000, inicio, fim)
+    assert pagina == no_periodo[200:]
+    assert cursor is None
+    assert list(extrato.iterar(0, inicio, fim)) == no_periodo
+    # Um período inteiro dentro da parte arquivada
+    assert extrato.pagina(0, None, INICIO, INICIO + 60 * 10)[0] == antes[:10]
+
+def test_recuperacao_com_snapshot_que_cita_segmentos(abrir_contas, armazem, tmp_path):
+    meu_banco.configurar_persistencia(meu_banco.PersistenciaWAL(str(tmp_path / "wal")))
+    try:
+        numero = abrir_contas(1)[0]
+        conta = meu_banco.buscar_conta(numero)
+        for valor in range(1, 301):
+            meu_banco.realizar_deposito(conta, valor)
+        assert meu_banco.arquivar_conta(conta, time.time() + 1) == 300
+        meu_banco.persistencia.snapshot()
+        # Depois do snapshot: vão só para o log
+        for valor in range(1, 11):
+            meu_banco.realizar_saque(conta, valor)
+        antes, saldo, segmentos = list(conta.extrato), conta.saldo, list(conta.extrato.segmentos)
+        totais = _totais(conta.extrato)
+        
+        meu_banco.persistencia.fechar()
+        meu_banco.persistencia = meu_banco.PersistenciaMemoria()
+        meu_banco.carregar_estado({"clientes": [], "contas": [], "numero_conta_sequencial": 1})
+        meu_banco.ler_segmento.cache_clear()
+        meu_banco.armazem_frio = meu_banco.ArmazemFrio(armazem.diretorio)
+        meu_banco.configurar_persistencia(meu_banco.PersistenciaWAL(str(tmp_path / "wal")))
+        
+        recuperada = meu_banco.buscar_conta(numero)
+        assert recuperada.extrato.segmentos == segmentos
+        assert recuperada.extrato.base == 300
+        assert list(recuperada.extrato) == antes
+        assert recuperada.saldo == saldo
+        assert _totais(recuperada.extrato) == totais
+        dados = meu_banco.resumo.dados()
+        assert dados["saldo_total"] == saldo
+        assert dados["totais"]["Depósito"] == [sum(range(1, 301)), 300]
+        assert dados["totais"]["Saque"] == [sum(range(1, 11)), 10]
+    finally:
+        meu_banco.configurar_persistencia(meu_banco.PersistenciaMemoria())
+
+def _gravar_com_intervalo(armazem, monkeypatch, durante_a_gravacao):
+    """Faz a primeira gravação de segmento executar `durante_a_gravacao` numa thread antes de gravar"""
+    gravar = armazem.gravar
+    chamadas = []
+    
+    def gravar_com_intervalo(inicio, colunas):
+        chamadas.append(inicio)
+        if len(chamadas) == 1:
+            thread = threading.Thread(target=durante_a_gravacao)
+            thread.start()
+            # Com o lock da conta retido aqui, a outra thread ficaria parada
+            thread.join(5)
+            assert not thread.is_alive()
+        return gravar(inicio, colunas)
+    
+    monkeypatch.setattr(armazem, "gravar", gravar_com_intervalo)
+    return chamadas
+
+def test_depositos_durante_o_arquivamento(conta_com_historico, armazem, monkeypatch):
+    extrato = conta_com_historico.extrato
+    antes = list(extrato)
+    
+    def depositar():
+        for valor in (1, 2, 3):
+            meu_banco.realizar_deposito(conta_com_historico, valor)
+    
+    _gravar_com_intervalo(armazem, monkeypatch, depositar)
+    
+    assert meu_banco.arquivar_conta(conta_com_historico, INICIO + 60 * 500) == 500
+    assert extrato.base == 500
+    depositos = list(extrato)[TRANSACOES:]
+    assert [transacao["valor"] for transacao in depositos] == [0.01, 0.02, 0.03]
+    assert list(extrato)[:TRANSACOES] == antes
+
+def test_arquivamento_concorrente_do_mesmo_trecho(conta_com_historico, armazem, monkeypatch):
+    extrato = conta_com_historico.extrato
+    antes = list(extrato)
+    # Outro arquivamento grava e anexa o mesmo trecho enquanto o primeiro comprime
+    chamadas = _gravar_com_intervalo(
+        armazem, monkeypatch, lambda: meu_banco.arquivar_conta(conta_com_historico, INICIO + 60 * 500))
+    
+    # O primeiro encontra a base já movida e desiste do segmento que gravou
+    assert meu_banco.arquivar_conta(conta_com_historico, INICIO + 60 * 500) == 0
+    assert chamadas == [0, 0]
+    assert [(s.inicio, s.quantidade) for s in extrato.segmentos] == [(0, 500)]
+    assert list(extrato) == antes
+
+def test_operacoes_e_leituras_concorrentes_com_arquivamento(abrir_contas, armazem, monkeypatch):
+    monkeypatch.setattr(meu_banco, "ARQUIVAR_MAXIMO", 200)
+    conta = meu_banco.buscar_conta(abrir_contas(1)[0])
+    parar = threading.Event()
+    erros = []
+    
+    def depositar():
+        try:
+            for _ in range(3_000):
+                meu_banco.realizar_deposito(conta, 1)
+        except Exception as e:
+            erros.append(e)
+        finally:
+            parar.set()
+    
+    def ler():
+        try:
+            while not parar.is_set():
+                tamanho = len(conta.extrato)
+                pagina, _ = conta.extrato.pagina(max(0, tamanho - 300), 300)
+                assert all(transacao["valor"] == 0.01 for transacao in pagina)
+        except Exception as e:
+            erros.append(e)
+    
+    threads = [threading.Thread(target=depositar), threading.Thread(target=ler)]
+    for thread in threads:
+        thread.start()
+    while not parar.is_set():
+        meu_banco.arquivar_conta(conta, time.time() + 1)
+    for thread in threads:
+        thread.join()
+    meu_banco.arquivar_conta(conta, time.time() + 1)
+    
+    assert not erros
+    assert conta.saldo == 3_000
+    assert len(conta.extrato) == 3_000
+    assert conta.extrato.base > 0
+    assert sum(transacao["valor"] for transacao in conta.extrato) == pytest.approx(30)
+    segmentos = conta.extrato.segmentos
+    assert all(anterior.inicio + anterior.quantidade == seguinte.inicio
+               for anterior, seguinte in zip(segmentos, segmentos[1:]))
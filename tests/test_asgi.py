@@ -0,0 +1,167 @@
+import asyncio
+
+import meu_banco
+
+async def chamar(app, metodo, caminho, corpo=b"", cabecalhos=(), query=b"", blocos_ate_sair=None):
+    """Requisição ASGI como o servidor faz: entrega o corpo e depois só avisa da desconexão"""
+    escopo = {"type": "http", "method": metodo, "path": caminho, "query_string": query,
+              "headers": list(cabecalhos), "client": ("127.0.0.1", 0)}
+    saiu = asyncio.Event()
+    mensagens = iter([{"type": "http.request", "body": corpo, "more_body": False}])
+    enviadas = []
+    
+    async def receive():
+        mensagem = next(mensagens, None)
+        if mensagem is None:
+            await saiu.wait()
+            return {"type": "http.disconnect"}
+        return mensagem
+    
+    async def send(mensagem):
+        enviadas.append(mensagem)
+        blocos = sum(1 for m in enviadas if m["type"] == "http.response.body")
+        if blocos_ate_sair is not None and blocos >= blocos_ate_sair:
+            saiu.set()
+    
+    await app(escopo, receive, send)
+    return enviadas[0]["status"], b"".join(m.get("body", b"") for m in enviadas[1:])
+
+def test_streaming_com_contexto_da_requisicao(banco):
+    app = meu_banco.AppASGI(meu_banco.app, workers=4)
+    
+    # Cada bloco do /importar pode ser lido por uma thread diferente do pool
+    for indice in range(10):
+        cpf = f"{indice + 1:011d}"
+        texto = ("nome,data_nascimento,cpf,logradouro,numero,bairro,cidade_uf,contas\n"
+                 f"Ana Souza,01/01/1990,{cpf},Rua A,1,Centro,São Paulo/SP,1\n")
+        status, corpo = asyncio.run(chamar(app, "POST", "/importar", texto.encode("utf-8"),
+                                           [(b"content-type", b"text/csv")]))
+        
+        assert status == 200
+        assert b'"resumo"' in corpo
+        assert banco.buscar_cliente_por_cpf(cpf) is not None
+
+def test_desconexao_libera_o_assinante_do_feed(banco, monkeypatch):
+    monkeypatch.setattr(meu_banco, "INTERVALO_HEARTBEAT_SSE", 0.2)
+    app = meu_banco.AppASGI(meu_banco.app, workers=4)
+    livres = meu_banco.assinantes_feed._value
+    
+    async def sair_do_stream():
+        return await asyncio.wait_for(chamar(app, "GET", "/alteracoes/stream", query=b"desde=0",
+                                             blocos_ate_sair=2), timeout=10)
+    
+    status, _ = asyncio.run(sair_do_stream())
+    
+    assert status == 200
+    assert meu_banco.assinantes_feed._value == livres
+
+def _linhas_importacao(inicio, quantidade):
+    return "".join(f"Cliente {i},01/01/1990,{i:011d},Rua A,1,Centro,São Paulo/SP,1\n"
+                   for i in range(inicio, inicio + quantidade)).encode("utf-8")
+
+def test_corpo_acima_do_limite_declarado_nem_e_lido(banco):
+    app = meu_banco.AppASGI(meu_banco.app, workers=2, max_corpo=1024)
+    lidas = []
+    
+    async def receive():
+        lidas.append(1)
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+    
+    enviadas = []
+    
+    async def send(mensagem):
+        enviadas.append(mensagem)
+    
+    escopo = {"type": "http", "method": "POST", "path": "/depositar", "query_string": b"",
+              "headers": [(b"content-type", b"application/json"), (b"content-length", b"4096")]}
+    asyncio.run(app(escopo, receive, send))
+    
+    assert enviadas[0]["status"] == 413
+    assert b"1024 bytes" in enviadas[1]["body"]
+    assert not lidas
+
+def test_corpo_em_blocos_acima_do_limite(abrir_contas):
+    numero, = abrir_contas(1)
+    app = meu_banco.AppASGI(meu_banco.app, workers=2, max_corpo=64 * 1024)
+    linha = meu_banco.codificar_json({"tipo": "deposito", "numero_conta": numero, "valor": 1}) + b"\n"
+    # Sem Content-Length: o limite só é percebido no meio da leitura
+    blocos = iter([linha * 1000] * 10)
+    
+    async def executar():
+        async def receive():
+            bloco = next(blocos, None)
+            if bloco is None:
+                await asyncio.Event().wait()
+            return {"type": "http.request", "body": bloco, "more_body": True}
+        
+        enviadas = []
+        
+        async def send(mensagem):
+            enviadas.append(mensagem)
+        
+        escopo = {"type": "http", "method": "POST", "path": "/lote", "query_string": b"",
+                  "headers": [(b"content-type", b"application/x-ndjson")]}
+        await asyncio.wait_for(app(escopo, receive, send), timeout=10)
+        return enviadas
+    
+    enviadas = asyncio.run(executar())
+    
+    resposta = meu_banco.decodificar_json(b"".join(m.get("body", b"") for m in enviadas[1:]))
+    assert resposta == {"sucesso": False, "mensagem": "O corpo da requisição passa do limite de 65536 bytes."}
+    assert meu_banco.buscar_conta(numero).saldo == 0
+    assert next(blocos, None) is not None
+
+def test_importar_le_o_corpo_conforme_ele_chega(banco):
+    app = meu_banco.AppASGI(meu_banco.app, workers=4, max_requisicoes=1)
+    cabecalho = b"nome,data_nascimento,cpf,logradouro,numero,bairro,cidade_uf,contas\n"
+    tamanho = meu_banco.TAMANHO_BLOCO_IMPORTACAO
+    
+    async def executar():
+        progresso = asyncio.Event()
+        segunda_lida = []
+        enviadas = []
+        mensagens = [
+            {"type": "http.request", "body": cabecalho + _linhas_importacao(1, tamanho), "more_body": True},
+            {"type": "http.request", "body": _linhas_importacao(tamanho + 1, 10), "more_body": False},
+        ]
+        
+        async def receive():
+            if not mensagens:
+                await asyncio.Event().wait()
+            if len(mensagens) == 1:
+                # O segundo bloco só é enviado depois de o primeiro virar progresso na resposta
+                await progresso.wait()
+            return mensagens.pop(0)
+        
+        async def send(mensagem):
+            enviadas.append(mensagem)
+            if b'"progresso"' in mensagem.get("body", b""):
+                progresso.set()
+        
+        async def receive_segunda():
+            segunda_lida.append(progresso.is_set() and len(mensagens) == 0)
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+        
+        async def send_segunda(mensagem):
+            pass
+        
+        importacao = asyncio.ensure_future(app(
+            {"type": "http", "method": "POST", "path": "/importar", "query_string": b"",
+             "headers": [(b"content-type", b"text/csv")], "client": ("127.0.0.1", 0)}, receive, send))
+        await asyncio.sleep(0)
+        # Com max_requisicoes=1, a segunda requisição espera a vez sem ter o corpo lido
+        segunda = asyncio.ensure_future(app(
+            {"type": "http", "method": "POST", "path": "/depositar", "query_string": b"",
+             "headers": [(b"content-type", b"application/json")]}, receive_segunda, send_segunda))
+        await asyncio.wait_for(importacao, timeout=30)
+        await asyncio.wait_for(segunda, timeout=10)
+        return enviadas, segunda_lida
+    
+    enviadas, segunda_lida = asyncio.run(executar())
+    
+    assert enviadas[0]["status"] == 200
+    eventos = [meu_banco.decodificar_json(linha)
+               for linha in b"".join(m.get("body", b"") for m in enviadas[1:]).splitlines()]
+    assert [evento["progresso"]["clientes"] for evento in eventos if "progresso" in evento] == [tamanho, tamanho + 10]
+    assert eventos[-1]["resumo"]["clientes"] == tamanho + 10
+    assert segunda_lida == [True]
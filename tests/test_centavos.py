@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+import meu_banco
+
+SINAIS = {"Depósito": 1, "Transferência recebida": 1, "Saque": -1, "Transferência enviada": -1}
+OPERACOES_RAZAO = 10_000_000
+
+def centavos_esperados(texto):
+    """Arredondamento bancário feito à mão, em milésimos de real, para conferir o para_centavos"""
+    negativo = texto.startswith('-')
+    inteiro, _, fracao = texto.lstrip('-').partition('.')
+    milesimos = int(inteiro) * 1000 + int(fracao.ljust(3, '0'))
+    centavos, resto = divmod(milesimos, 10)
+    if resto > 5 or (resto == 5 and centavos % 2):
+        centavos += 1
+    return -centavos if negativo else centavos
+
+def valor_aleatorio(rng):
+    """Valor em reais como texto, com 0 a 3 casas e muitos empates de meio centavo"""
+    casas = rng.choice((0, 1, 2, 3, 3))
+    texto = str(rng.randrange(0, 2000))
+    if casas:
+        fracao = rng.randrange(10**casas)
+        if casas == 3 and rng.random() < 0.5:
+            fracao = fracao // 10 * 10 + 5
+        texto += f".{fracao:0{casas}d}"
+    return texto
+
+@pytest.mark.parametrize("texto, centavos", [
+    ("0.005", 0), ("0.015", 2), ("0.025", 2), ("0.035", 4), ("1.005", 100), ("2.675", 268),
+    ("10.125", 1012), ("10.135", 1014), ("0.004", 0), ("0.006", 1), ("-0.015", -2), ("123", 12300),
+])
+def test_empates_vao_para_o_par(texto, centavos):
+    assert meu_banco.para_centavos(texto) == centavos
+    assert centavos_esperados(texto) == centavos
+
+@pytest.mark.parametrize("valor, centavos", [(0.125, 12), (0.135, 14), (19.99, 1999), (7, 700)])
+def test_numeros_json(valor, centavos):
+    assert meu_banco.para_centavos(valor) == centavos
+
+def test_valor_maximo():
+    maximo = meu_banco.VALOR_MAXIMO
+    assert meu_banco.para_centavos(meu_banco.formatar_reais(maximo)) == maximo
+    for valor in (meu_banco.formatar_reais(maximo + 1), maximo, "99999999999999999999", "1e999999",
+                  "-1e999999", 1e300, "9" * 5000):
+        with pytest.raises(meu_banco.ValorInvalido):
+            meu_banco.para_centavos(valor)
+
+def test_saldo_maximo(abrir_contas):
+    origem, destino = abrir_contas(2)
+    conta = meu_banco.buscar_conta(destino)
+    conta.saldo = meu_banco.SALDO_MAXIMO - 100
+    meu_banco.realizar_deposito(meu_banco.buscar_conta(origem), 200)
+    with pytest.raises(meu_banco.LimiteExcedido):
+        meu_banco.realizar_deposito(conta, 200)
+    with pytest.raises(meu_banco.LimiteExcedido):
+        meu_banco.realizar_transferencia(meu_banco.buscar_conta(origem), conta, 200)
+    assert conta.saldo == meu_banco.SALDO_MAXIMO - 100
+
+@pytest.mark.parametrize("semente", range(20))
+def test_saldo_igual_a_soma_do_extrato(abrir_contas, semente):
+    rng = random.Random(semente)
+    numeros = abrir_contas(4)
+    esperado = dict.fromkeys(numeros, 0)
+    http = meu_banco.app.test_client()
+    
+    for _ in range(150):
+        texto = valor_aleatorio(rng)
+        centavos = centavos_esperados(texto)
+        numero = rng.choice(numeros)
+        operacao = rng.choice(("deposito", "deposito", "saque", "transferencia"))
+        if operacao == "deposito":
+            resposta = http.post('/depositar', json={"numero_conta": numero, "valor": texto}).get_json()
+            aceita = centavos > 0
+            if aceita:
+                esperado[numero] += centavos
+        elif operacao == "saque":
+            resposta = http.post('/sacar', json={"numero_conta": numero, "valor": texto}).get_json()
+            aceita = 0 < centavos <= esperado[numero]
+            if aceita:
+                esperado[numero] -= centavos
+        else:
+            destino = rng.choice([outro for outro in numeros if outro != numero])
+            resposta = http.post('/transferir', json={"numero_conta_origem": numero, "numero_conta_destino": destino,
+                                                      "valor": texto}).get_json()
+            aceita = 0 < centavos <= esperado[numero]
+            if aceita:
+                esperado[numero] -= centavos
+                esperado[destino] += centavos
+        assert resposta["sucesso"] is aceita, (operacao, texto, resposta)
+    
+    for numero in numeros:
+        extrato = http.get(f'/extrato/{numero}').get_json()
+        soma = sum(SINAIS[transacao["tipo"]] * meu_banco.para_centavos(transacao["valor"])
+                   for transacao in extrato["transacoes"])
+        assert meu_banco.buscar_conta(numero).saldo == esperado[numero] == soma
+        assert meu_banco.para_centavos(extrato["saldo"]) == esperado[numero]
+
+@pytest.mark.lento
+def test_saldo_igual_ao_razao_depois_de_10_milhoes_de_operacoes(abrir_contas):
+    rng = random.Random(2024)
+    contas = [meu_banco.buscar_conta(numero) for numero in abrir_contas(100)]
+    esperado = [0] * len(contas)
+    
+    for _ in range(OPERACOES_RAZAO):
+        indice = rng.randrange(len(contas))
+        valor = rng.randrange(1, 100_000)
+        sorteio = rng.random()
+        try:
+            if sorteio < 0.5:
+                meu_banco.realizar_deposito(contas[indice], valor)
+                esperado[indice] += valor
+            elif sorteio < 0.8:
+                meu_banco.realizar_saque(contas[indice], valor)
+                esperado[indice] -= valor
+            else:
+                destino = (indice + rng.randrange(1, len(contas))) % len(contas)
+                meu_banco.realizar_transferencia(contas[indice], contas[destino], valor)
+                esperado[indice] -= valor
+                esperado[destino] += valor
+        except meu_banco.SaldoInsuficiente:
+            assert valor > esperado[indice]
+    
+    for conta, saldo in zip(contas, esperado):
+        razao = sum(SINAIS[tipo] * valor for tipo, valor, _ in conta.extrato.brutas())
+        assert conta.saldo == saldo == razao
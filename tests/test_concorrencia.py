@@ -0,0 +1,77 @@
+from collections import Counter
+import random
+import sys
+import threading
+
+import meu_banco
+
+THREADS = 64
+OPERACOES_POR_THREAD = 300
+# Metade das contas divide a faixa de lock com a outra metade
+CONTAS = 16
+SALDO_INICIAL = 1_000_000
+
+def test_operacoes_concorrentes_conservam_o_dinheiro(abrir_contas):
+    abertas = abrir_contas(meu_banco.NUMERO_LOCKS_CONTAS + CONTAS // 2)
+    numeros = abertas[:CONTAS // 2] + abertas[-(CONTAS // 2):]
+    for numero in numeros:
+        meu_banco.realizar_deposito(meu_banco.buscar_conta(numero), SALDO_INICIAL)
+    largada = threading.Barrier(THREADS)
+    # Por thread: centavos que entraram e saíram de cada conta, só das operações aceitas
+    entradas = [Counter() for _ in range(THREADS)]
+    saidas = [Counter() for _ in range(THREADS)]
+    depositado = [0] * THREADS
+    sacado = [0] * THREADS
+    erros = []
+    
+    def executar(indice):
+        rng = random.Random(indice)
+        largada.wait()
+        for _ in range(OPERACOES_POR_THREAD):
+            # Poucas contas e origem igual ao destino de vez em quando: muita disputa pelos mesmos locks
+            origem = meu_banco.buscar_conta(rng.choice(numeros))
+            destino = meu_banco.buscar_conta(rng.choice(numeros))
+            valor = rng.randrange(1, 50_000)
+            operacao = rng.choice(("deposito", "saque", "transferencia"))
+            try:
+                if operacao == "deposito":
+                    meu_banco.realizar_deposito(origem, valor)
+                    entradas[indice][origem.numero_conta] += valor
+                    depositado[indice] += valor
+                elif operacao == "saque":
+                    meu_banco.realizar_saque(origem, valor)
+                    saidas[indice][origem.numero_conta] += valor
+                    sacado[indice] += valor
+                else:
+                    meu_banco.realizar_transferencia(origem, destino, valor)
+                    saidas[indice][origem.numero_conta] += valor
+                    entradas[indice][destino.numero_conta] += valor
+            except meu_banco.OperacaoRecusada:
+                pass
+            except Exception as e:
+                erros.append(e)
+    
+    # Trocas de thread bem mais frequentes que o padrão, para intercalar as operações
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [threading.Thread(target=executar, args=(i,)) for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(intervalo)
+    
+    assert not erros
+    entrou, saiu = sum(entradas, Counter()), sum(saidas, Counter())
+    for numero in numeros:
+        conta = meu_banco.buscar_conta(numero)
+        assert conta.saldo == SALDO_INICIAL + entrou[numero] - saiu[numero]
+        soma_extrato = sum(valor if tipo in ("Depósito", "Transferência recebida") else -valor
+                           for tipo, valor, _ in conta.extrato.brutas())
+        assert soma_extrato == conta.saldo
+    
+    total = sum(meu_banco.buscar_conta(numero).saldo for numero in numeros)
+    assert total == CONTAS * SALDO_INICIAL + sum(depositado) - sum(sacado)
+    assert meu_banco.resumo.dados()["saldo_total"] == total
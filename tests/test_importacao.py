@@ -0,0 +1,105 @@
+import io
+import json
+import threading
+
+import meu_banco
+
+CABECALHO = "nome,data_nascimento,cpf,logradouro,numero,bairro,cidade_uf,contas\n"
+
+def _linha_csv(cpf, contas=""):
+    return f"Cliente {cpf},01/01/1990,{cpf},Rua A,1,Centro,São Paulo/SP,{contas}\n"
+
+def _importar(texto, formato="csv", tamanho_bloco=meu_banco.TAMANHO_BLOCO_IMPORTACAO):
+    """Executa a importação e separa os eventos: (rejeitadas, progressos, resumo)"""
+    eventos = list(meu_banco.importar_cadastros(io.StringIO(texto, newline=''), formato, tamanho_bloco))
+    rejeitadas = [evento["rejeitada"] for evento in eventos if "rejeitada" in evento]
+    progressos = [evento["progresso"] for evento in eventos if "progresso" in evento]
+    assert "resumo" in eventos[-1]
+    return rejeitadas, progressos, eventos[-1]["resumo"]
+
+def _numeros_por_cpf():
+    numeros = {}
+    for conta in meu_banco.contas:
+        numeros.setdefault(conta.cpf_titular, []).append(conta.numero_conta)
+    return numeros
+
+def test_cpfs_repetidos_no_bloco_entre_blocos_e_ja_cadastrados(banco):
+    banco.criar_cliente("Antigo", "01/01/1980", "00000000009", "Rua B", "2", "Centro", "São Paulo/SP")
+    cpfs = ["00000000001", "00000000002", "00000000001",   # repetido no mesmo bloco
+            "00000000003", "00000000002", "00000000009"]   # repetido do bloco anterior e já cadastrado
+    
+    rejeitadas, progressos, resumo = _importar(CABECALHO + "".join(map(_linha_csv, cpfs)), tamanho_bloco=3)
+    
+    assert rejeitadas == [{"linha": linha, "motivo": "CPF já cadastrado no sistema!"} for linha in (3, 5, 6)]
+    assert len(progressos) == 2
+    assert resumo["linhas"] == 6
+    assert resumo["clientes"] == resumo["contas"] == 3
+    assert resumo["rejeitadas"] == 3
+    assert sorted(banco.clientes_por_cpf) == ["00000000001", "00000000002", "00000000003", "00000000009"]
+    assert banco.clientes_por_cpf["00000000001"].nome == "Cliente 00000000001"
+
+def test_linhas_invalidas_sao_rejeitadas_sem_parar_a_importacao(banco):
+    linhas = [
+        json.dumps({"nome": "A", "data_nascimento": "01/01/1990", "cpf": "00000000001", "logradouro": "Rua A",
+                    "numero": "1", "bairro": "Centro", "cidade_uf": "São Paulo/SP"}),
+        "{não é json",
+        json.dumps({"nome": "B", "cpf": "00000000002"}),
+        json.dumps({"nome": "C", "data_nascimento": "01/01/1990", "cpf": "00000000003", "logradouro": "Rua A",
+                    "numero": "1", "bairro": "Centro", "cidade_uf": "São Paulo/SP", "contas": 101}),
+        "",
+        json.dumps({"nome": "D", "data_nascimento": "01/01/1990", "cpf": "00000000004", "logradouro": "Rua A",
+                    "numero": "1", "bairro": "Centro", "cidade_uf": "São Paulo/SP", "contas": 2}),
+    ]
+    
+    rejeitadas, _, resumo = _importar("\n".join(linhas) + "\n", "ndjson")
+    
+    # Linhas em branco não contam
+    assert [rejeitada["linha"] for rejeitada in rejeitadas] == [2, 3, 4]
+    assert rejeitadas[0]["motivo"] == "Linha não é um JSON válido."
+    assert "data_nascimento" in rejeitadas[1]["motivo"]
+    assert "contas" in rejeitadas[2]["motivo"]
+    assert resumo == dict(resumo, linhas=5, clientes=2, contas=3, rejeitadas=3)
+    assert {cpf: len(numeros) for cpf, numeros in _numeros_por_cpf().items()} == {"00000000001": 1, "00000000004": 2}
+
+def test_cada_bloco_recebe_uma_faixa_contigua_de_contas(abrir_contas):
+    abrir_contas(2)
+    linhas = [_linha_csv("00000000101", 3), _linha_csv("00000000102", 0), _linha_csv("00000000103"),
+              _linha_csv("00000000101", 5), _linha_csv("00000000104", 2)]
+    
+    rejeitadas, _, resumo = _importar(CABECALHO + "".join(linhas), tamanho_bloco=2)
+    
+    assert [rejeitada["linha"] for rejeitada in rejeitadas] == [4]
+    assert resumo["contas"] == 6
+    numeros = _numeros_por_cpf()
+    # Os números seguem os das contas abertas antes, sem lacunas: a linha
+    # recusada não reservou números
+    assert numeros["00000000101"] == [3, 4, 5]
+    assert "00000000102" not in numeros
+    assert numeros["00000000103"] == [6]
+    assert numeros["00000000104"] == [7, 8]
+    assert meu_banco.alocar_numero_conta() == 9
+
+def test_importacoes_simultaneas_sao_serializadas(banco):
+    textos = [CABECALHO + "".join(_linha_csv(f"{base + indice:011d}", 2) for indice in range(300))
+              for base in (1_000, 2_000)]
+    primeira = meu_banco.importar_cadastros(io.StringIO(textos[0], newline=''), tamanho_bloco=100)
+    # A primeira importação para no meio, com o lock retido
+    assert "progresso" in next(primeira)
+    terminou = threading.Event()
+    
+    def importar_segunda():
+        _importar(textos[1], tamanho_bloco=100)
+        terminou.set()
+    
+    segunda = threading.Thread(target=importar_segunda)
+    segunda.start()
+    assert not terminou.wait(0.2)
+    *_, resumo = primeira
+    segunda.join()
+    
+    assert resumo["resumo"]["contas"] == 600
+    numeros = sorted(conta.numero_conta for conta in meu_banco.contas)
+    assert numeros == list(range(1, 1_201))
+    # Cada importação ficou com uma faixa só, sem intercalar com a outra
+    da_primeira = [numero for cpf, da_conta in _numeros_por_cpf().items() if cpf < "00000002000" for numero in da_conta]
+    assert sorted(da_primeira) == list(range(1, 601))
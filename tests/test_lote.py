@@ -0,0 +1,92 @@
+import meu_banco
+
+def _lote(corpo, atomicidade=None, ndjson=False):
+    cliente = meu_banco.app.test_client()
+    caminho = "/lote" if atomicidade is None else f"/lote?atomicidade={atomicidade}"
+    if ndjson:
+        return cliente.post(caminho, data=corpo, content_type="application/x-ndjson").get_json()
+    return cliente.post(caminho, json=corpo).get_json()
+
+def _saldos(numeros):
+    return [meu_banco.buscar_conta(numero).saldo for numero in numeros]
+
+def test_por_item_aplica_o_que_for_valido(abrir_contas):
+    numeros = abrir_contas(2)
+    
+    resposta = _lote([
+        {"tipo": "deposito", "numero_conta": numeros[0], "valor": 10},
+        {"tipo": "saque", "numero_conta": numeros[1], "valor": 5},
+        {"tipo": "transferencia", "numero_conta": numeros[0], "valor": 1},
+        {"tipo": "deposito", "numero_conta": 999, "valor": 1},
+        {"tipo": "saque", "numero_conta": numeros[0], "valor": 2.5},
+    ])
+    
+    assert not resposta["sucesso"]
+    assert (resposta["aplicadas"], resposta["falhas"]) == (2, 3)
+    assert [(r["indice"], r["sucesso"]) for r in resposta["resultados"]] == \
+           [(0, True), (1, False), (2, False), (3, False), (4, True)]
+    assert resposta["resultados"][1]["mensagem"].startswith("Saldo insuficiente!")
+    assert resposta["resultados"][3]["mensagem"] == "Conta não encontrada!"
+    assert resposta["resultados"][4]["saldo"] == 7.5
+    assert _saldos(numeros) == [750, 0]
+
+def test_tudo_ou_nada_rejeitado_responde_por_todos_os_itens(abrir_contas):
+    numeros = abrir_contas(2)
+    
+    resposta = _lote({"atomicidade": "tudo_ou_nada", "operacoes": [
+        {"tipo": "deposito", "numero_conta": numeros[0], "valor": 10},
+        {"tipo": "deposito", "numero_conta": numeros[1], "valor": 20},
+        {"tipo": "saque", "numero_conta": numeros[0], "valor": 50},
+        {"tipo": "deposito", "numero_conta": numeros[1], "valor": 30},
+    ]})
+    
+    assert not resposta["sucesso"]
+    assert (resposta["aplicadas"], resposta["falhas"], resposta["indice_falha"]) == (0, 4, 2)
+    assert [r["indice"] for r in resposta["resultados"]] == [0, 1, 2, 3]
+    assert not any(r["sucesso"] for r in resposta["resultados"])
+    assert resposta["resultados"][2]["mensagem"].startswith("Saldo insuficiente!")
+    assert resposta["resultados"][0]["mensagem"] == resposta["resultados"][3]["mensagem"] == \
+           "Não aplicada: a operação 2 do lote falhou."
+    assert _saldos(numeros) == [0, 0]
+    assert all(len(meu_banco.buscar_conta(numero).extrato) == 0 for numero in numeros)
+
+def test_tudo_ou_nada_aplica_o_lote_inteiro(abrir_contas):
+    numeros = abrir_contas(2)
+    
+    resposta = _lote([
+        {"tipo": "deposito", "numero_conta": numeros[0], "valor": 10},
+        {"tipo": "saque", "numero_conta": numeros[0], "valor": 4},
+        {"tipo": "deposito", "numero_conta": numeros[1], "valor": 1.25},
+    ], "tudo_ou_nada")
+    
+    assert resposta["sucesso"]
+    assert (resposta["aplicadas"], resposta["falhas"]) == (3, 0)
+    assert _saldos(numeros) == [600, 125]
+
+def test_corpo_ndjson(abrir_contas):
+    numeros = abrir_contas(2)
+    linhas = [meu_banco.codificar_json({"tipo": "deposito", "numero_conta": numero, "valor": valor})
+              for numero, valor in zip(numeros * 50, range(1, 101))]
+    # Linhas em branco e \r\n são ignorados
+    corpo = b"\r\n".join(linhas[:50]) + b"\n\n" + b"\n".join(linhas[50:]) + b"\n"
+    
+    resposta = _lote(corpo, "tudo_ou_nada", ndjson=True)
+    
+    assert resposta["sucesso"]
+    assert resposta["aplicadas"] == 100
+    assert [r["indice"] for r in resposta["resultados"]] == list(range(100))
+    assert _saldos(numeros) == [sum(range(1, 101, 2)) * 100, sum(range(2, 101, 2)) * 100]
+
+def test_ndjson_invalido_aponta_a_linha(abrir_contas):
+    numero, = abrir_contas(1)
+    valida = meu_banco.codificar_json({"tipo": "deposito", "numero_conta": numero, "valor": 1})
+    
+    resposta = _lote(valida + b"\n{quebrada\n" + valida, ndjson=True)
+    assert not resposta["sucesso"]
+    assert resposta["mensagem"] == "Linha 2 não é um JSON válido."
+    
+    # Dois valores numa linha não viram duas operações
+    resposta = _lote(valida + b"\n" + valida + b", " + valida, ndjson=True)
+    assert not resposta["sucesso"]
+    assert resposta["mensagem"] == "Linha 2 não é um JSON válido."
+    assert _saldos([numero]) == [0]
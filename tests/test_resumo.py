@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+import random
+import threading
+
+import meu_banco
+
+def _recalculado():
+    """Resumo calculado do zero a partir das contas, para comparar com o incremental"""
+    resumo = meu_banco.ResumoBanco()
+    resumo.reconstruir(meu_banco.contas)
+    return resumo.dados(meu_banco.MAXIMO_RANKING, meu_banco.DIAS_RESUMO)
+
+def _ranking_real():
+    return sorted(((conta.saldo, conta.numero_conta) for conta in meu_banco.contas), key=lambda par: (-par[0], par[1]))
+
+def _timestamp(dia, hora=12):
+    return datetime.combine(dia, datetime.min.time()).timestamp() + hora * 3600
+
+def test_totais_incrementais_batem_com_o_recalculo(abrir_contas):
+    numeros = abrir_contas(40)
+    contas = [meu_banco.buscar_conta(numero) for numero in numeros]
+    rng = random.Random(7)
+    for conta in contas:
+        meu_banco.realizar_deposito(conta, rng.randrange(1_000, 100_000))
+    for _ in range(500):
+        origem, destino = rng.choice(contas), rng.choice(contas)
+        operacao = rng.choice(("deposito", "saque", "transferencia"))
+        try:
+            if operacao == "deposito":
+                meu_banco.realizar_deposito(origem, rng.randrange(1, 10_000))
+            elif operacao == "saque":
+                meu_banco.realizar_saque(origem, rng.randrange(1, 10_000))
+            else:
+                meu_banco.realizar_transferencia(origem, destino, rng.randrange(1, 10_000))
+        except meu_banco.OperacaoRecusada:
+            pass
+    
+    dados = meu_banco.resumo.dados(meu_banco.MAXIMO_RANKING, meu_banco.DIAS_RESUMO)
+    
+    assert dados == _recalculado()
+    assert dados["numero_contas"] == len(numeros)
+    assert dados["saldo_total"] == sum(conta.saldo for conta in contas)
+    assert dados["maiores_saldos"] == _ranking_real()
+
+def test_ranking_acompanha_transferencias(abrir_contas):
+    numeros = abrir_contas(4)
+    contas = [meu_banco.buscar_conta(numero) for numero in numeros]
+    for conta, valor in zip(contas, (100, 200, 300, 400)):
+        meu_banco.realizar_deposito(conta, valor)
+    assert [numero for _, numero in meu_banco.resumo.dados(4)["maiores_saldos"]] == numeros[::-1]
+    
+    # Entre duas leituras a conta 1 passa por vários saldos; o ranking só vê o último
+    meu_banco.realizar_transferencia(contas[3], contas[0], 350)
+    meu_banco.realizar_transferencia(contas[2], contas[0], 250)
+    meu_banco.realizar_transferencia(contas[0], contas[1], 50)
+    
+    assert meu_banco.resumo.dados(4)["maiores_saldos"] == [(650, numeros[0]), (250, numeros[1]),
+                                                            (50, numeros[2]), (50, numeros[3])]
+    assert meu_banco.resumo.dados(4)["totais"]["Transferência enviada"] == [650, 3]
+
+def test_lote_desfeito_nao_altera_o_resumo(abrir_contas):
+    numeros = abrir_contas(3)
+    for numero, valor in zip(numeros, (500, 100, 300)):
+        meu_banco.realizar_deposito(meu_banco.buscar_conta(numero), valor)
+    antes = meu_banco.resumo.dados(10, meu_banco.DIAS_RESUMO)
+    
+    # Move a conta 2 para o topo e a 1 para baixo antes de a última operação falhar
+    resultado = meu_banco.executar_lote([
+        {"tipo": "deposito", "numero_conta": numeros[1], "valor": 9},
+        {"tipo": "saque", "numero_conta": numeros[0], "valor": 4.5},
+        {"tipo": "saque", "numero_conta": numeros[2], "valor": 1_000},
+    ], "tudo_ou_nada")
+    
+    assert not resultado["sucesso"]
+    assert meu_banco.resumo.dados(10, meu_banco.DIAS_RESUMO) == antes == _recalculado()
+    
+    resultado = meu_banco.executar_lote([
+        {"tipo": "deposito", "numero_conta": numeros[1], "valor": 9},
+        {"tipo": "saque", "numero_conta": numeros[0], "valor": 4.5},
+    ], "tudo_ou_nada")
+    
+    assert resultado["sucesso"]
+    dados = meu_banco.resumo.dados(10, meu_banco.DIAS_RESUMO)
+    assert dados == _recalculado()
+    assert dados["maiores_saldos"] == _ranking_real() == [(1_000, numeros[1]), (300, numeros[2]), (50, numeros[0])]
+
+def test_volumes_viram_o_dia_e_guardam_so_a_janela():
+    resumo = meu_banco.ResumoBanco()
+    resumo.incluir_conta(1, 0)
+    hoje = datetime.now().date()
+    
+    # Um segundo antes e um depois da meia-noite
+    meia_noite = _timestamp(hoje, 0)
+    resumo.registrar("Depósito", 100, meia_noite - 1, ((1, 0, 100),))
+    resumo.registrar("Depósito", 200, meia_noite, ((1, 100, 300),))
+    resumo.registrar("Saque", 50, meia_noite + 1, ((1, 300, 250),))
+    
+    volumes = resumo.dados(dias=2)["volumes_por_dia"]
+    assert volumes == {
+        (hoje - timedelta(days=1)).isoformat(): {"Depósito": 100, "Saque": 0, "Transferência enviada": 0},
+        hoje.isoformat(): {"Depósito": 200, "Saque": 50, "Transferência enviada": 0},
+    }
+    
+    saldo = 250
+    for atraso in range(meu_banco.DIAS_RESUMO + 10, 1, -1):
+        resumo.registrar("Depósito", 1, _timestamp(hoje - timedelta(days=atraso)), ((1, saldo, saldo + 1),))
+        saldo += 1
+    
+    dados = resumo.dados(dias=meu_banco.DIAS_RESUMO + 10)
+    dias = sorted(dados["volumes_por_dia"])
+    assert len(dias) == meu_banco.DIAS_RESUMO
+    assert dias[-1] == hoje.isoformat()
+    assert dias[0] == (hoje - timedelta(days=meu_banco.DIAS_RESUMO - 1)).isoformat()
+    # Os totais continuam contando o que saiu da janela
+    assert dados["totais"]["Depósito"] == [300 + meu_banco.DIAS_RESUMO + 9, meu_banco.DIAS_RESUMO + 11]
+    assert dados["maiores_saldos"] == [(saldo, 1)]
+
+def test_leituras_concorrentes_com_operacoes(abrir_contas):
+    numeros = abrir_contas(8)
+    contas = [meu_banco.buscar_conta(numero) for numero in numeros]
+    for conta in contas:
+        meu_banco.realizar_deposito(conta, 1_000_000)
+    total = meu_banco.resumo.dados()["saldo_total"]
+    parar = threading.Event()
+    leituras = []
+    erros = []
+    
+    def ler():
+        while not parar.is_set():
+            leituras.append(meu_banco.resumo.dados(len(contas))["saldo_total"])
+    
+    def transferir(semente):
+        rng = random.Random(semente)
+        for _ in range(500):
+            try:
+                meu_banco.realizar_transferencia(rng.choice(contas), rng.choice(contas), rng.randrange(1, 1_000))
+            except meu_banco.OperacaoRecusada:
+                pass
+            except Exception as e:
+                erros.append(e)
+    
+    leitor = threading.Thread(target=ler)
+    leitor.start()
+    threads = [threading.Thread(target=transferir, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    parar.set()
+    leitor.join()
+    
+    assert not erros
+    assert leituras
+    # Cada leitura é um corte consistente: transferências nunca aparecem pela metade
+    assert set(leituras) <= {total}
+    assert meu_banco.resumo.dados(len(contas))["maiores_saldos"] == _ranking_real()
+
+def test_indice_ordenado_ignora_item_ausente():
+    indice = meu_banco.IndiceOrdenado()
+    for item in [(-300, 1), (-200, 2), (-100, 3)]:
+        indice.adicionar(item)
+    
+    assert not indice.remover((-250, 9))
+    assert not indice.remover((-50, 9))
+    assert indice.remover((-200, 2))
+    assert indice.primeiros(10) == [(-300, 1), (-100, 3)]
@@ -0,0 +1,53 @@
+import pytest
+
+import meu_banco
+
+@pytest.fixture
+def janela_24h(monkeypatch):
+    monkeypatch.setattr(meu_banco, "JANELA_SAQUES", "24h")
+
+def test_lote_desfeito_tira_o_saque_da_janela(janela_24h, abrir_contas):
+    numero, = abrir_contas(1)
+    conta = meu_banco.buscar_conta(numero)
+    meu_banco.realizar_deposito(conta, 10_000)
+    
+    resultado = meu_banco.executar_lote([
+        {"tipo": "saque", "numero_conta": numero, "valor": 10},
+        {"tipo": "saque", "numero_conta": numero, "valor": 10**6},
+    ], "tudo_ou_nada")
+    
+    assert not resultado["sucesso"]
+    assert conta.saques_recentes is None
+    assert meu_banco.saques_na_janela(conta, meu_banco.time.time()) == (0, 0)
+
+def test_lote_desfeito_restaura_o_buffer_anterior(janela_24h, abrir_contas):
+    numero, = abrir_contas(1)
+    conta = meu_banco.buscar_conta(numero)
+    meu_banco.realizar_deposito(conta, 10_000)
+    meu_banco.realizar_saque(conta, 100)
+    anteriores = list(conta.saques_recentes)
+    
+    meu_banco.executar_lote([
+        {"tipo": "saque", "numero_conta": numero, "valor": 10},
+        {"tipo": "saque", "numero_conta": numero, "valor": 10**6},
+    ], "tudo_ou_nada")
+    
+    assert list(conta.saques_recentes) == anteriores
+
+def test_reaplicar_saque_que_ja_esta_no_snapshot(janela_24h, abrir_contas, monkeypatch):
+    numero, = abrir_contas(1)
+    conta = meu_banco.buscar_conta(numero)
+    meu_banco.realizar_deposito(conta, 10_000)
+    registros = []
+    monkeypatch.setattr(meu_banco.persistencia, "registrar_lote", registros.extend)
+    meu_banco.realizar_saque(conta, 100)
+    
+    # Snapshot feito depois do saque, com o registro dele ainda na cauda do log
+    estado = meu_banco.decodificar_json(meu_banco.codificar_json(meu_banco.estado_atual()))
+    meu_banco.carregar_estado(estado)
+    for registro in registros:
+        meu_banco.aplicar_registro(meu_banco.decodificar_json(meu_banco.codificar_json(registro)))
+    
+    conta = meu_banco.buscar_conta(numero)
+    assert len(conta.saques_recentes) == 1
+    assert meu_banco.saques_na_janela(conta, meu_banco.time.time()) == (1, 100)
@@ -0,0 +1,87 @@
+import json
+import socket
+import urllib.request
+
+import pytest
+
+import meu_banco
+
+def _post(porta, caminho, dados, cabecalhos=None):
+    requisicao = urllib.request.Request(f"http://127.0.0.1:{porta}{caminho}", data=json.dumps(dados).encode(),
+                                        headers={"Content-Type": "application/json", **(cabecalhos or {})})
+    with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+        return resposta.headers, json.loads(resposta.read())
+
+def _get(porta, caminho):
+    with urllib.request.urlopen(f"http://127.0.0.1:{porta}{caminho}", timeout=30) as resposta:
+        return json.loads(resposta.read())
+
+@pytest.fixture
+def subir_shards(tmp_path):
+    """Sobe `total` shards que atendem HTTP numa porta local e persistem em tmp_path; retorna a porta"""
+    roteadores = []
+    
+    def subir(total):
+        soquete = socket.create_server(("127.0.0.1", 0))
+        porta = soquete.getsockname()[1]
+        roteadores.append(meu_banco.RoteadorShards(total, str(tmp_path), ("dev", soquete, 8, 100)))
+        soquete.close()
+        return porta
+    
+    def encerrar():
+        roteadores.pop().encerrar()
+    
+    subir.encerrar = encerrar
+    yield subir
+    while roteadores:
+        encerrar()
+
+def _cadastrar(porta, indice):
+    cpf = f"{indice:011d}"
+    _, resposta = _post(porta, "/criar_cliente", {"nome": f"Cliente {indice}", "data_nascimento": "01/01/1990",
+                                                  "cpf": cpf, "logradouro": "Rua A", "numero": "1",
+                                                  "bairro": "Centro", "cidade_uf": "São Paulo/SP"})
+    assert resposta["sucesso"], resposta
+    _, resposta = _post(porta, "/criar_conta", {"cpf": cpf})
+    assert resposta["sucesso"], resposta
+    return resposta["conta"]["numero_conta"]
+
+def test_cada_shard_atende_http_e_encaminha_ao_dono(subir_shards):
+    porta = subir_shards(2)
+    numeros = [_cadastrar(porta, indice) for indice in range(1, 5)]
+    # O shard 0 numera as contas, qualquer que seja o processo que recebeu o pedido
+    assert numeros == [1, 2, 3, 4]
+    
+    for numero in numeros:
+        _, resposta = _post(porta, "/depositar", {"numero_conta": numero, "valor": 100})
+        assert resposta["sucesso"], resposta
+    _, resposta = _post(porta, "/transferir", {"numero_conta_origem": 1, "numero_conta_destino": 3, "valor": 5})
+    assert resposta["sucesso"], resposta
+    _, resposta = _post(porta, "/transferir", {"numero_conta_origem": 1, "numero_conta_destino": 2, "valor": 5})
+    assert not resposta["sucesso"]
+    assert "único shard" in resposta["mensagem"]
+    
+    contas = _get(porta, "/listar_contas")
+    assert [(conta["numero_conta"], conta["saldo"]) for conta in contas] == [(1, 95), (2, 100), (3, 105), (4, 100)]
+    assert _get(porta, "/extrato/3")["saldo"] == 105
+
+def test_idempotency_key_tem_um_unico_dono(subir_shards):
+    porta = subir_shards(2)
+    numero = _cadastrar(porta, 1)
+    
+    # Cada urlopen abre uma conexão nova, que pode cair em qualquer processo
+    repeticoes = [_post(porta, "/depositar", {"numero_conta": numero, "valor": 7}, {"Idempotency-Key": "chave-1"})
+                  for _ in range(6)]
+    
+    assert [cabecalhos.get("Idempotent-Replayed") for cabecalhos, _ in repeticoes] == [None] + ["true"] * 5
+    assert _get(porta, f"/extrato/{numero}")["saldo"] == 7
+
+def test_numeracao_continua_depois_de_reiniciar(subir_shards):
+    porta = subir_shards(2)
+    assert [_cadastrar(porta, indice) for indice in range(1, 4)] == [1, 2, 3]
+    subir_shards.encerrar()
+    
+    porta = subir_shards(2)
+    
+    assert _cadastrar(porta, 4) == 4
+    assert len(_get(porta, "/listar_contas")) == 4
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+import meu_banco
+
+def _reabrir(banco, diretorio):
+    """Simula um reinício: descarta o estado em memória e recupera do diretório"""
+    banco.persistencia.fechar()
+    banco.persistencia = banco.PersistenciaMemoria()
+    banco.carregar_estado({"clientes": [], "contas": [], "numero_conta_sequencial": 1})
+    banco.configurar_persistencia(banco.PersistenciaWAL(str(diretorio)))
+
+def _ultimo_segmento(diretorio):
+    return os.path.join(diretorio, sorted(n for n in os.listdir(diretorio) if n.startswith('wal-'))[-1])
+
+@pytest.fixture
+def banco_wal(banco, tmp_path):
+    banco.configurar_persistencia(banco.PersistenciaWAL(str(tmp_path)))
+    banco.criar_cliente("João Ávila", "01/01/1990", "12345678901", "Rua A", "1", "Centro", "São Paulo/SP")
+    banco.criar_conta_bancaria("12345678901")
+    banco.realizar_deposito(banco.buscar_conta(1), 500)
+    yield banco
+    banco.configurar_persistencia(banco.PersistenciaMemoria())
+
+def test_cauda_cortada_no_meio_de_um_caractere(banco_wal, tmp_path):
+    caminho = _ultimo_segmento(tmp_path)
+    banco_wal.persistencia.fechar()
+    linha = meu_banco.codificar_json({"op": "cliente", "cliente": {
+        "nome": "João", "data_nascimento": "01/01/1990", "cpf": "98765432100", "endereco": {}}})
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'ab') as arquivo:
+        arquivo.write(linha[:linha.index("ã".encode('utf-8')) + 1])
+    
+    _reabrir(banco_wal, tmp_path)
+    
+    assert banco_wal.buscar_conta(1).saldo == 500
+    assert banco_wal.buscar_cliente_por_cpf("98765432100") is None
+    assert os.path.getsize(caminho) == tamanho
+
+def test_registro_corrompido_no_meio_do_log(banco_wal, tmp_path):
+    caminho = _ultimo_segmento(tmp_path)
+    banco_wal.persistencia.fechar()
+    with open(caminho, 'r+b') as arquivo:
+        conteudo = arquivo.read()
+        arquivo.seek(0)
+        arquivo.write(conteudo.replace(b'"op"', b'"o\xff', 1))
+    
+    with pytest.raises(ValueError):
+        _reabrir(banco_wal, tmp_path)